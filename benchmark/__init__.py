@@ -0,0 +1,5 @@
+"""
+Client-side benchmarks for klonet_api and KlonetAI.
+
+Run them from the repository root, e.g. `python -m benchmark.topo_payload`.
+"""
@@ -0,0 +1,109 @@
+"""Memory per 10k elements: slotted Dict2Class vs. the previous __dict__ classes.
+
+For Node, Link, Image and LinkConfiguration, builds N objects from realistic
+property dicts with the current classes and with a copy of the previous
+implementation (every instance carrying its own __dict__ filled by
+__dict__.update), and reports tracemalloc-measured bytes per 10k elements
+plus attribute read time.
+
+Usage:
+    python -m benchmark.element_memory [--count 10000]
+"""
+import argparse
+import gc
+import timeit
+import tracemalloc
+
+from klonet_api.common import Image, Link, LinkConfiguration, Node
+
+
+class LegacyDict2Class(object):
+    def __init__(self, **properties):
+        self.__dict__.update(properties)
+
+    def dictform(self):
+        return self.__dict__
+
+
+class LegacyLinkConfiguration(LegacyDict2Class):
+    def __init__(self, **properties):
+        self.__dict__ = {
+            "bw_kbps": "10000", "delay_us": "0", "jitter_us": "0",
+            "correlation": "0%", "delay_distribution": "uniform",
+            "loss": "0", "queue_size_bytes": "100000",
+            "linkchoice": "static", "link": None, "ne": None,
+        }
+        super().__init__(**properties)
+
+
+def node_properties(i):
+    return {"name": f"h{i}", "type": "host", "subtype": "ubuntu",
+            "image_name": "ubuntu:20.04", "x": i % 700, "y": 400,
+            "resource_limit": {"cpu": "100", "mem": "1024"},
+            "config": {"worker_specified": ""},
+            "interfaces": [{"ip": f"10.0.{i // 256 % 256}.{i % 256}",
+                            "netmask": "255.255.0.0", "name": f"h{i}s1"}]}
+
+
+def link_properties(i):
+    return {"name": f"l{i}", "source": f"h{i}", "sourceIP": "",
+            "sourceType": "host", "target": "s1", "targetIP": "",
+            "targetType": "switch", "config": {}}
+
+
+def image_properties(i):
+    return {"name": f"image{i}", "type": "host", "subtype": f"image{i}",
+            "image_name": f"image{i}:latest",
+            "resource_limit": {"cpu": "100", "mem": "1024"},
+            "config": {}, "interfaces": []}
+
+
+def link_configuration_properties(i):
+    return {"link": f"link_l{i}", "ne": f"h{i}", "delay_us": "100"}
+
+
+# (name, current class, previous class, properties factory, attribute to read)
+CASES = [
+    ("Node", Node, LegacyDict2Class, node_properties, "name"),
+    ("Link", Link, LegacyDict2Class, link_properties, "source"),
+    ("Image", Image, LegacyDict2Class, image_properties, "image_name"),
+    ("LinkConfiguration", LinkConfiguration, LegacyLinkConfiguration,
+     link_configuration_properties, "link"),
+]
+
+
+def measure(cls, properties):
+    # the property dicts themselves are shared input, only the objects count
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [cls(**p) for p in properties]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, objects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10000)
+    args = parser.parse_args()
+    scale = 10000 / args.count
+
+    print(f"{'element':<18} {'legacy KiB/10k':>15} {'slotted KiB/10k':>16} "
+          f"{'saved':>6} {'legacy read':>12} {'slotted read':>13}")
+    for name, cls, legacy_cls, make, attr in CASES:
+        properties = [make(i) for i in range(args.count)]
+        legacy_bytes, legacy = measure(legacy_cls, properties)
+        slotted_bytes, slotted = measure(cls, properties)
+        legacy_ns = timeit.timeit(lambda: getattr(legacy[0], attr),
+                                  number=200000) / 200000 * 1e9
+        slotted_ns = timeit.timeit(lambda: getattr(slotted[0], attr),
+                                   number=200000) / 200000 * 1e9
+        print(f"{name:<18} {legacy_bytes * scale / 1024:>15.0f} "
+              f"{slotted_bytes * scale / 1024:>16.0f} "
+              f"{1 - slotted_bytes / legacy_bytes:>6.0%} "
+              f"{legacy_ns:>10.0f}ns {slotted_ns:>11.0f}ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Time the TopoGraph analyses on fat-tree topologies.
+
+For each fat-tree size, reports the time to build the CSR graph and to
+compute a shortest path, the diameter, the articulation points and bridges,
+the min cut between two hosts, and the hop counts from a batch of sources.
+
+Usage:
+    python -m benchmark.graph [--k 8 16 32] [--sources 1000]
+"""
+import argparse
+import time
+
+from klonet_api import TopoGraph
+from klonet_api.common import Image
+from klonet_api.generators import generate_topo
+
+HOST_IMAGE = Image(type="host", subtype="ubuntu", image_name="ubuntu:20.04",
+                   resource_limit={"cpu": "100", "mem": "1024"},
+                   config={"worker_specified": ""}, interfaces=[])
+SWITCH_IMAGE = Image(type="switch", subtype="ovs", image_name="ovs:latest",
+                     resource_limit={"cpu": "100", "mem": "512"},
+                     config={"worker_specified": ""}, interfaces=[])
+
+
+def timed(func):
+    started_at = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started_at
+
+
+def run_case(k, num_sources):
+    topo = generate_topo("fattree", HOST_IMAGE, SWITCH_IMAGE, "10.0.0.0/8",
+                         k=k)
+    graph, build_s = timed(lambda: TopoGraph(topo))
+    hosts = [name for name, is_host in zip(graph.names, graph.is_host)
+             if is_host]
+    src, dst = hosts[0], hosts[-1]
+    sources = graph.names[:num_sources]
+
+    print(f"fattree k={k}: {len(graph)} nodes, {len(graph.link_names)} links")
+    print(f"  {'build':28s} {build_s * 1000:9.1f}ms")
+    path, path_s = timed(lambda: graph.shortest_path(src, dst))
+    print(f"  {'shortest_path':28s} {path_s * 1000:9.1f}ms  "
+          f"{len(path) - 1} hops")
+    (diameter, _, _), diameter_s = timed(graph.diameter)
+    print(f"  {'diameter':28s} {diameter_s * 1000:9.1f}ms  {diameter}")
+    cut_points, cut_points_s = timed(graph.articulation_points)
+    print(f"  {'articulation_points':28s} {cut_points_s * 1000:9.1f}ms  "
+          f"{len(cut_points)}")
+    bridges, bridges_s = timed(graph.bridges)
+    print(f"  {'bridges':28s} {bridges_s * 1000:9.1f}ms  {len(bridges)}")
+    (cut_size, _), min_cut_s = timed(lambda: graph.min_cut(src, dst))
+    print(f"  {'min_cut':28s} {min_cut_s * 1000:9.1f}ms  {cut_size}")
+    _, hops_s = timed(lambda: graph.hops(sources))
+    print(f"  {f'hops ({len(sources)} sources)':28s} {hops_s * 1000:9.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--sources", type=int, default=1000)
+    args = parser.parse_args()
+    for k in args.k:
+        run_case(k, args.sources)
+
+
+if __name__ == "__main__":
+    main()
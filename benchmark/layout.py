@@ -0,0 +1,70 @@
+"""Time the automatic layout on generated topologies of increasing size.
+
+Usage:
+    python -m benchmark.layout [--switches 100 1000 3000] [--hosts-per-switch 2]
+
+Each random topology is laid out with the force-directed mode, and a k=16
+fat-tree with the hierarchical mode. The report lists the node count, the
+elapsed time and the smallest distance between any two nodes.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from klonet_api.common import Image
+from klonet_api.generators import generate_topo
+from klonet_api.layout import layout_topo
+
+HOST_IMAGE = Image(type="host", subtype="ubuntu", image_name="ubuntu:20.04",
+                   resource_limit={"cpu": "100", "mem": "1024"},
+                   config={"worker_specified": ""}, interfaces=[])
+SWITCH_IMAGE = Image(type="switch", subtype="ovs", image_name="ovs:latest",
+                     resource_limit={"cpu": "100", "mem": "512"},
+                     config={"worker_specified": ""}, interfaces=[])
+
+
+def min_distance(topo):
+    xy = np.array([(node.x, node.y) for node in topo.get_nodes().values()],
+                  dtype=float)
+    best = np.inf
+    for start in range(0, len(xy), 512):
+        delta = xy[start:start + 512, None, :] - xy[None, :, :]
+        dist = np.sqrt((delta ** 2).sum(axis=-1))
+        rows = np.arange(start, min(start + 512, len(xy)))
+        dist[rows - start, rows] = np.inf
+        best = min(best, dist.min())
+    return best
+
+
+def run_case(label, topo, mode):
+    started_at = time.perf_counter()
+    used = layout_topo(topo, mode=mode)
+    elapsed_s = time.perf_counter() - started_at
+    print(f"{label:28s} {len(topo.get_nodes()):7d} {used:13s} "
+          f"{elapsed_s:8.3f}s {min_distance(topo):8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--switches", type=int, nargs="+",
+                        default=[100, 1000, 3000])
+    parser.add_argument("--hosts-per-switch", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'case':28s} {'nodes':>7s} {'mode':13s} {'time':>9s} "
+          f"{'min dist':>8s}")
+    run_case("fattree k=16", generate_topo(
+        "fattree", HOST_IMAGE, SWITCH_IMAGE, "10.0.0.0/16", k=16),
+        "hierarchical")
+    for num_switches in args.switches:
+        topo = generate_topo(
+            "random", HOST_IMAGE, SWITCH_IMAGE, "10.0.0.0/8",
+            num_switches=num_switches,
+            hosts_per_switch=args.hosts_per_switch,
+            edge_prob=min(1.0, 2 / num_switches), seed=1)
+        run_case(f"random {num_switches} switches", topo, "force")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Classroom provisioning: sequential deploy vs. deploy_projects.
+
+Deploys the same topology for N students against the in-process fake master,
+once with one ProjectManager.deploy call after another and once with
+deploy_projects at several concurrency caps, destroying everything between
+runs. The fake master simulates a fixed deploy time per project, so the
+sequential run takes about N times that.
+
+Usage:
+    python -m benchmark.orchestrate [--students 60] [--deploy-time 1.0]
+        [--concurrency 4 8 16]
+"""
+import argparse
+import time
+
+from klonet_api import (ProjectManager, config, deploy_projects,
+                        destroy_projects)
+from klonet_api.common import Image, Topo
+from klonet_api.fake_master import FakeKlonetMaster
+
+PROJECT = "lab1"
+
+HOST_IMAGE = Image(type="host", subtype="ubuntu", image_name="ubuntu:20.04",
+                   resource_limit={"cpu": "100", "mem": "1024"},
+                   config={"worker_specified": ""}, interfaces=[])
+SWITCH_IMAGE = Image(type="switch", subtype="ovs", image_name="ovs:latest",
+                     resource_limit={"cpu": "100", "mem": "512"},
+                     config={"worker_specified": ""}, interfaces=[])
+
+
+def lab_topo():
+    topo = Topo()
+    switch = topo.add_node(SWITCH_IMAGE, "s1", location={"x": 100, "y": 0})
+    for i in range(1, 5):
+        host = topo.add_node(HOST_IMAGE, f"h{i}",
+                             location={"x": 50 * i, "y": 100})
+        topo.add_link(host, switch, src_IP=f"10.0.0.{i}/24")
+    return topo
+
+
+def deploy_sequentially(topo, targets):
+    started_at = time.perf_counter()
+    for user, project in targets:
+        ProjectManager(user).deploy(project, topo, quiet=True)
+    return time.perf_counter() - started_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=60)
+    parser.add_argument("--deploy-time", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, nargs="+",
+                        default=[4, 8, 16])
+    args = parser.parse_args()
+
+    config.progress_poll_min_s = 0.1
+    config.progress_poll_max_s = 0.5
+    targets = [(f"student{i:02d}", PROJECT)
+               for i in range(1, args.students + 1)]
+    topo = lab_topo()
+    with FakeKlonetMaster(deploy_time_s=args.deploy_time) as master:
+        master.set_as_default_backend()
+        sequential_s = deploy_sequentially(topo, targets)
+        destroy_projects(targets, max_concurrency=16, quiet=True)
+        print(f"{'mode':>14} {'wall':>8} {'p50':>7} {'p90':>7} {'p99':>7} "
+              f"{'speedup':>8}")
+        print(f"{'sequential':>14} {sequential_s:>7.2f}s")
+        for concurrency in args.concurrency:
+            report = deploy_projects(topo, targets,
+                                     max_concurrency=concurrency, quiet=True)
+            assert report.ok, str(report)
+            stats = report.percentiles()
+            print(f"{f'concurrent x{concurrency}':>14} {report.wall_s:>7.2f}s "
+                  f"{stats[50]:>6.2f}s {stats[90]:>6.2f}s {stats[99]:>6.2f}s "
+                  f"{sequential_s / report.wall_s:>7.1f}x")
+            destroy_projects(targets, max_concurrency=16, quiet=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Record a reference session once, then replay it to time the client side.
+
+The scenario builds a star topology, deploys it, adds a node and a link at
+runtime, configures and clears the link, runs a command, reads the topology
+back and destroys the project.
+
+Record against the in-process fake master (or a real backend with
+--host/--port):
+    python -m benchmark.replay_session record session.jsonl.gz [--hosts 200]
+
+Replay without any backend, with no waiting (--speed 0) or at recorded
+timing (--speed 1):
+    python -m benchmark.replay_session replay session.jsonl.gz [--speed 0]
+
+The replay report separates the time spent in the client (Topo building,
+JSON encoding/parsing, manager logic) from the simulated backend time.
+"""
+import argparse
+import time
+
+from klonet_api import (ImageManager, ProjectManager, NodeManager, LinkManager,
+                        CmdManager, LinkConfiguration)
+from klonet_api.common import Topo, recording, replaying
+from klonet_api.fake_master import FakeKlonetMaster
+
+USER = "bench_user"
+PROJECT = "bench_replay"
+
+
+def run_scenario(host, port, num_hosts, poll_interval_s):
+    images = ImageManager(USER, host, port).get_images()
+    topo = Topo()
+    switch = topo.add_node(images["ovs"], "s1")
+    for i in range(1, num_hosts + 1):
+        node = topo.add_node(images["ubuntu"], f"h{i}")
+        topo.add_link(node, switch, f"l{i}",
+                      f"10.{i // 65536}.{i // 256 % 256}.{i % 256}/8", "")
+
+    project_manager = ProjectManager(USER, host, port)
+    node_manager = NodeManager(USER, PROJECT, host, port)
+    link_manager = LinkManager(USER, PROJECT, host, port)
+    project_manager.deploy(PROJECT, topo, quiet=True,
+                           pool_interval_s=poll_interval_s)
+
+    node_manager.dynamic_add_node("extra", images["ubuntu"])
+    link_manager.dynamic_add_link("extra_link", node_manager.get_node("extra"),
+                                  node_manager.get_node("s1"),
+                                  "10.255.0.1/8", "")
+    link_manager.config_link(
+        LinkConfiguration(link="extra_link", ne="extra", delay_us="1000"),
+        LinkConfiguration(link="extra_link", ne="s1", delay_us="1000"))
+    link_manager.clear_link_configuration("extra_link")
+    CmdManager(USER, PROJECT, host, port).exec_cmds_in_nodes(
+        {"h1": ["hostname"]})
+    project_manager.get_topo(PROJECT)
+    project_manager.destroy(PROJECT, quiet=True,
+                            pool_interval_s=poll_interval_s)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("mode", choices=("record", "replay"))
+    parser.add_argument("log")
+    parser.add_argument("--hosts", type=int, default=200)
+    parser.add_argument("--host", help="real backend ip (default: fake master)")
+    parser.add_argument("--port", type=int, default=12352)
+    parser.add_argument("--speed", type=float, default=0,
+                        help="replay speed, 0 = no waiting, 1 = recorded timing")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        master = None
+        host, port = args.host, args.port
+        if host is None:
+            master = FakeKlonetMaster(deploy_time_s=1).start()
+            host, port = master.backend_ip, master.backend_port
+        try:
+            with recording(args.log) as recorder:
+                started_at = time.perf_counter()
+                run_scenario(host, port, args.hosts, poll_interval_s=0.2)
+                elapsed_s = time.perf_counter() - started_at
+        finally:
+            if master is not None:
+                master.stop()
+        print(f"recorded {recorder.count} requests in {elapsed_s:.3f}s "
+              f"to {args.log}")
+    else:
+        with replaying(args.log, speed=args.speed) as adapter:
+            started_at = time.perf_counter()
+            # host/port are irrelevant during replay, only paths are matched;
+            # progress polls are replayed in order, so no need to sleep
+            run_scenario("replay", 12352, args.hosts, poll_interval_s=0)
+            elapsed_s = time.perf_counter() - started_at
+        waited_s = adapter.replayed_s / args.speed if args.speed else 0
+        print(f"replayed {len(adapter.log.entries) - adapter.log.remaining()}"
+              f"/{len(adapter.log.entries)} requests")
+        print(f"wall time       {elapsed_s:.3f}s")
+        print(f"backend (sim.)  {waited_s:.3f}s")
+        print(f"client overhead {elapsed_s - waited_s:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Topology build time: per-element add_node/add_link vs. add_nodes/add_links.
+
+Builds a two-tier topology (one switch per 50 hosts, every host linked to its
+switch with an address, switches chained together) with N hosts, once through
+the per-element API and once through the bulk API, and checks that both
+produce the same document.
+
+Usage:
+    python -m benchmark.topo_build [--sizes 1000 10000 50000] [--repeat 3]
+"""
+import argparse
+import time
+
+from klonet_api.common import Image, Topo
+
+HOSTS_PER_SWITCH = 50
+
+HOST_IMAGE = Image(type="host", subtype="ubuntu", image_name="ubuntu:20.04",
+                   resource_limit={"cpu": "100", "mem": "1024"},
+                   config={"worker_specified": ""}, interfaces=[])
+SWITCH_IMAGE = Image(type="switch", subtype="ovs", image_name="ovs:latest",
+                     resource_limit={"cpu": "100", "mem": "512"},
+                     config={"worker_specified": ""}, interfaces=[])
+
+
+def host_address(i):
+    return f"10.{i // 65536}.{i // 256 % 256}.{i % 256}/8"
+
+
+def build_per_element(num_hosts):
+    topo = Topo()
+    num_switches = max(num_hosts // HOSTS_PER_SWITCH, 1)
+    switches = [topo.add_node(SWITCH_IMAGE, f"s{j}")
+                for j in range(1, num_switches + 1)]
+    for a, b in zip(switches, switches[1:]):
+        topo.add_link(a, b)
+    for i in range(1, num_hosts + 1):
+        host = topo.add_node(HOST_IMAGE, f"h{i}")
+        topo.add_link(host, switches[(i - 1) % num_switches],
+                      src_IP=host_address(i))
+    return topo
+
+
+def build_bulk(num_hosts):
+    topo = Topo()
+    num_switches = max(num_hosts // HOSTS_PER_SWITCH, 1)
+    topo.add_nodes([{"image": SWITCH_IMAGE, "node_name": f"s{j}"}
+                    for j in range(1, num_switches + 1)])
+    topo.add_links([{"src_node": f"s{j}", "dst_node": f"s{j + 1}"}
+                    for j in range(1, num_switches)])
+    topo.add_nodes([{"image": HOST_IMAGE, "node_name": f"h{i}"}
+                    for i in range(1, num_hosts + 1)])
+    topo.add_links([{"src_node": f"h{i}",
+                     "dst_node": f"s{(i - 1) % num_switches + 1}",
+                     "src_IP": host_address(i)}
+                    for i in range(1, num_hosts + 1)])
+    return topo
+
+
+def best_of(func, arg, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = func(arg)
+        best = min(best, time.perf_counter() - started_at)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'hosts':>8} {'per-element':>12} {'bulk':>10} {'speedup':>8}")
+    for size in args.sizes:
+        per_element_s, a = best_of(build_per_element, size, args.repeat)
+        bulk_s, b = best_of(build_bulk, size, args.repeat)
+        assert a.dictform() == b.dictform(), "bulk build differs"
+        print(f"{size:>8} {per_element_s:>11.3f}s {bulk_s:>9.3f}s "
+              f"{per_element_s / bulk_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
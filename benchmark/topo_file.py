@@ -0,0 +1,94 @@
+"""Size and speed of Topo.save/Topo.load against the dictform() JSON.
+
+For each fat-tree size, reports the file size of the line-delimited topo file
+and of the full JSON document, the save and load times of both, the time to
+open the file with TopoFile and read one node and one link, and the peak
+Python memory while loading.
+
+Usage:
+    python -m benchmark.topo_file [--k 16 32] [--dir /tmp]
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+from klonet_api import Topo, TopoFile
+from klonet_api.common import Image
+from klonet_api.generators import generate_topo
+
+HOST_IMAGE = Image(type="host", subtype="ubuntu", image_name="ubuntu:20.04",
+                   resource_limit={"cpu": "100", "mem": "1024"},
+                   config={"worker_specified": ""}, interfaces=[])
+SWITCH_IMAGE = Image(type="switch", subtype="ovs", image_name="ovs:latest",
+                     resource_limit={"cpu": "100", "mem": "512"},
+                     config={"worker_specified": ""}, interfaces=[])
+
+
+def timed(func):
+    started_at = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started_at
+
+
+def peak_memory_mb(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def save_json(topo, path):
+    with open(path, "w") as fp:
+        json.dump(topo.dictform(), fp)
+
+
+def load_json(path):
+    with open(path) as fp:
+        return Topo(**json.load(fp))
+
+
+def open_and_peek(path):
+    with TopoFile(path) as topo_file:
+        topo_file.get_nodes()["h1"]
+        topo_file.get_links()["l1"]
+
+
+def run_case(k, directory):
+    topo = generate_topo("fattree", HOST_IMAGE, SWITCH_IMAGE, "10.0.0.0/8",
+                         k=k)
+    topo_path = os.path.join(directory, f"fattree_k{k}.topo")
+    json_path = os.path.join(directory, f"fattree_k{k}.json")
+
+    _, save_s = timed(lambda: topo.save(topo_path))
+    _, save_json_s = timed(lambda: save_json(topo, json_path))
+    _, load_s = timed(lambda: Topo.load(topo_path))
+    _, load_json_s = timed(lambda: load_json(json_path))
+    _, open_s = timed(lambda: open_and_peek(topo_path))
+    load_mb = peak_memory_mb(lambda: Topo.load(topo_path))
+    load_json_mb = peak_memory_mb(lambda: load_json(json_path))
+
+    print(f"fattree k={k}: {len(topo.get_nodes())} nodes, "
+          f"{len(topo.get_links())} links")
+    print(f"  {'':10s} {'size':>10s} {'save':>8s} {'load':>8s} {'peak mem':>9s}")
+    print(f"  {'topo file':10s} {os.path.getsize(topo_path) / 2 ** 20:8.2f}MB "
+          f"{save_s:7.3f}s {load_s:7.3f}s {load_mb:7.1f}MB")
+    print(f"  {'json':10s} {os.path.getsize(json_path) / 2 ** 20:8.2f}MB "
+          f"{save_json_s:7.3f}s {load_json_s:7.3f}s {load_json_mb:7.1f}MB")
+    print(f"  TopoFile open + 1 node + 1 link: {open_s * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, nargs="+", default=[16, 32])
+    parser.add_argument("--dir", default="/tmp")
+    args = parser.parse_args()
+    for k in args.k:
+        run_case(k, args.dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Parse and transfer time of a large topology document.
+
+Builds a /re/project/ style document for a 5k-node topology, then measures:
+  1. json parse/encode time with the stdlib and with klonet_api's codec
+     (orjson when installed),
+  2. raw and gzip payload sizes,
+  3. end-to-end time of Manager._get + _parse_resp against a loopback HTTP
+     server, with and without gzip on the wire.
+
+Usage:
+    python -m benchmark.topo_payload [--nodes 5000] [--repeat 5]
+"""
+import argparse
+import gzip
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from klonet_api.common import Manager, codec
+
+
+def make_project_document(num_nodes):
+    hosts, switches, links = {}, {}, {}
+    num_switches = max(num_nodes // 10, 1)
+    for i in range(1, num_switches + 1):
+        switches[f"s{i}"] = {
+            "name": f"s{i}", "type": "switch", "subtype": "ovs",
+            "image_name": "ovs:latest", "x": i % 700, "y": 100,
+            "resource_limit": {"cpu": "100", "mem": "512"},
+            "config": {"worker_specified": ""}, "interfaces": [],
+        }
+    for i in range(1, num_nodes - num_switches + 1):
+        switch = f"s{(i - 1) % num_switches + 1}"
+        ip = f"10.{i // 65536}.{i // 256 % 256}.{i % 256}"
+        hosts[f"h{i}"] = {
+            "name": f"h{i}", "type": "host", "subtype": "ubuntu",
+            "image_name": "ubuntu:20.04", "x": i % 700, "y": 400,
+            "resource_limit": {"cpu": "100", "mem": "1024"},
+            "config": {"worker_specified": ""},
+            "interfaces": [{"ip": ip, "netmask": "255.0.0.0",
+                            "name": f"h{i}{switch}"}],
+        }
+        links[f"l{i}"] = {
+            "name": f"l{i}", "source": f"h{i}", "sourceIP": f"{ip}/8",
+            "sourceType": "host", "target": switch, "targetIP": "",
+            "targetType": "switch",
+            "config": {end: {"bw_kbit": "", "queue_size_byte": "",
+                             "delay_us": "", "loss_rate": "",
+                             "jitter_us": "", "correlation": "",
+                             "delay_distribution": "normal"}
+                       for end in ("source", "target")},
+        }
+    topo = {"hosts": hosts, "switches": switches, "routers": {},
+            "controllers": {}, "links": links}
+    return {"code": 1, "msg": "success", "project": {"topo": topo}}
+
+
+def best_of(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return min(samples), statistics.median(samples)
+
+
+def serve(raw, compressed):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            use_gzip = (self.path.startswith("/gzip")
+                        and "gzip" in self.headers.get("Accept-Encoding", ""))
+            body = compressed if use_gzip else raw
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            if use_gzip:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--bandwidth-mbps", type=float, default=100,
+                        help="link speed used to estimate WAN transfer time")
+    args = parser.parse_args()
+
+    document = make_project_document(args.nodes)
+    raw = json.dumps(document).encode()
+    compressed = gzip.compress(raw, compresslevel=5)
+
+    print(f"topology: {args.nodes} nodes, json backend: {codec.backend}")
+    print(f"payload: {len(raw) / 1e6:.2f} MB raw, "
+          f"{len(compressed) / 1e6:.2f} MB gzip "
+          f"({len(compressed) / len(raw):.1%})")
+    for label, size in (("raw", len(raw)), ("gzip", len(compressed))):
+        print(f"  est. transfer @ {args.bandwidth_mbps:g} Mbit/s ({label}): "
+              f"{size * 8 / (args.bandwidth_mbps * 1e6) * 1000:.1f} ms")
+
+    rows = [
+        ("parse  stdlib json", lambda: json.loads(raw)),
+        (f"parse  codec ({codec.backend})", lambda: codec.loads(raw)),
+        ("encode stdlib json", lambda: json.dumps(document).encode()),
+        (f"encode codec ({codec.backend})", lambda: codec.dumps(document)),
+        ("gzip compress", lambda: gzip.compress(raw, compresslevel=5)),
+        ("gzip decompress", lambda: gzip.decompress(compressed)),
+    ]
+
+    server = serve(raw, compressed)
+    manager = Manager("127.0.0.1", server.server_address[1])
+    rows += [
+        ("GET + parse over loopback (raw)",
+         lambda: manager._parse_resp(manager._get("/raw"))),
+        ("GET + parse over loopback (gzip)",
+         lambda: manager._parse_resp(manager._get("/gzip"))),
+    ]
+
+    print(f"\n{'operation':<36}{'best ms':>10}{'median ms':>12}")
+    for label, func in rows:
+        best, median = best_of(func, args.repeat)
+        print(f"{label:<36}{best * 1000:>10.1f}{median * 1000:>12.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
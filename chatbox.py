@@ -22,6 +22,8 @@ save_dir = "output"
 os.makedirs(save_dir, exist_ok=True)
 
 pn.extension("floatpanel", notifications=True)
+# Show deploy/destroy progress while the agent's code is running
+kai.on_progress = lambda event: pn.state.notifications.info(str(event))
 
 # Login to Klonet backend.
 project_name_input = pn.widgets.TextInput(name="Project:", value="")
@@ -245,7 +247,44 @@ USER_NAME = "User"
 AGENT_NAME = "KAI"
 
 
+def format_stats(stats):
+    rows = ["| Endpoint | Method | Calls | Avg (ms) | Max (ms) | Sent (KB) | Received (KB) | Errors |",
+            "| --- | --- | --- | --- | --- | --- | --- | --- |"]
+    for item in stats["requests"]:
+        avg_ms = item["latency_sum_s"] / item["count"] * 1000 if item["count"] else 0
+        errors = dict(item["errors"])
+        errors.update({f"HTTP {status}": count for status, count in item["statuses"].items()
+                       if not status.startswith("2")})
+        rows.append(f"| {item['endpoint']} | {item['method']} | {item['count']} | {avg_ms:.1f} | "
+                    f"{item['latency_max_s'] * 1000:.1f} | {item['request_bytes'] / 1024:.1f} | "
+                    f"{item['response_bytes'] / 1024:.1f} | "
+                    f"{', '.join(f'{k}: {v}' for k, v in errors.items()) or '-'} |")
+    if len(rows) == 2:
+        return "No requests have been sent to Klonet yet."
+    return "\n".join(rows)
+
+
 def command_handler(command):
+    if command == "/stats":
+        chat_box.append({AGENT_NAME: format_stats(kai.stats())})
+        return
+
+    if command == "/save_topo":
+        save_path = os.path.join(save_dir, f"topo-{datetime.now().strftime('%Y%m%d-%H%M%S')}.topo")
+        kai.save_topo(save_path)
+        chat_box.append({AGENT_NAME: f"The topology has been saved at {save_path}."})
+        return
+    if command.startswith("/load_topo"):
+        load_path = command[len("/load_topo"):].strip()
+        try:
+            topo = kai.load_topo(load_path)
+        except (OSError, ValueError) as e:
+            chat_box.append({AGENT_NAME: f"Failed to load the topology: {e}"})
+            return
+        chat_box.append({AGENT_NAME: f"Loaded {len(topo.get_nodes())} nodes and "
+                                     f"{len(topo.get_links())} links from {load_path}."})
+        return
+
     if not kai.is_agent_initialized:
         chat_box.append({AGENT_NAME: "Agent not found, please initialize the agent first."})
         return
@@ -352,6 +391,8 @@ quick_command_selector = pn.widgets.Select(
         "/reset_chat",
         "/reset_topo",
         "/save",
+        "/save_topo",
+        "/stats",
     ],
     value="/clear",
     width=247
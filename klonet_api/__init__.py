@@ -6,5 +6,24 @@ from .link import LinkManager
 from .node import NodeManager
 from .project import ProjectManager
 from .cmd import CmdManager
-from .common.base_classes import Node, Image, Link, Topo, LinkConfiguration
-from .common.errors import *
\ No newline at end of file
+from .aio import (AsyncImageManager, AsyncProjectManager, AsyncNodeManager,
+    AsyncLinkManager, AsyncCmdManager)
+from .common.base_classes import (Node, Image, Link, Topo, TopoFile,
+    LinkConfiguration)
+from .common.errors import *
+from .common.validation import validate_topo, ValidationReport, ValidationIssue
+from .common.transport import configure_pool, connection_stats, request_deadline
+from .common.cache import project_snapshots
+from .common.metrics import request_metrics
+from .common.history import (deploy_history, topo_shape, DeployHistory,
+    DeployRecord)
+from .generators import generate_topo, TOPOLOGY_TYPES
+from .layout import layout_topo, LAYOUT_MODES
+from .graph import TopoGraph
+from .progress import (watch_progress, milestones, ProgressEvent,
+    OperationHandle)
+from .staged import plan_staged, StagedPlan
+from .orchestrate import (deploy_projects, destroy_projects,
+    OrchestrationReport, ProjectResult)
+from .reconcile import (diff_topo, plan_reconcile, apply_plan, TopoDiff,
+    ReconcilePlan, PlanStep, PLAN_ACTIONS)
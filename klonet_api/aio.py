@@ -0,0 +1,132 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from . import config
+from .image import ImageManager
+from .link import LinkManager
+from .node import NodeManager
+from .project import ProjectManager
+from .cmd import CmdManager
+from .common.transport import ensure_pool_size
+
+
+'''异步管理类
+
+各异步管理类包装了对应的同步管理类，方法名、参数、返回值及异常（HttpStatusError、
+VemuExecError等）均与同步版本一致，只是需要await调用。请求在一个有界的线程池中执行，
+因此可使用asyncio.gather并发地发起大量运行时操作，例如：
+
+    async with AsyncNodeManager(user, project, max_concurrency=32) as nm:
+        await asyncio.gather(*[nm.dynamic_add_node(f"h{i}", image)
+            for i in range(1, 101)])
+'''
+
+
+def _async_method(name):
+    async def method(self, *args, **kwargs):
+        return await self._run(getattr(self._manager, name), *args, **kwargs)
+
+    method.__name__ = name
+    method.__qualname__ = name
+    method.__doc__ = f"{name}的异步版本，参数、返回值及异常与同步版本相同。"
+    return method
+
+
+class AsyncManager(object):
+    '''异步管理类的基类
+
+    Attributes:
+        max_concurrency(int): 同时进行中的请求数上限
+    '''
+    manager_class = None
+
+    def __init__(self, *args, max_concurrency=None, **kwargs):
+        self._manager = self.manager_class(*args, **kwargs)
+        self.max_concurrency = max_concurrency or config.pool_maxsize
+        if self.max_concurrency <= 0:
+            raise ValueError(f"max_concurrency must be positive, "
+                f"got {self.max_concurrency}")
+        # 保证并发请求都能复用连接池中的连接
+        ensure_pool_size(self._manager.url, self.max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix=type(self).__name__)
+
+    def __getattr__(self, name):
+        # user、project等属性直接取自被包装的同步管理类
+        if name == "_manager":
+            raise AttributeError(name)
+        return getattr(self._manager, name)
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor,
+            functools.partial(func, *args, **kwargs))
+
+    def close(self):
+        '''等待进行中的请求结束，并释放线程池'''
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AsyncImageManager(AsyncManager):
+    '''ImageManager的异步版本'''
+    manager_class = ImageManager
+
+    get_images = _async_method("get_images")
+
+
+class AsyncProjectManager(AsyncManager):
+    '''ProjectManager的异步版本'''
+    manager_class = ProjectManager
+
+    deploy = _async_method("deploy")
+    destroy = _async_method("destroy")
+    async_deploy = _async_method("async_deploy")
+    async_destroy = _async_method("async_destroy")
+    reconcile = _async_method("reconcile")
+    deploy_staged = _async_method("deploy_staged")
+    get_topo = _async_method("get_topo")
+    get_projects = _async_method("get_projects")
+    deploy_with_topo_description_dict = _async_method(
+        "deploy_with_topo_description_dict")
+
+
+class AsyncNodeManager(AsyncManager):
+    '''NodeManager的异步版本'''
+    manager_class = NodeManager
+
+    dynamic_add_node = _async_method("dynamic_add_node")
+    dynamic_delete_node = _async_method("dynamic_delete_node")
+    get_nodes = _async_method("get_nodes")
+    get_node = _async_method("get_node")
+    ssh_service = _async_method("ssh_service")
+    get_port_mapping = _async_method("get_port_mapping")
+    modify_port_mapping = _async_method("modify_port_mapping")
+    get_nic_nickname2realname = _async_method("get_nic_nickname2realname")
+    get_nic_realname2nickname = _async_method("get_nic_realname2nickname")
+    get_node_worker_ip = _async_method("get_node_worker_ip")
+
+
+class AsyncLinkManager(AsyncManager):
+    '''LinkManager的异步版本'''
+    manager_class = LinkManager
+
+    dynamic_add_link = _async_method("dynamic_add_link")
+    dynamic_delete_link = _async_method("dynamic_delete_link")
+    config_link = _async_method("config_link")
+    clear_link_configuration = _async_method("clear_link_configuration")
+    get_links = _async_method("get_links")
+    get_link = _async_method("get_link")
+
+
+class AsyncCmdManager(AsyncManager):
+    '''CmdManager的异步版本'''
+    manager_class = CmdManager
+
+    exec_cmds_in_nodes = _async_method("exec_cmds_in_nodes")
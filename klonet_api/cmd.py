@@ -1,4 +1,4 @@
-from .common import Manager
+from .common import Manager, endpoint_timeout
 
 class CmdManager(Manager):
     '''命令管理类
@@ -39,7 +39,10 @@ class CmdManager(Manager):
             "block": block,
             "cmd_timeout_s": timeout
         }
-        resp = self._post("/master/node_exec_cmd/", json=payload)
+        # 读取超时需覆盖命令本身的超时时间
+        connect_s, read_s = endpoint_timeout("/master/node_exec_cmd/")
+        resp = self._post("/master/node_exec_cmd/", json=payload,
+            timeout=(connect_s, max(read_s, timeout + 30)))
         resp_json = self._parse_resp(resp)
         self._check_resp_code(resp_json)
 
@@ -1,3 +1,14 @@
 from .base_funcs import *
 from .base_classes import *
-from .errors import *
\ No newline at end of file
+from .errors import *
+from .transport import (configure_pool, connection_stats, close_sessions,
+    read_json, request_deadline, endpoint_timeout, get_breaker, CircuitBreaker,
+    add_request_hook, remove_request_hook, set_adapter_factory)
+from .cache import project_snapshots
+from .singleflight import inflight_gets
+from .metrics import request_metrics
+from .replay import recording, replaying
+from .address_pool import AddressPool, plan_link_addresses
+from .validation import validate_topo, ValidationReport, ValidationIssue
+from .history import (deploy_history, topo_shape, DeployHistory, DeployRecord,
+    DurationModel)
@@ -0,0 +1,367 @@
+import numpy as np
+from .base_funcs import ip_to_int, int_to_ip, prefix_to_mask
+from .errors import AddressPoolExhaustedError, AddressConflictError
+
+
+'''地址池
+
+AddressPool从父网段中划分子网并分配地址，全部以整数运算完成：地址池内的每个地址在
+两张位图中各占一位，一张记录已划分（或已被现有接口的子网占用）的地址，一张记录已分配
+给接口的地址。划分2^n大小的子网时，将位图按2^n分块，取第一个完全空闲的块，批量划分时
+一次取出所需的全部块。
+
+可划分的子网包括：
+    点对点子网  /30（两端分别为第1、2个地址）或/31（RFC 3021，两端为第0、1个地址）
+    主机子网    足以容纳指定数量主机的最小子网，网络地址、第1个地址（保留给网关）及
+                广播地址不分配，主机从第2个地址开始依次分配
+
+plan_link_addresses根据拓扑为链路批量规划地址：两端均为主机/路由器的链路各分配一个
+点对点子网；连接交换机的主机/路由器，按交换机组成的二层网络（以交换机之间的链路连通
+的交换机集合）分组，同一二层网络中的主机分配在同一子网内，若该二层网络中已有主机配置
+了地址，则沿用其子网。规划前会登记拓扑中所有现有接口的地址，同一地址被多个接口使用时
+触发AddressConflictError。例子：
+
+    pool = AddressPool("10.0.0.0/16")
+    topo.assign_addresses(pool)
+    link_manager.dynamic_add_link("l9", h9, s1, address_pool=pool)
+'''
+
+#: int: 地址池父网段的最短前缀长度，即地址池最大为/8
+MIN_POOL_PREFIX = 8
+#: tuple: 需要配置ip的节点类别，其余类别（如交换机）的端口不配置ip
+ADDRESSED_CATEGORIES = ("hosts", "routers")
+
+
+def _parse_cidr(cidr):
+    '''解析cidr形式的地址，返回(网络地址, 前缀长度, 地址)，均为整数；不带前缀时视为/32'''
+    address, _, prefix = cidr.partition("/")
+    prefix_len = int(prefix) if prefix else 32
+    if not 0 <= prefix_len <= 32:
+        raise ValueError(f"Address [{cidr}] is illegal, please check!")
+    value = ip_to_int(address)
+    return value & prefix_to_mask(prefix_len), prefix_len, value
+
+
+def _netmask_prefix(netmask):
+    '''将地址类型的掩码转换为int类型的掩码，如255.255.255.0转换为24'''
+    return bin(ip_to_int(netmask)).count("1")
+
+
+class AddressPool(object):
+    '''从父网段中划分子网、分配地址的地址池
+
+    Attributes:
+        network(str): 父网段，如10.0.0.0/16
+        prefix_len(int): 父网段的前缀长度
+    '''
+    def __init__(self, network):
+        '''
+        Args:
+            network(str): 父网段，如10.0.0.0/16，主机位非0时按所在网段处理
+
+        Raises:
+            ValueError: 网段不合法，或大于/8时，触发此异常
+        '''
+        base, prefix_len, _ = _parse_cidr(network)
+        if prefix_len < MIN_POOL_PREFIX:
+            raise ValueError(f"Address pool [{network}] is too large, the prefix "
+                f"length should be at least {MIN_POOL_PREFIX}")
+        self._base = base
+        self.prefix_len = prefix_len
+        self.network = f"{int_to_ip(base)}/{prefix_len}"
+        size = 1 << (32 - prefix_len)
+        self._allocated = np.zeros(size, dtype=bool) # 属于已划分/已占用的子网
+        self._assigned = np.zeros(size, dtype=bool) # 已分配给接口
+
+    def __repr__(self):
+        return (f"AddressPool({self.network!r}, "
+            f"free={self.free_addresses}/{len(self._allocated)})")
+
+    def __contains__(self, cidr):
+        network, prefix_len, _ = _parse_cidr(cidr)
+        offset = network - self._base
+        return 0 <= offset and offset + (1 << (32 - prefix_len)) \
+            <= len(self._allocated)
+
+    @property
+    def free_addresses(self):
+        '''尚未被划分的地址数'''
+        return int(len(self._allocated) - np.count_nonzero(self._allocated))
+
+    def _span(self, network, prefix_len):
+        '''子网与地址池的重叠部分在位图中的[start, end)，不重叠时返回None'''
+        start = network - self._base
+        end = start + (1 << (32 - prefix_len))
+        start, end = max(start, 0), min(end, len(self._allocated))
+        return (start, end) if start < end else None
+
+    def _allocate_blocks(self, prefix_len, count):
+        '''划分count个前缀长度为prefix_len的空闲子网，返回各子网在位图中的起始下标'''
+        if not self.prefix_len <= prefix_len <= 32:
+            raise ValueError(f"Cannot carve a /{prefix_len} subnet out of "
+                f"{self.network}")
+        block_size = 1 << (32 - prefix_len)
+        blocks = self._allocated.reshape(-1, block_size)
+        free = np.flatnonzero(~blocks.any(axis=1))
+        if len(free) < count:
+            raise AddressPoolExhaustedError(f"{count} /{prefix_len} subnet(s) "
+                f"are required but only {len(free)} are free in {self.network}")
+        free = free[:count]
+        blocks[free] = True
+        return free * block_size
+
+    def allocate(self, prefix_len, count=1):
+        '''划分count个空闲子网
+
+        Args:
+            prefix_len(int): 子网的前缀长度，如24
+            count(int): 子网数量
+
+        Returns:
+            子网列表，如["10.0.0.0/24", "10.0.1.0/24"]
+
+        Raises:
+            AddressPoolExhaustedError: 空闲的子网不足时，触发此异常，此时不划分任何子网
+        '''
+        starts = self._allocate_blocks(prefix_len, count)
+        return [f"{int_to_ip(self._base + start)}/{prefix_len}"
+            for start in starts.tolist()]
+
+    def allocate_p2p(self, count, prefix_len=30):
+        '''划分count个点对点子网，并为两端分配地址
+
+        Args:
+            count(int): 子网数量
+            prefix_len(int): 30或31，默认为30
+
+        Returns:
+            列表，每个元素为两端的cidr形式的地址，如[("10.0.0.1/30", "10.0.0.2/30")]
+
+        Raises:
+            AddressPoolExhaustedError: 空闲的子网不足时，触发此异常
+        '''
+        if prefix_len not in (30, 31):
+            raise ValueError(f"Point-to-point subnets should be /30 or /31, "
+                f"got /{prefix_len}")
+        first = self._allocate_blocks(prefix_len, count) \
+            + (1 if prefix_len == 30 else 0)
+        self._assigned[first] = True
+        self._assigned[first + 1] = True
+        return [(f"{int_to_ip(self._base + a)}/{prefix_len}",
+                 f"{int_to_ip(self._base + a + 1)}/{prefix_len}")
+            for a in first.tolist()]
+
+    def allocate_hosts(self, num_hosts, subnet=None):
+        '''为num_hosts个主机分配同一子网内的地址
+
+        Args:
+            num_hosts(int): 主机数量
+            subnet(str): 从该子网中分配空闲地址，须位于地址池内。默认为None，即划分
+                一个足以容纳全部主机的最小子网
+
+        Returns:
+            (子网, 地址列表)，如("10.0.0.0/29", ["10.0.0.2/29", "10.0.0.3/29"])
+
+        Raises:
+            AddressPoolExhaustedError: 空闲的子网或子网内的空闲地址不足时，触发此异常
+            AddressConflictError: subnet不在地址池内时，触发此异常
+        '''
+        if subnet is None:
+            # 另需网络地址、网关地址和广播地址
+            prefix_len = 32 - max(2, (num_hosts + 2).bit_length())
+            network = self._base + int(self._allocate_blocks(prefix_len, 1)[0])
+        else:
+            if subnet not in self:
+                raise AddressConflictError(f"Subnet [{subnet}] is not within "
+                    f"the address pool {self.network}")
+            network, prefix_len, _ = _parse_cidr(subnet)
+            start, end = self._span(network, prefix_len)
+            self._allocated[start:end] = True
+        low = network - self._base + 2
+        high = network - self._base + (1 << (32 - prefix_len)) - 1
+        free = low + np.flatnonzero(~self._assigned[low:high])
+        if len(free) < num_hosts:
+            raise AddressPoolExhaustedError(f"{num_hosts} address(es) are "
+                f"required but only {len(free)} are free in "
+                f"{int_to_ip(network)}/{prefix_len}")
+        chosen = free[:num_hosts]
+        self._assigned[chosen] = True
+        return (f"{int_to_ip(network)}/{prefix_len}",
+            [f"{int_to_ip(self._base + offset)}/{prefix_len}"
+             for offset in chosen.tolist()])
+
+    def reserve(self, cidr, strict=True):
+        '''登记已使用的地址：所在子网不再被划分，地址本身不再被分配
+
+        Args:
+            cidr(str): cidr形式的地址，如10.0.0.5/24；不带前缀时视为/32
+            strict(bool): 为True时，若地址已被分配则触发AddressConflictError
+
+        Raises:
+            AddressConflictError: strict为True且地址已被分配时，触发此异常
+        '''
+        network, prefix_len, value = _parse_cidr(cidr)
+        span = self._span(network, prefix_len)
+        if span is None:
+            return
+        offset = value - self._base
+        if 0 <= offset < len(self._assigned):
+            if strict and self._assigned[offset]:
+                raise AddressConflictError(f"Address [{cidr}] is already "
+                    f"assigned in {self.network}")
+            self._assigned[offset] = True
+        self._allocated[span[0]:span[1]] = True
+
+    def release(self, subnet):
+        '''释放子网，其中的地址可再次被划分、分配
+
+        Args:
+            subnet(str): allocate等方法返回的子网，如10.0.0.0/30
+        '''
+        span = self._span(*_parse_cidr(subnet)[:2])
+        if span is not None:
+            self._allocated[span[0]:span[1]] = False
+            self._assigned[span[0]:span[1]] = False
+
+    def reserve_topo(self, topo_dict):
+        '''登记拓扑中所有现有接口的地址
+
+        Args:
+            topo_dict(dict): 拓扑字典，即Topo.dictform()或项目快照
+
+        Raises:
+            AddressConflictError: 同一地址被多个接口使用时，触发此异常，消息中列出全部
+                冲突的地址
+        '''
+        owners = {} # ip -> [(节点名, 网卡名)]
+        cidrs = []
+        for category, elements in topo_dict.items():
+            if category == "links":
+                continue
+            for node_name, node_dict in elements.items():
+                for interface in node_dict.get("interfaces") or ():
+                    ip, netmask = interface.get("ip"), interface.get("netmask")
+                    if not ip:
+                        continue
+                    owners.setdefault(ip, []).append(
+                        (node_name, interface.get("name")))
+                    cidrs.append(f"{ip}/{_netmask_prefix(netmask)}"
+                        if netmask else ip)
+        conflicts = {ip: users for ip, users in owners.items() if len(users) > 1}
+        if conflicts:
+            raise AddressConflictError("Addresses used by more than one "
+                "interface: " + "; ".join(f"{ip} used by "
+                + ", ".join(f"{node}({nic})" for node, nic in users)
+                for ip, users in sorted(conflicts.items())))
+        for cidr in cidrs:
+            self.reserve(cidr, strict=False)
+
+    def _snapshot(self):
+        return self._allocated.copy(), self._assigned.copy()
+
+    def _restore(self, state):
+        self._allocated, self._assigned = state
+
+
+def _l2_domains(categories, links):
+    '''以交换机之间的链路合并交换机，返回交换机名 -> 所在二层网络的代表交换机'''
+    parents = {}
+
+    def find(name):
+        root = name
+        while parents.get(root, root) != root:
+            root = parents[root]
+        while parents.get(name, name) != root:
+            parents[name], name = root, parents[name]
+        return root
+
+    for link in links.values():
+        src, dst = link["source"], link["target"]
+        if categories.get(src) == "switches" and categories.get(dst) == "switches":
+            parents[find(src)] = find(dst)
+    return find
+
+
+def plan_link_addresses(topo_dict, pool, link_names=None, p2p_prefix=30):
+    '''为链路批量规划地址，不修改topo_dict
+
+    两端均为主机/路由器且均未配置ip的链路，分配一个点对点子网；主机/路由器与交换机
+    之间、主机/路由器一端未配置ip的链路，按交换机所在的二层网络分组分配主机子网。
+    其余链路（如交换机之间的链路）不配置ip。
+
+    Args:
+        topo_dict(dict): 拓扑字典，即Topo.dictform()或项目快照
+        pool(AddressPool): 地址池，规划前会登记topo_dict中所有现有接口的地址
+        link_names(iterable): 要规划的链路名，默认为None，即全部链路
+        p2p_prefix(int): 点对点子网的前缀长度，30或31，默认为30
+
+    Returns:
+        字典，链路名 -> (源端地址, 目的端地址)，只包含需要新增地址的链路。例子：
+        {"l1": ("10.0.0.2/29", ""), "l7": ("10.0.1.1/30", "10.0.1.2/30")}
+
+    Raises:
+        AddressConflictError: 同一地址被多个接口使用时，触发此异常
+        AddressPoolExhaustedError: 地址池空闲地址不足时，触发此异常，此时地址池不变
+    '''
+    links = topo_dict["links"]
+    categories = {name: category for category, elements in topo_dict.items()
+        if category != "links" for name in elements}
+    find = _l2_domains(categories, links)
+
+    p2p_links = []
+    lan_members = {} # 二层网络 -> [(链路名, "source"/"target")]
+    lan_subnets = {} # 二层网络 -> 其中已配置的主机子网
+    targets = set(links) if link_names is None else set(link_names)
+    for link_name, link in links.items():
+        src_category = categories[link["source"]]
+        dst_category = categories[link["target"]]
+        if src_category in ADDRESSED_CATEGORIES \
+                and dst_category in ADDRESSED_CATEGORIES:
+            if link_name in targets and not link["sourceIP"] \
+                    and not link["targetIP"]:
+                p2p_links.append(link_name)
+            continue
+        for side, switch, category, ip in (
+                ("source", link["target"], src_category, link["sourceIP"]),
+                ("target", link["source"], dst_category, link["targetIP"])):
+            if category not in ADDRESSED_CATEGORIES \
+                    or categories[switch] != "switches":
+                continue
+            domain = find(switch)
+            if ip:
+                network, prefix_len, _ = _parse_cidr(ip)
+                lan_subnets.setdefault(domain,
+                    f"{int_to_ip(network)}/{prefix_len}")
+            elif link_name in targets:
+                lan_members.setdefault(domain, []).append((link_name, side))
+
+    state = pool._snapshot()
+    try:
+        pool.reserve_topo(topo_dict)
+        plan = {}
+        if p2p_links:
+            for link_name, pair in zip(p2p_links,
+                    pool.allocate_p2p(len(p2p_links), p2p_prefix)):
+                plan[link_name] = pair
+        # 地址池之外的已有子网，以该子网为地址池分配
+        outside_pools = {}
+        for domain, members in lan_members.items():
+            subnet = lan_subnets.get(domain)
+            target_pool = pool
+            if subnet is not None and subnet not in pool:
+                target_pool = outside_pools.get(subnet)
+                if target_pool is None:
+                    target_pool = outside_pools[subnet] = AddressPool(subnet)
+                    target_pool.reserve_topo(topo_dict)
+            _, addresses = target_pool.allocate_hosts(len(members), subnet)
+            for (link_name, side), address in zip(members, addresses):
+                link = links[link_name]
+                src_IP, dst_IP = plan.get(link_name,
+                    (link["sourceIP"], link["targetIP"]))
+                plan[link_name] = (address, dst_IP) if side == "source" \
+                    else (src_IP, address)
+    except Exception:
+        pool._restore(state)
+        raise
+    return plan
+
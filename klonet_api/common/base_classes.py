@@ -1,8 +1,17 @@
 import requests
 import copy
+from collections.abc import Mapping
 from .. import config
-from .base_funcs import cidr2ip_and_netmask, get_plural_of_words
+from .base_funcs import (cidr2ip_and_netmask, cidr_netmask, is_cidr_leagal,
+    get_plural_of_words)
 from .errors import *
+from .transport import (backend_url, get_session, get_breaker,
+    encode_json_body, read_json, remaining_time, send)
+from .singleflight import inflight_gets, request_key
+from .cache import project_snapshots
+from .address_pool import AddressPool, plan_link_addresses
+from .topo_file import write_topo, read_topo, TopoFileIndex
+from .validation import validate_topo
 
 
 '''基础类'''
@@ -11,8 +20,12 @@ class Manager(object):
     '''vemu api的manager基类
     
     提供：1. 后端ip和端口的配置。
-    2. 基本的post/get等请求方式的封装。
-    3. 对response的解析。
+    2. 基本的post/get等请求方式的封装。同一后端的所有Manager共享一个keep-alive的
+    Session（见transport模块），以复用TCP连接；所有请求均带有超时，幂等请求失败
+    时自动重试，后端持续失败时由熔断器快速失败；相同的并发GET请求会被合并（见
+    singleflight模块）。
+    3. 对request/response的json编解码（见codec模块）及response的解析。
+    4. 项目快照的读取与失效（见cache模块）。
 
     Attributes:
         backend_ip(str): 后端服务器IP
@@ -26,23 +39,58 @@ class Manager(object):
             except AttributeError:
                 raise ValueError("Please config backend_ip and backend_port by "
                 "function args or config.py!")
-        self.url = (f"http://{backend_ip}:{backend_port}")
+        self.backend_ip = backend_ip
+        self.backend_port = backend_port
+        self.url = backend_url(backend_ip, backend_port)
+        self._session = get_session(self.url)
+        self._breaker = get_breaker(self.url)
+
+    def _request(self, method, url_suffix, json=None, **kwargs):
+        if json is not None:
+            kwargs["data"], headers = encode_json_body(json)
+            kwargs["headers"] = {**kwargs.get("headers", {}), **headers}
+        return send(self._session, method, f"{self.url}{url_suffix}",
+            url_suffix=url_suffix, breaker=self._breaker, **kwargs)
+
+    def _post(self, url_suffix, json=None, data=None, files=None, **kwargs):
+        return self._request("POST", url_suffix, json=json, data=data,
+            files=files, **kwargs)
+
+    def _delete(self, url_suffix, json=None, data=None, **kwargs):
+        return self._request("DELETE", url_suffix, json=json, data=data,
+            **kwargs)
+
+    def _put(self, url_suffix, json=None, data=None, **kwargs):
+        return self._request("PUT", url_suffix, json=json, data=data, **kwargs)
+
+    def _get(self, url_suffix, json=None, data=None, params=None,
+            project=None, **kwargs):
+        '''发出GET请求。
+
+        相同的GET请求并发发出时（无论来自同一线程池还是不同的回调），只有一个会真正
+        发往后端，其余调用共享其Response对象及解析后的json。合并的key包含项目的
+        代数（见ProjectSnapshotCache.generation），修改项目后发出的请求不会共享修改
+        前已发出的请求的结果。
 
-    def _post(self, url_suffix, json=None, data=None):
-        return requests.post(url=f"{self.url}{url_suffix}", 
-            json=json, data=data)
-
-    def _delete(self, url_suffix, json=None, data=None):
-        return requests.delete(url=f"{self.url}{url_suffix}", 
-            json=json, data=data)
-
-    def _put(self, url_suffix, json=None, data=None):
-        return requests.put(url=f"{self.url}{url_suffix}", 
-            json=json, data=data)
-
-    def _get(self, url_suffix, json=None, data=None, params=None):
-        return requests.get(url=f"{self.url}{url_suffix}", 
-            json=json, data=data, params=params)
+        Args:
+            project(tuple): 请求读取的(用户名, 项目名)。默认为None，即该后端的任一
+                项目被修改后都不再合并到之前的请求
+        '''
+        def fetch():
+            resp = self._request("GET", url_suffix, json=json, data=data,
+                params=params, **kwargs)
+            try:
+                read_json(resp) # 预先解析，供共享此响应的调用方直接使用
+            except ValueError:
+                pass
+            return resp
+
+        if not getattr(config, "coalesce_gets", True):
+            return fetch()
+        scope = self.url if project is None else (self.url, *project)
+        key = request_key("GET", f"{self.url}{url_suffix}", params, json,
+            data) + (project_snapshots.generation(scope),)
+        return inflight_gets.do(key, fetch, timeout=remaining_time())
 
     def _parse_resp(self, response):
         '''对response对象进行解析，返回其json格式。
@@ -66,8 +114,8 @@ class Manager(object):
 
         response_json = None
         try:
-            response_json = response.json()
-        except requests.exceptions.JSONDecodeError:
+            response_json = read_json(response)
+        except ValueError:
             raise JsonDecodeError(f"The response does not contain valid json. "
                 f"response.status_code = {response.status_code}, "
                 f"response.text = {response.text}")
@@ -96,51 +144,427 @@ class Manager(object):
             raise VemuExecError(f"Return code={resp_json[code_field]} after vemu "
                 f"execute this request, msg: {resp_json[msg_filed]}")
 
+    def _get_project_snapshot(self, user, project_name):
+        '''获取项目文档中的topo部分，优先使用未过期的项目快照。
+
+        返回的快照为缓存中的共享对象，只能读取；需要返回给用户的元素请先拷贝。
+
+        Args:
+            user(str): 用户名
+            project_name(str): 项目名
+
+        Returns:
+            一个字典，即/re/project/{project_name}/返回的project.topo
+
+        Raises:
+            HttpStatusError: 当HTTP的返回状态码不为200时，触发此异常
+            JsonDecodeError: 当返回体不包含json时，触发此异常
+            VemuExecError: 当HTTP请求成功，但json中的返回码不为1时，触发此异常
+        '''
+        key = (self.url, user, project_name)
+        snapshot = project_snapshots.get(key)
+        if snapshot is None:
+            # 读取期间若有写入，这份快照可能早于写入，不存入缓存
+            generation = project_snapshots.generation(key)
+            resp = self._get(f"/re/project/{project_name}/",
+                params={"user": user}, project=(user, project_name))
+            resp_json = self._parse_resp(resp)
+            self._check_resp_code(resp_json)
+            snapshot = resp_json["project"]["topo"]
+            project_snapshots.put(key, snapshot, generation)
+        return snapshot
+
+    def _invalidate_project_snapshot(self, user, project_name):
+        '''使项目快照失效，所有会修改项目的调用在完成（或失败）后都应调用此方法'''
+        project_snapshots.invalidate((self.url, user, project_name))
+
+def _class_attribute(cls, name):
+    '''在类及其基类中查找属性（不经过元类，因此可以找到名为__dict__的property）'''
+    for klass in cls.__mro__:
+        attribute = vars(klass).get(name)
+        if attribute is not None:
+            return attribute
+    return None
+
 class Dict2Class(object):
-    '''镜像、节点、链路等的基类'''
+    '''镜像、节点、链路等的基类
+
+    属性保存在一个字典（即dictform()的返回值）中，实例本身使用__slots__，不再额外
+    持有__dict__。为兼容已有用法，__dict__属性仍可读写，指向的就是该属性字典。
+    '''
     # https://stackoverflow.com/a/1305663
+    __slots__ = ("_properties",)
+
     def __init__(self, **properties):
-        self.__dict__.update(properties)
+        try:
+            self._properties.update(properties) # 子类已设置默认属性
+        except AttributeError:
+            self._properties = properties # **properties本身即为新字典，无需再拷贝
+
+    def __getattr__(self, name):
+        # 仅在常规查找（类属性、slots）失败时调用
+        if name == "_properties":
+            raise AttributeError(name)
+        try:
+            return self._properties[name]
+        except KeyError:
+            raise AttributeError(f"{type(self).__name__!r} object has no "
+                f"attribute {name!r}") from None
+
+    def __setattr__(self, name, value):
+        # slots及property（如__dict__）走常规赋值，其余写入属性字典
+        if hasattr(_class_attribute(type(self), name), "__set__"):
+            object.__setattr__(self, name, value)
+        else:
+            self._properties[name] = value
+
+    def __delattr__(self, name):
+        if hasattr(_class_attribute(type(self), name), "__delete__"):
+            object.__delattr__(self, name)
+            return
+        try:
+            del self._properties[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @property
+    def __dict__(self):
+        return self._properties
+
+    @__dict__.setter
+    def __dict__(self, properties):
+        self._properties = properties
+
+    def __dir__(self):
+        return list(super().__dir__()) + list(self._properties)
+
+    def __getstate__(self):
+        state = {}
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if hasattr(self, name):
+                    state[name] = object.__getattribute__(self, name)
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+    def __copy__(self):
+        # 与普通对象的浅拷贝一致：属性字典本身是新的，属性值是共享的
+        clone = type(self).__new__(type(self))
+        state = self.__getstate__()
+        state["_properties"] = dict(state["_properties"])
+        clone.__setstate__(state)
+        return clone
+
+    def dictform(self):
+        return self._properties
+
+class SlottedDict2Class(Dict2Class):
+    '''常用属性保存在__slots__中的Dict2Class
+
+    子类在__slots__中声明常用属性名，这些属性直接保存在实例的槽位中，读取速度与普通
+    属性相同，且实例不再持有属性字典；其余（如后端新增的）属性按需保存在_properties
+    字典中。
+
+    与Dict2Class一致，dictform()（及__dict__）返回的是实例本身的属性字典：第一次调用
+    时槽位中的属性被移入该字典，之后实例的全部属性都保存在其中，修改字典即修改实例，
+    反之亦然（如Topo.add_link返回的Link对象与Topo中的链路字典）。拷贝及序列化不会
+    移动属性。
+    '''
+    __slots__ = ("_live",) # 为True时全部属性保存在_properties中
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_descriptors = {name: _class_attribute(cls, name)
+            for klass in reversed(cls.__mro__)
+            for name in vars(klass).get("__slots__", ())
+            if name not in ("_properties", "_live")}
+
+    def __init__(self, **properties):
+        descriptors = self._field_descriptors
+        for name, value in properties.items():
+            descriptor = descriptors.get(name)
+            if descriptor is not None:
+                descriptor.__set__(self, value)
+            else:
+                self._set_extra(name, value)
+
+    def _is_live(self):
+        try:
+            return object.__getattribute__(self, "_live")
+        except AttributeError:
+            return False
+
+    def _set_extra(self, name, value):
+        try:
+            extra = object.__getattribute__(self, "_properties")
+        except AttributeError:
+            extra = {}
+            object.__setattr__(self, "_properties", extra)
+        extra[name] = value
+
+    def __getattr__(self, name):
+        # 仅在常规查找失败时调用：未赋值的槽位，或不在槽位中的属性
+        if name not in ("_properties", "_live"):
+            try:
+                return object.__getattribute__(self, "_properties")[name]
+            except (AttributeError, KeyError):
+                pass
+        raise AttributeError(f"{type(self).__name__!r} object has no "
+            f"attribute {name!r}")
+
+    def __setattr__(self, name, value):
+        descriptor = self._field_descriptors.get(name)
+        if descriptor is not None:
+            if self._is_live():
+                self._set_extra(name, value)
+            else:
+                descriptor.__set__(self, value)
+        elif hasattr(_class_attribute(type(self), name), "__set__"):
+            object.__setattr__(self, name, value)
+        else:
+            self._set_extra(name, value)
+
+    def __delattr__(self, name):
+        descriptor = self._field_descriptors.get(name)
+        if descriptor is not None and not self._is_live():
+            descriptor.__delete__(self)
+            return
+        try:
+            del object.__getattribute__(self, "_properties")[name]
+        except (AttributeError, KeyError):
+            raise AttributeError(name) from None
+
+    @property
+    def __dict__(self):
+        return self.dictform()
+
+    @__dict__.setter
+    def __dict__(self, properties):
+        for descriptor in self._field_descriptors.values():
+            try:
+                descriptor.__delete__(self)
+            except AttributeError:
+                pass
+        for name in ("_properties", "_live"):
+            try:
+                object.__delattr__(self, name)
+            except AttributeError:
+                pass
+        SlottedDict2Class.__init__(self, **properties)
+
+    def __dir__(self):
+        return list(object.__dir__(self)) + list(
+            getattr(self, "_properties", {}))
+
+    def __getstate__(self):
+        return self._collect()
+
+    def __setstate__(self, state):
+        SlottedDict2Class.__init__(self, **state)
+
+    def __copy__(self):
+        clone = type(self).__new__(type(self))
+        SlottedDict2Class.__init__(clone, **self._collect())
+        return clone
+
+    def __deepcopy__(self, memo):
+        clone = type(self).__new__(type(self))
+        memo[id(self)] = clone
+        SlottedDict2Class.__init__(clone,
+            **copy.deepcopy(self._collect(), memo))
+        return clone
+
+    def _collect(self):
+        '''返回全部属性组成的新字典，不移动属性'''
+        if self._is_live():
+            return dict(object.__getattribute__(self, "_properties"))
+        properties = {}
+        for name, descriptor in self._field_descriptors.items():
+            try:
+                properties[name] = descriptor.__get__(self)
+            except AttributeError: # 未赋值的槽位
+                pass
+        try:
+            properties.update(object.__getattribute__(self, "_properties"))
+        except AttributeError:
+            pass
+        return properties
 
     def dictform(self):
-        return self.__dict__
+        '''返回实例的属性字典，修改该字典即修改实例'''
+        if self._is_live():
+            return object.__getattribute__(self, "_properties")
+        properties = self._collect()
+        for descriptor in self._field_descriptors.values():
+            try:
+                descriptor.__delete__(self)
+            except AttributeError:
+                pass
+        object.__setattr__(self, "_properties", properties)
+        object.__setattr__(self, "_live", True)
+        return properties
+
+_NODE_FIELDS = ("name", "type", "subtype", "image_name", "x", "y",
+    "resource_limit", "config", "interfaces")
 
-class Image(Dict2Class):
+class Image(SlottedDict2Class):
     '''镜像类
 
     需要传字典来确定其拥有的属性，要查看实例化对象所具有的属性，请调用dictform()方法
     '''
+    __slots__ = _NODE_FIELDS
+
     def __init__(self, **properties):
         super().__init__(**properties)
 
-class Node(Dict2Class):
+class Node(SlottedDict2Class):
     '''节点类
 
     需要传字典来确定其拥有的属性要查看实例化对象所具有的属性，请调用dictform()方法
     '''
+    __slots__ = _NODE_FIELDS
+
     def __init__(self, **properties):
         super().__init__(**properties)
 
-class Link(Dict2Class):
+class Link(SlottedDict2Class):
     '''链路类
 
     需要传字典来确定其拥有的属性要查看实例化对象所具有的属性，请调用dictform()方法
     '''
+    __slots__ = ("name", "source", "sourceIP", "sourceType", "target",
+        "targetIP", "targetType", "config")
+
     def __init__(self, **properties):
         super().__init__(**properties)
 
+_EMPTY_LINK_END_CONFIG = {"bw_kbit": "", "queue_size_byte": "", "delay_us": "",
+    "loss_rate": "", "jitter_us": "", "correlation": "",
+    "delay_distribution": "normal"}
+
+def _default_link_config():
+    '''返回链路两端的默认（空）配置'''
+    return {"source": _EMPTY_LINK_END_CONFIG.copy(),
+        "target": _EMPTY_LINK_END_CONFIG.copy()}
+
+def _element_name(element):
+    '''返回节点名，element可以是Node对象或节点名'''
+    return element if isinstance(element, str) else element.name
+
+class _NodeTemplate(object):
+    '''批量添加节点时，同一镜像的节点共用的模板
+
+    只含标量的字典/列表（如config、interfaces）浅拷贝即可保证各节点互不影响，比对
+    整个镜像deepcopy快得多；其余容器仍使用deepcopy。
+    '''
+    __slots__ = ("category", "template", "shallow_keys", "deep_keys")
+
+    def __init__(self, image):
+        self.template = copy.deepcopy(image).dictform()
+        self.category = get_plural_of_words(self.template["type"])
+        self.shallow_keys, self.deep_keys = [], []
+        for key, value in self.template.items():
+            if not isinstance(value, (dict, list)):
+                continue
+            members = value.values() if isinstance(value, dict) else value
+            if any(isinstance(m, (dict, list, set)) for m in members):
+                self.deep_keys.append(key)
+            else:
+                self.shallow_keys.append(key)
+
+    def new_node_dict(self):
+        node_dict = self.template.copy()
+        for key in self.shallow_keys:
+            node_dict[key] = node_dict[key].copy()
+        for key in self.deep_keys:
+            node_dict[key] = copy.deepcopy(node_dict[key])
+        return node_dict
+
+class _NodesView(Mapping):
+    '''Topo中节点的只读视图，节点名到Node对象的映射
+
+    Node对象在访问时才构建，与Topo共享节点字典中的属性值（如interfaces列表）。
+    '''
+    __slots__ = ("_topo",)
+
+    def __init__(self, topo):
+        self._topo = topo
+
+    def __getitem__(self, node_name):
+        category = self._topo._node_categories[node_name]
+        return Node(**self._topo.__dict__[category][node_name])
+
+    def __contains__(self, node_name):
+        return node_name in self._topo._node_categories
+
+    def __iter__(self):
+        return iter(self._topo._node_categories)
+
+    def __len__(self):
+        return len(self._topo._node_categories)
+
+class _LinksView(Mapping):
+    '''Topo中链路的只读视图，链路名到Link对象的映射
+
+    Link对象在访问时才构建，与Topo共享链路字典中的属性值。
+    '''
+    __slots__ = ("_topo",)
+
+    def __init__(self, topo):
+        self._topo = topo
+
+    def __getitem__(self, link_name):
+        return Link(**self._topo.__dict__["links"][link_name])
+
+    def __contains__(self, link_name):
+        return link_name in self._topo.__dict__["links"]
+
+    def __iter__(self):
+        return iter(self._topo.__dict__["links"])
+
+    def __len__(self):
+        return len(self._topo.__dict__["links"])
+
 class Topo(Dict2Class):
     '''拓扑类
 
     用于项目创建前通过类中的add_node和add_link方法设计拓扑，设计完成后需将Topo对
     象传入TopoManager的deploy方法，以完成实际的项目创建。
+
+    拓扑结构保存在__dict__中的各类别字典里（即dictform()的返回值）；此外Topo还维护
+    以下索引（保存在__slots__中，不会出现在dictform()里），使节点名查找、平行边检查
+    及默认名称分配均为O(1)：
+    节点名 -> 类别（如"hosts"）；无序端点对 -> 链路名；默认节点/链路名的单调计数器。
+    索引由add_node/add_link维护；若直接修改了各类别字典，请调用reindex()。
     '''
+    __slots__ = ("_node_categories", "_link_pairs", "_next_node_id",
+        "_next_link_id")
+
     def __init__(self, **properties):
         self.__dict__ = {} # topo结构的维护是由拓扑对象中的字典来实现
         elements = ["links", "controllers", "hosts", "routers", "switches"]
         for element in elements:
             self.__dict__.setdefault(element, {})
         super().__init__(**properties)
+        self.reindex()
+
+    def reindex(self):
+        '''根据各类别字典重建索引'''
+        self._node_categories = {}
+        for category, elements in self.__dict__.items():
+            if category == "links":
+                continue
+            for node_name in elements:
+                self._node_categories[node_name] = category
+        self._link_pairs = {}
+        for link_name, link_dict in self.__dict__["links"].items():
+            pair = frozenset((link_dict["source"], link_dict["target"]))
+            self._link_pairs.setdefault(pair, link_name)
+        self._next_node_id = 1
+        self._next_link_id = 1
 
     def add_node(self, image, node_name=None, resource_limit=None,
             location={"x": 0, "y": 0}, worker_specified=None):
@@ -171,10 +595,9 @@ class Topo(Dict2Class):
             node_name = self._assign_default_node_name()
 
         # 名称重复检查
-        nodes = self.get_nodes()
-        if node_name in nodes.keys():
+        if node_name in self._node_categories:
             raise NodeDuplicatesError(f"node name [{node_name}] is duplicate, "
-                f"existing node names are {list(nodes.keys())}")
+                f"existing node names are {list(self._node_categories)}")
 
         # node对象构建
         node = copy.deepcopy(image) # 将image对象当作node对象使用
@@ -189,7 +612,8 @@ class Topo(Dict2Class):
 
         # 加入topo的字典中
         category = get_plural_of_words(node.type)
-        self.__dict__[category][node_name] = node.dictform()
+        self.__dict__.setdefault(category, {})[node_name] = node.dictform()
+        self._node_categories[node_name] = category
 
         return Node(**node.dictform())
 
@@ -226,33 +650,14 @@ class Topo(Dict2Class):
         self._check_parallel_link(link_name, src_node.name, dst_node.name)
 
         # 名称重复检查
-        links = self.get_links()
-        if link_name in links.keys():
+        links = self.__dict__["links"]
+        if link_name in links:
             raise LinkDuplicatesError(f"link name [{link_name}] is duplicate, "
-                f"existing link names are {list(links.keys())}")
+                f"existing link names are {list(links)}")
 
         # 构建Link对象并将其加入Topo中
         link = Link()
-        link.config = {
-            "source" : {
-                "bw_kbit" : "",
-                "queue_size_byte" : "",
-                "delay_us" : "",
-                "loss_rate" : "", 
-                "jitter_us" : "", 
-                "correlation" : "", 
-                "delay_distribution" : "normal"
-            },
-            "target":{
-                "bw_kbit" : "",
-                "queue_size_byte" : "",
-                "delay_us" : "",
-                "loss_rate" : "", 
-                "jitter_us" : "", 
-                "correlation" : "", 
-                "delay_distribution" : "normal"
-            }
-        }
+        link.config = _default_link_config()
         link.name = link_name
         link.source = src_node.name
         link.sourceIP = src_IP
@@ -262,6 +667,7 @@ class Topo(Dict2Class):
         link.targetType = dst_node.type
 
         self.__dict__["links"][link.name] = link.dictform()
+        self._link_pairs[frozenset((link.source, link.target))] = link.name
 
         # 修改节点信息
         if src_IP != "":
@@ -280,58 +686,368 @@ class Topo(Dict2Class):
 
         return link
 
+    def add_nodes(self, nodes):
+        '''向Topo对象中批量添加节点。
+
+        与逐个调用add_node相比：同一Image对象只拷贝一次作为模板；全部节点先统一校验，
+        存在不合法的节点时不会添加任何节点，并一次性报告全部错误。
+
+        Args:
+            nodes(iterable): 每个元素为一个字典，key与add_node的参数相同，即image（必填）、
+                node_name、resource_limit、location、worker_specified。例子：
+                [{"image": ubuntu_image, "node_name": "h1"},
+                {"image": ovs_image, "location": {"x": 100, "y": 0}}]
+
+        Returns:
+            所添加节点的Node对象列表，顺序与nodes相同
+
+        Raises:
+            TopoBuildError: 当存在不合法的节点（如节点名重复、镜像类型不支持）时，触发
+                此异常，其errors属性包含全部错误
+        '''
+        specs = list(nodes)
+        errors = []
+        reserved = {spec.get("node_name") for spec in specs}
+        templates = {} # id(image) -> _NodeTemplate
+        counter = self._next_node_id
+        names, batch_names = [], set()
+        for index, spec in enumerate(specs):
+            node_name = spec.get("node_name")
+            if not node_name:
+                node_name = self._assign_default_node_name(reserved, index)
+                reserved.add(node_name)
+            elif (node_name in self._node_categories
+                or node_name in batch_names):
+                errors.append((index, NodeDuplicatesError(f"node name "
+                    f"[{node_name}] is duplicate")))
+            names.append(node_name)
+            batch_names.add(node_name)
+
+            image = spec.get("image")
+            if id(image) not in templates:
+                try:
+                    templates[id(image)] = _NodeTemplate(image)
+                except (AttributeError, KeyError, TypeError) as e:
+                    templates[id(image)] = TypeError(f"invalid image "
+                        f"{image!r}: {e}")
+            if isinstance(templates[id(image)], Exception):
+                errors.append((index, templates[id(image)]))
+
+        if errors:
+            self._next_node_id = counter
+            raise TopoBuildError(errors)
+
+        added = []
+        for spec, node_name in zip(specs, names):
+            template = templates[id(spec["image"])]
+            category = template.category
+            node_dict = template.new_node_dict()
+            if spec.get("resource_limit"):
+                node_dict["resource_limit"] = spec["resource_limit"]
+            location = spec.get("location") or {"x": 0, "y": 0}
+            node_dict["name"] = node_name
+            node_dict["x"] = location["x"]
+            node_dict["y"] = location["y"]
+            if spec.get("worker_specified"):
+                node_dict["config"].update(
+                    {"worker_specified": spec["worker_specified"]})
+
+            self.__dict__.setdefault(category, {})[node_name] = node_dict
+            self._node_categories[node_name] = category
+            added.append(Node(**node_dict))
+
+        return added
+
+    def add_links(self, links):
+        '''向Topo对象中批量添加链路。
+
+        与逐个调用add_link相比：每个地址只解析一次；全部链路先统一校验（自环、端点
+        节点不存在、地址不合法、链路名重复、平行边），存在不合法的链路时不会添加任何
+        链路，并一次性报告全部错误。
+
+        Args:
+            links(iterable): 每个元素为一个字典，key与add_link的参数相同，即
+                src_node、dst_node（必填，可以是Node对象或节点名）、link_name、src_IP、
+                dst_IP。例子：
+                [{"src_node": "h1", "dst_node": "s1", "src_IP": "10.0.0.1/24"},
+                {"src_node": h2, "dst_node": s1, "link_name": "uplink"}]
+
+        Returns:
+            所添加链路的Link对象列表，顺序与links相同
+
+        Raises:
+            TopoBuildError: 当存在不合法的链路时，触发此异常，其errors属性包含全部错误
+        '''
+        specs = list(links)
+        errors = []
+        topo_links = self.__dict__["links"]
+        reserved = {spec.get("link_name") for spec in specs}
+        counter = self._next_link_id
+        addresses = {} # cidr -> (ip, netmask)或异常
+        netmasks = {} # 前缀长度 -> 子网掩码
+        batch_pairs, batch_names = {}, set()
+        resolved = []
+        for index, spec in enumerate(specs):
+            src_name = _element_name(spec.get("src_node"))
+            dst_name = _element_name(spec.get("dst_node"))
+            link_name = spec.get("link_name")
+            if not link_name:
+                link_name = self._assign_default_link_name(reserved, index)
+                reserved.add(link_name)
+            resolved.append((link_name, src_name, dst_name))
+
+            for node_name in dict.fromkeys((src_name, dst_name)):
+                if node_name not in self._node_categories:
+                    errors.append((index, NodeNotExistsError(f"node "
+                        f"[{node_name}] of link [{link_name}] does not exist")))
+            if src_name == dst_name:
+                errors.append((index, ValueError(f"Node cannot connect to "
+                    f"itself! (link [{link_name}])")))
+            for cidr in (spec.get("src_IP", ""), spec.get("dst_IP", "")):
+                if cidr == "":
+                    continue
+                if cidr not in addresses:
+                    if is_cidr_leagal(cidr):
+                        ip, prefix = cidr.split("/")
+                        if prefix not in netmasks:
+                            netmasks[prefix] = cidr_netmask(int(prefix))
+                        addresses[cidr] = (ip, netmasks[prefix])
+                    else:
+                        addresses[cidr] = ValueError(f"Address [{cidr}] is "
+                            f"illegal, please check!")
+                if isinstance(addresses[cidr], Exception):
+                    errors.append((index, addresses[cidr]))
+            if link_name in topo_links or link_name in batch_names:
+                errors.append((index, LinkDuplicatesError(f"link name "
+                    f"[{link_name}] is duplicate")))
+            batch_names.add(link_name)
+            pair = frozenset((src_name, dst_name))
+            exist_link_name = (self._link_pairs.get(pair)
+                or batch_pairs.get(pair))
+            if exist_link_name is not None:
+                errors.append((index, LinkParallelError(f"New link "
+                    f"{link_name}({src_name}---{dst_name}) repeat with exist "
+                    f"link {exist_link_name}")))
+            else:
+                batch_pairs[pair] = link_name
+
+        if errors:
+            self._next_link_id = counter
+            raise TopoBuildError(errors)
+
+        added = []
+        for spec, (link_name, src_name, dst_name) in zip(specs, resolved):
+            src_IP, dst_IP = spec.get("src_IP", ""), spec.get("dst_IP", "")
+            src_node = self._node_dict(src_name)
+            dst_node = self._node_dict(dst_name)
+            link_dict = {"config": _default_link_config(), "name": link_name,
+                "source": src_name, "sourceIP": src_IP,
+                "sourceType": src_node["type"], "target": dst_name,
+                "targetIP": dst_IP, "targetType": dst_node["type"]}
+            topo_links[link_name] = link_dict
+            self._link_pairs[frozenset((src_name, dst_name))] = link_name
+
+            if src_IP != "":
+                ip, netmask = addresses[src_IP]
+                src_node["interfaces"].append({"ip": ip, "netmask": netmask,
+                    "name": f"{src_name}{dst_name}"})
+            if dst_IP != "":
+                ip, netmask = addresses[dst_IP]
+                dst_node["interfaces"].append({"ip": ip, "netmask": netmask,
+                    "name": f"{dst_name}{src_name}"})
+            added.append(Link(**link_dict))
+
+        return added
+
+    def assign_addresses(self, pool, link_names=None, p2p_prefix=30):
+        '''为未配置ip的链路批量分配地址，并写入链路及节点的接口
+
+        两端均为主机/路由器的链路分配一个点对点子网；连接交换机的主机/路由器，同一二层
+        网络（以交换机之间的链路连通的交换机集合）中的分配在同一子网内。已配置的地址
+        保持不变，并会在分配前登记到地址池中。
+
+        Args:
+            pool(AddressPool or str): 地址池，或作为地址池的父网段，如"10.0.0.0/16"
+            link_names(iterable): 要分配地址的链路名，默认为None，即全部链路
+            p2p_prefix(int): 点对点子网的前缀长度，30或31，默认为30
+
+        Returns:
+            字典，链路名 -> (源端地址, 目的端地址)，只包含新分配了地址的链路
+
+        Raises:
+            AddressConflictError: 现有接口中同一地址被多个接口使用时，触发此异常
+            AddressPoolExhaustedError: 地址池空闲地址不足时，触发此异常，此时Topo不变
+        '''
+        if not isinstance(pool, AddressPool):
+            pool = AddressPool(pool)
+        links = self.__dict__["links"]
+        plan = plan_link_addresses(self.__dict__, pool, link_names, p2p_prefix)
+        for link_name, (src_IP, dst_IP) in plan.items():
+            link_dict = links[link_name]
+            src_name, dst_name = link_dict["source"], link_dict["target"]
+            for key, cidr, node_name, peer_name in (
+                    ("sourceIP", src_IP, src_name, dst_name),
+                    ("targetIP", dst_IP, dst_name, src_name)):
+                if not cidr or link_dict[key]:
+                    continue
+                link_dict[key] = cidr
+                ip, netmask = cidr2ip_and_netmask(cidr)
+                self._node_dict(node_name)["interfaces"].append({"ip": ip,
+                    "netmask": netmask, "name": f"{node_name}{peer_name}"})
+        return plan
+
+    def remove_link(self, link_name):
+        '''从Topo对象中删除链路，并删除两端节点上对应的接口
+
+        Args:
+            link_name(str): 链路名
+
+        Returns:
+            被删除链路的Link对象
+
+        Raises:
+            LinkNotExistsError: 当链路不存在时，触发此异常
+        '''
+        links = self.__dict__["links"]
+        if link_name not in links:
+            raise LinkNotExistsError(f"Link [{link_name}] does not exist, "
+                f"avaliable links are {list(links)}")
+        link_dict = links.pop(link_name)
+        src_name, dst_name = link_dict["source"], link_dict["target"]
+        pair = frozenset((src_name, dst_name))
+        if self._link_pairs.get(pair) == link_name:
+            del self._link_pairs[pair]
+        for node_name, peer_name in ((src_name, dst_name),
+                (dst_name, src_name)):
+            if node_name not in self._node_categories:
+                continue
+            node_dict = self._node_dict(node_name)
+            node_dict["interfaces"] = [nic for nic in node_dict["interfaces"]
+                if nic.get("name") != f"{node_name}{peer_name}"]
+        return Link(**link_dict)
+
+    def remove_node(self, node_name):
+        '''从Topo对象中删除节点及与其相连的全部链路
+
+        Args:
+            node_name(str): 节点名
+
+        Returns:
+            被删除节点的Node对象
+
+        Raises:
+            NodeNotExistsError: 当节点不存在时，触发此异常
+        '''
+        if node_name not in self._node_categories:
+            raise NodeNotExistsError(f"Node [{node_name}] does not exist, "
+                f"avaliable nodes are {list(self._node_categories)}")
+        for link_name, link_dict in list(self.__dict__["links"].items()):
+            if node_name in (link_dict["source"], link_dict["target"]):
+                self.remove_link(link_name)
+        category = self._node_categories.pop(node_name)
+        return Node(**self.__dict__[category].pop(node_name))
+
+    def _node_dict(self, node_name):
+        return self.__dict__[self._node_categories[node_name]][node_name]
+
     def get_nodes(self):
         '''获取Topo对象中所有的节点名及对应的Node对象
 
         Returns:
-            一个字典，包含该Topo对象中所有的节点名及对应的Node对象。例子：
+            一个只读的映射（Mapping），包含该Topo对象中所有的节点名及对应的Node对象，
+            Node对象在访问时才构建。例子：
             {"h1": h1的Node对象,
             ...
             }
         '''
-        nodes = {}
-        for type in self.__dict__.keys():
-            if type == "links":
-                continue
-            for node_name, node_dict in self.__dict__[type].items():
-                nodes[node_name] = Node(**node_dict)
-        
-        return nodes
+        return _NodesView(self)
 
     def get_links(self):
         '''
         获取Topo对象中所有的链路名及对应的Link对象
 
         Returns:
-            一个字典，包含该Topo对象中所有的链路名及对应的Link对象。例子：
+            一个只读的映射（Mapping），包含该Topo对象中所有的链路名及对应的Link对象，
+            Link对象在访问时才构建。例子：
 
             {"l1": l1的Node对象,
             ...
             }
         '''
-        links = {}
-        for link_name, link_dict in self.__dict__["links"].items():
-            links[link_name] = Link(**link_dict)
-        
-        return links
+        return _LinksView(self)
 
-    def _assign_default_link_name(self):
-        '''分配默认链路名
+    def validate(self):
+        '''部署前校验拓扑
 
-        默认链路名为"l<拓扑中现有链路数量+1>"
+        对各类别字典做一次线性扫描，不发送任何请求，检查节点类型、重名、坐标范围、
+        接口名冲突、悬空链路、自环及平行链路、地址合法性、重复ip及链路两端子网是否
+        一致（见validation模块）。ProjectManager.deploy在提交前会自动调用，可通过
+        config.validate_before_deploy关闭。
+
+        Returns:
+            ValidationReport对象，其ok属性为False时表示存在会导致部署失败的错误
         '''
-        link_num = len(self.get_links())
-        link_name = f"l{link_num+1}"
-        return link_name
+        return validate_topo(self.__dict__)
 
-    def _assign_default_node_name(self):
+    def save(self, path):
+        '''将Topo对象保存为拓扑文件
+
+        文件为行分隔格式（见topo_file模块），同一镜像的节点只保存一次公共属性，比
+        dictform()的json小得多，可用Topo.load读取，或用TopoFile按需读取单个元素。
+
+        Args:
+            path(str): 文件路径
+
+        Returns:
+            写入的字节数
+        '''
+        return write_topo(self.__dict__, path, _default_link_config)
+
+    @classmethod
+    def load(cls, path):
+        '''读取Topo.save保存的拓扑文件
+
+        逐行解析并直接构建各类别字典，不会先把整个文件读入内存。
+
+        Args:
+            path(str): 文件路径
+
+        Returns:
+            Topo对象
+
+        Raises:
+            ValueError: 当文件不是拓扑文件或版本不支持时，触发此异常
+        '''
+        return cls(**read_topo(path, _default_link_config))
+
+    def _assign_default_link_name(self, reserved=(), num_pending=0):
+        '''分配默认链路名
+
+        默认链路名为"l<拓扑中现有链路数量+1>"，若该名称已被占用（或在reserved中），则
+        顺延至下一个未被占用的编号。批量添加时，num_pending为本批中排在前面、尚未
+        加入拓扑的链路数
+        '''
+        links = self.__dict__["links"]
+        link_id = max(self._next_link_id, len(links) + num_pending + 1)
+        while f"l{link_id}" in links or f"l{link_id}" in reserved:
+            link_id += 1
+        self._next_link_id = link_id
+        return f"l{link_id}"
+
+    def _assign_default_node_name(self, reserved=(), num_pending=0):
         '''分配默认节点名
 
-        默认节点名为"n<拓扑中现有链路数量+1>"
+        默认节点名为"n<拓扑中现有节点数量+1>"，若该名称已被占用（或在reserved中），则
+        顺延至下一个未被占用的编号。批量添加时，num_pending为本批中排在前面、尚未
+        加入拓扑的节点数
         '''
-        node_num = len(self.get_nodes())
-        node_name = f"n{node_num+1}"
-        return node_name
+        node_id = max(self._next_node_id,
+            len(self._node_categories) + num_pending + 1)
+        while (f"n{node_id}" in self._node_categories
+            or f"n{node_id}" in reserved):
+            node_id += 1
+        self._next_node_id = node_id
+        return f"n{node_id}"
 
     def _check_parallel_link(self, link_name, src_node_name, dst_node_name):
         '''检查新添加的链路是否为平行边（即新链路与已有链路的两端节点名相同）
@@ -344,16 +1060,92 @@ class Topo(Dict2Class):
             LinkParallelError: 当出现平行边（即新边与已有边的两端节点名相同）时，触发
                 该异常
         '''
-        links = self.get_links()
-        my_endpoints = set([src_node_name, dst_node_name])
-        for _, link in links.items():
-            exist_endpoints = set([link.source, link.target])
-            if my_endpoints == exist_endpoints:
-                raise LinkParallelError(f"New link {link_name}({src_node_name}"
-                    f"---{dst_node_name}) repeat with exist link {link.name}"
-                    f"({link.source}---{link.target})")
-
-class LinkConfiguration(Dict2Class):
+        exist_link_name = self._link_pairs.get(
+            frozenset((src_node_name, dst_node_name)))
+        if exist_link_name is not None:
+            link = self.__dict__["links"][exist_link_name]
+            raise LinkParallelError(f"New link {link_name}({src_node_name}"
+                f"---{dst_node_name}) repeat with exist link {exist_link_name}"
+                f"({link['source']}---{link['target']})")
+
+class _FileNodesView(Mapping):
+    '''TopoFile中节点的只读视图，Node对象在访问时才从文件中解析'''
+    __slots__ = ("_index",)
+
+    def __init__(self, index):
+        self._index = index
+
+    def __getitem__(self, node_name):
+        return Node(**self._index.node(node_name)[1])
+
+    def __contains__(self, node_name):
+        return self._index.has_node(node_name)
+
+    def __iter__(self):
+        return iter(self._index.node_names)
+
+    def __len__(self):
+        return len(self._index.node_names)
+
+class _FileLinksView(Mapping):
+    '''TopoFile中链路的只读视图，Link对象在访问时才从文件中解析'''
+    __slots__ = ("_index",)
+
+    def __init__(self, index):
+        self._index = index
+
+    def __getitem__(self, link_name):
+        return Link(**self._index.link(link_name))
+
+    def __contains__(self, link_name):
+        return self._index.has_link(link_name)
+
+    def __iter__(self):
+        return iter(self._index.link_names)
+
+    def __len__(self):
+        return len(self._index.link_names)
+
+class TopoFile(object):
+    '''以mmap打开的拓扑文件（Topo.save的输出），只读
+
+    打开时只读取文件头及索引，与节点/链路的数量无关的部分几乎不耗时；get_nodes()、
+    get_links()与Topo的同名方法一样返回只读映射，其中的元素在访问时才从文件中解析，
+    因此可以只查看大型拓扑中的少数元素。需要修改或部署时，调用to_topo()。例子：
+
+        with TopoFile("fattree_k16.topo") as topo_file:
+            print(len(topo_file.get_nodes()), topo_file.get_links()["l1"].source)
+            topo = topo_file.to_topo()
+
+    Attributes:
+        path(str): 文件路径
+    '''
+    def __init__(self, path):
+        self.path = path
+        self._index = TopoFileIndex(path, _default_link_config)
+
+    def get_nodes(self):
+        '''节点名 -> Node对象的只读映射，Node对象在访问时才构建'''
+        return _FileNodesView(self._index)
+
+    def get_links(self):
+        '''链路名 -> Link对象的只读映射，Link对象在访问时才构建'''
+        return _FileLinksView(self._index)
+
+    def to_topo(self):
+        '''流式读取整个文件，返回Topo对象'''
+        return Topo.load(self.path)
+
+    def close(self):
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class LinkConfiguration(SlottedDict2Class):
     '''链路配置类。
 
     默认的属性及说明为：
@@ -368,6 +1160,10 @@ class LinkConfiguration(Dict2Class):
     "link":None, # 链路名
     "ne":None # 节点名
     '''
+    __slots__ = ("bw_kbps", "delay_us", "jitter_us", "correlation",
+        "delay_distribution", "loss", "queue_size_bytes", "linkchoice", "link",
+        "ne")
+
     def __init__(self, **properties):
         default_config = {
             "bw_kbps":"10000", # 链路带宽（kbps）,需为正数
@@ -381,5 +1177,5 @@ class LinkConfiguration(Dict2Class):
             "link":None, # 链路名
             "ne":None # 节点名
         }
-        self.__dict__ = default_config
-        super().__init__(**properties)
\ No newline at end of file
+        default_config.update(properties)
+        super().__init__(**default_config)
\ No newline at end of file
@@ -1,22 +1,51 @@
-import re
-
 '''基础函数'''
+def ip_to_int(ip):
+    '''将点分十进制的ip地址转换为32位整数
+
+    每段须为0~255的十进制数，且除0以外不能有前导0。
+
+    Args:
+        ip(str): ip地址，如192.168.1.1
+
+    Returns:
+        32位整数，如3232235777
+
+    Raises:
+        ValueError: ip地址不合法
+    '''
+    parts = ip.split(".")
+    if len(parts) != 4:
+        raise ValueError(f"Address [{ip}] is illegal, please check!")
+    value = 0
+    for part in parts:
+        if not (part.isascii() and part.isdigit()) or len(part) > 3 \
+                or (len(part) > 1 and part[0] == "0") or int(part) > 255:
+            raise ValueError(f"Address [{ip}] is illegal, please check!")
+        value = value << 8 | int(part)
+    return value
+
+def int_to_ip(value):
+    '''将32位整数转换为点分十进制的ip地址，如3232235777转换为192.168.1.1'''
+    return f"{value >> 24 & 255}.{value >> 16 & 255}.{value >> 8 & 255}." \
+        f"{value & 255}"
+
+def prefix_to_mask(prefix):
+    '''将int类型的掩码转换为32位整数，如24转换为0xffffff00'''
+    return (0xffffffff << (32 - prefix)) & 0xffffffff
+
 def is_ip_leagal(ip):
     '''检查ip地址的合法性
 
     Args:
-        ip(str): ip地址，如192.168.1.1（合法），256.0.0.1（不合法），aaaa（不合法）
+        ip(str): ip地址，如192.168.1.1（合法），256.0.0.1（不合法），aaaa（不合法），
+            0.1.1.1（不合法，第一段不能为0）
 
     Returns:
         合法则返回True，不合法返回False
     '''
-    compile_ip = re.compile("^(1\d{2}|2[0-4]\d|25[0-5]|[1-9]\d|[1-9])\."
-        "(1\d{2}|2[0-4]\d|25[0-5]|[1-9]\d|\d)\."
-        "(1\d{2}|2[0-4]\d|25[0-5]|[1-9]\d|\d)\."
-        "(1\d{2}|2[0-4]\d|25[0-5]|[1-9]\d|\d)$")
-    if compile_ip.match(ip):
-        return True
-    else:    
+    try:
+        return ip_to_int(ip) >= 1 << 24
+    except (ValueError, AttributeError):
         return False
 
 def is_cidr_leagal(cidr):
@@ -75,12 +104,7 @@ def cidr_netmask(prefix):
     Returns:
         地址类型的掩码，如255.255.255.0
     '''
-    bin_arr = ['0' for _ in range(32)]
-    for i in range(prefix):
-        bin_arr[i] = '1'
-    tmpmask = [''.join(bin_arr[i * 8:i * 8 + 8]) for i in range(4)]
-    tmpmask = [str(int(tmpstr, 2)) for tmpstr in tmpmask]
-    return '.'.join(tmpmask)
+    return int_to_ip(prefix_to_mask(prefix))
 
 def get_plural_of_words(word):
     """返回单词的复数形式
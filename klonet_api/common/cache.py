@@ -0,0 +1,121 @@
+import threading
+import time
+from .. import config
+
+
+'''项目快照缓存
+
+NodeManager、LinkManager在查找单个节点/链路时，需要下载整个项目文档
+（/re/project/{project}/）。本模块按(后端url, 用户名, 项目名)缓存项目文档中的topo
+部分，并在有效期（TTL）内复用；任何会修改项目的调用（动态增删节点/链路、链路配置、
+项目创建/删除）都会使对应的快照失效。
+
+每次失效都会使该项目的代数（generation）加1。读取项目文档前记下代数，存入时若代数
+已变化（即读取期间有写入），则丢弃这份可能早于写入的快照，不会在整个有效期内返回
+旧的项目。
+'''
+
+
+class ProjectSnapshotCache(object):
+    '''带有效期的项目快照缓存
+
+    缓存中的快照应视为只读，需要交给用户修改的对象请先拷贝。
+
+    Attributes:
+        ttl_s(float): 快照有效期（秒）。为0时不缓存
+        hits(int): 命中次数
+        misses(int): 未命中次数
+    '''
+    def __init__(self, ttl_s=None):
+        self._ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._snapshots = {} # key -> (过期时间, 快照)
+        self._generations = {} # key或后端url -> 失效次数
+        self._epoch = 0 # 清空全部快照的次数
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def ttl_s(self):
+        if self._ttl_s is not None:
+            return self._ttl_s
+        return getattr(config, "snapshot_ttl_s", 5)
+
+    @ttl_s.setter
+    def ttl_s(self, value):
+        self._ttl_s = value
+
+    def get(self, key):
+        '''获取未过期的快照
+
+        Args:
+            key(tuple): (后端url, 用户名, 项目名)
+
+        Returns:
+            快照；若不存在或已过期则返回None
+        '''
+        with self._lock:
+            entry = self._snapshots.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self._snapshots.pop(key, None)
+            self.misses += 1
+            return None
+
+    def generation(self, key):
+        '''项目的代数，在读取项目文档前获取，并传给put
+
+        Args:
+            key(tuple or str): (后端url, 用户名, 项目名)；或后端url，此时该后端任一
+                项目失效后代数都会变化
+
+        Returns:
+            可比较相等的对象，该项目的快照每次失效后都会变化
+        '''
+        with self._lock:
+            return (self._epoch, self._generations.get(key, 0))
+
+    def put(self, key, snapshot, generation=None):
+        '''存入快照
+
+        Args:
+            key(tuple): (后端url, 用户名, 项目名)
+            snapshot(dict): 项目文档中的topo部分
+            generation(tuple): 读取项目文档前的代数（见generation）。默认为None，即
+                不检查；若与当前代数不同，说明读取期间项目被修改，不存入快照
+        '''
+        ttl_s = self.ttl_s
+        if ttl_s <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != (self._epoch,
+                    self._generations.get(key, 0)):
+                return
+            self._snapshots[key] = (time.monotonic() + ttl_s, snapshot)
+
+    def invalidate(self, key=None):
+        '''使快照失效
+
+        Args:
+            key(tuple): (后端url, 用户名, 项目名)。默认为None，表示清空全部快照
+        '''
+        with self._lock:
+            if key is None:
+                self._snapshots.clear()
+                self._epoch += 1
+            else:
+                self._snapshots.pop(key, None)
+                for scope in (key, key[0]):
+                    self._generations[scope] = \
+                        self._generations.get(scope, 0) + 1
+
+    def stats(self):
+        '''返回缓存统计，如{"hits": 10, "misses": 2, "size": 1, "ttl_s": 5}'''
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._snapshots), "ttl_s": self.ttl_s}
+
+
+#: ProjectSnapshotCache: 所有Manager共享的项目快照缓存
+project_snapshots = ProjectSnapshotCache()
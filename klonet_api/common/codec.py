@@ -0,0 +1,51 @@
+import json
+
+try:
+    import orjson
+except ImportError: # orjson为可选依赖，未安装时使用标准库json
+    orjson = None
+
+
+'''json编解码
+
+大型拓扑（如数千节点的fat-tree）的项目文档可达数MB，请求体的编码及响应的解析均经由
+本模块完成。若安装了orjson，则使用orjson，否则回退到标准库json。
+'''
+
+#: str: 当前使用的json后端，"orjson"或"json"
+backend = "orjson" if orjson is not None else "json"
+
+
+def dumps(obj):
+    '''将对象编码为utf-8的json字节串
+
+    Args:
+        obj: 可json序列化的对象
+
+    Returns:
+        bytes类型的json
+    '''
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError: # 如超出64位的整数，交由标准库处理
+            pass
+    return json.dumps(obj, ensure_ascii=False,
+        separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    '''解析json
+
+    Args:
+        data(bytes/str): json文本
+
+    Returns:
+        解析后的对象
+
+    Raises:
+        ValueError: 当data不是合法的json时，触发此异常
+    '''
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -32,4 +32,89 @@ class LinkParallelError(RuntimeError):
 class LinkInconsistentError(RuntimeError):
     '''当链路属性配置时，链路两端的LinkConfiguration对象的链路名不一致时，触发该异常
     '''
-    pass
\ No newline at end of file
+    pass
+
+class DeadlineExceededError(RuntimeError):
+    '''当请求超过request_deadline()设置的整体截止时间时，触发此异常'''
+    pass
+
+class CircuitOpenError(RuntimeError):
+    '''当后端连续失败导致熔断器打开时，请求会立即触发此异常'''
+    pass
+
+class ReplayMismatchError(RuntimeError):
+    '''当回放的请求在录制日志中找不到对应的记录时，触发此异常'''
+    pass
+
+class AddressPoolExhaustedError(RuntimeError):
+    '''当地址池中没有足够的空闲地址或子网时，触发此异常'''
+    pass
+
+class AddressConflictError(RuntimeError):
+    '''当同一ip地址被多个接口使用，或地址与地址池中已分配的地址冲突时，触发此异常'''
+    pass
+
+class TopoBuildError(RuntimeError):
+    '''当批量构建拓扑（Topo.add_nodes/add_links）时存在不合法的元素，触发此异常
+
+    Attributes:
+        errors(list): 全部错误，每个元素为(元素在输入中的下标, 异常对象)
+    '''
+    def __init__(self, errors):
+        self.errors = list(errors)
+        lines = [f"  [{index}] {type(e).__name__}: {e}"
+            for index, e in self.errors[:20]]
+        if len(self.errors) > 20:
+            lines.append(f"  ... and {len(self.errors) - 20} more")
+        super().__init__(f"{len(self.errors)} invalid element(s):\n"
+            + "\n".join(lines))
+
+class ReconcileError(RuntimeError):
+    '''当增量部署（ProjectManager.reconcile）的某一轮中有步骤失败时，触发此异常
+
+    失败所在轮次的其余步骤仍会执行完毕，之后的轮次不再执行。
+
+    Attributes:
+        errors(list): 失败的步骤，每个元素为(PlanStep对象, 异常对象)
+        completed(int): 已成功执行的步骤数
+    '''
+    def __init__(self, errors, completed):
+        self.errors = list(errors)
+        self.completed = completed
+        lines = [f"  {step}: {type(e).__name__}: {e}"
+            for step, e in self.errors[:20]]
+        if len(self.errors) > 20:
+            lines.append(f"  ... and {len(self.errors) - 20} more")
+        super().__init__(f"{len(self.errors)} step(s) failed after "
+            f"{completed} succeeded:\n" + "\n".join(lines))
+
+class TopoValidationError(RuntimeError):
+    '''当部署前的拓扑校验（Topo.validate）发现错误时，触发此异常
+
+    Attributes:
+        report(ValidationReport): 校验结果
+    '''
+    def __init__(self, report):
+        self.report = report
+        super().__init__(f"topology is invalid, nothing was submitted:\n"
+            f"{report}")
+
+class ProgressTimeoutError(RuntimeError):
+    '''当部署/删除项目超过截止时间仍未完成时，触发此异常
+
+    Attributes:
+        project(str): 项目名
+        usage(str): 进度条类型，"deploy"或"delete"
+        value(float): 最后一次查询到的进度值
+        elapsed_s(float): 已等待的时间（秒）
+        unchanged_s(float): 进度保持最后的值的时间（秒）
+    '''
+    def __init__(self, project, usage, value, elapsed_s, unchanged_s):
+        self.project = project
+        self.usage = usage
+        self.value = value
+        self.elapsed_s = elapsed_s
+        self.unchanged_s = unchanged_s
+        super().__init__(f"{usage} {project} did not finish within "
+            f"{elapsed_s:.1f}s, progress is {value}% (unchanged for "
+            f"{unchanged_s:.1f}s)")
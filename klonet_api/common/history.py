@@ -0,0 +1,382 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+from .. import config
+
+
+'''部署耗时记录与预测
+
+ProjectManager的每次部署/删除都会记录一条DeployRecord：提交请求的耗时、从提交到
+第一次查询到非零进度的时间、进度曲线及总耗时，并以拓扑规模（各类节点数、链路数、
+各镜像的节点数）为键，追加到本地的历史文件（config.deploy_history_path，每行一条
+json）。
+
+DeployHistory对同一后端、同一操作类型的成功记录拟合一个线性模型：
+
+    耗时 ≈ c0 + c1 * 主机数 + c2 * 交换机数 + ... + ck * 链路数
+
+（numpy最小二乘）；记录数少于特征数时退化为按节点数与链路数之和等比例估计。预测值
+用作deploy/destroy的默认超时（见config.deploy_timeout_factor）及进度事件的剩余时间
+（ProgressEvent.eta_s）：
+
+    deploy_history.predict(topo, backend=project_manager.url)   # 42.7（秒）
+'''
+
+# 参与拟合的节点类别，与Topo.dictform()的键一致
+NODE_CATEGORIES = ("hosts", "switches", "routers", "controllers")
+
+
+def topo_shape(topo):
+    '''拓扑规模：各类节点数、链路数及各镜像的节点数
+
+    Args:
+        topo(Topo or dict): Topo对象或拓扑字典
+
+    Returns:
+        字典，如：
+
+        {"nodes": {"hosts": 16, "switches": 20}, "links": 48,
+         "images": {"ubuntu:20.04": 16, "ovs:latest": 20}}
+    '''
+    topo_dict = topo if isinstance(topo, dict) else topo.dictform()
+    nodes, images = {}, {}
+    for category, elements in topo_dict.items():
+        if category == "links" or not isinstance(elements, dict) \
+                or not elements:
+            continue
+        nodes[category] = len(elements)
+        for node_dict in elements.values():
+            image_name = node_dict.get("image_name")
+            images[image_name] = images.get(image_name, 0) + 1
+    return {"nodes": nodes, "links": len(topo_dict.get("links") or ()),
+        "images": images}
+
+
+def _shape_size(shape):
+    return sum(shape["nodes"].values()) + shape["links"]
+
+
+class DeployRecord(object):
+    '''一次部署/删除的耗时记录
+
+    Attributes:
+        backend(str): 后端url
+        user(str): 用户名
+        project(str): 项目名
+        usage(str): 操作类型，"deploy"或"delete"
+        shape(dict): 拓扑规模，见topo_shape
+        started_at(float): 开始时间（unix时间戳）
+        submit_s(float): 提交请求的耗时（秒）
+        first_progress_s(float): 从开始到第一次查询到非零进度的时间（秒），未查询到
+            时为None
+        total_s(float): 从开始到完成（或失败）的时间（秒）
+        curve(list): 进度曲线，每个元素为[距开始的时间（秒）, 进度值]
+        ok(bool): 是否成功完成
+        error(str): 失败时的异常，成功时为None
+    '''
+    __slots__ = ("backend", "user", "project", "usage", "shape", "started_at",
+        "submit_s", "first_progress_s", "total_s", "curve", "ok", "error")
+
+    def __init__(self, backend, user, project, usage, shape, started_at=None,
+            submit_s=None, first_progress_s=None, total_s=None, curve=None,
+            ok=False, error=None):
+        self.backend = backend
+        self.user = user
+        self.project = project
+        self.usage = usage
+        self.shape = shape
+        self.started_at = time.time() if started_at is None else started_at
+        self.submit_s = submit_s
+        self.first_progress_s = first_progress_s
+        self.total_s = total_s
+        self.curve = [] if curve is None else curve
+        self.ok = ok
+        self.error = error
+
+    def dictform(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __str__(self):
+        state = "ok" if self.ok else f"failed ({self.error})"
+        nodes = sum(self.shape["nodes"].values())
+        return f"{self.usage} {self.user}/{self.project} ({nodes} nodes, " \
+            f"{self.shape['links']} links): {state} in {self.total_s:.1f}s"
+
+    def __repr__(self):
+        return (f"DeployRecord({self.usage!r}, {self.project!r}, "
+            f"total_s={self.total_s!r}, ok={self.ok})")
+
+
+class DurationModel(object):
+    '''由历史记录拟合的耗时模型
+
+    Attributes:
+        features(tuple): 特征名，"const"为常数项，"size"表示节点数与链路数之和
+        coefficients(numpy.ndarray): 各特征的系数
+        samples(int): 参与拟合的记录数
+    '''
+    def __init__(self, features, coefficients, samples):
+        self.features = features
+        self.coefficients = coefficients
+        self.samples = samples
+
+    @classmethod
+    def fit(cls, records):
+        '''以最小二乘拟合耗时模型
+
+        Args:
+            records(list): 成功的DeployRecord对象的列表
+
+        Returns:
+            DurationModel对象，没有记录时为None
+        '''
+        if not records:
+            return None
+        totals = np.array([record.total_s for record in records], dtype=float)
+        categories = tuple(category for category in NODE_CATEGORIES
+            if any(record.shape["nodes"].get(category) for record in records))
+        features = ("const",) + categories + ("links",)
+        if len(records) <= len(features):
+            # 记录太少时线性方程欠定，按规模等比例估计
+            sizes = np.array([_shape_size(record.shape) + 1
+                for record in records], dtype=float)
+            return cls(("size",), np.array([totals.sum() / sizes.sum()]),
+                len(records))
+        matrix = np.array([cls._row(features, record.shape)
+            for record in records], dtype=float)
+        coefficients = np.linalg.lstsq(matrix, totals, rcond=None)[0]
+        return cls(features, coefficients, len(records))
+
+    @staticmethod
+    def _row(features, shape):
+        row = []
+        for feature in features:
+            if feature == "const":
+                row.append(1)
+            elif feature == "size":
+                row.append(_shape_size(shape) + 1)
+            elif feature == "links":
+                row.append(shape["links"])
+            else:
+                row.append(shape["nodes"].get(feature, 0))
+        return row
+
+    def predict(self, shape):
+        '''预测耗时（秒），不小于0'''
+        value = float(np.dot(self._row(self.features, shape),
+            self.coefficients))
+        return max(value, 0.0)
+
+    def __repr__(self):
+        terms = ", ".join(f"{feature}={coefficient:.4g}" for feature,
+            coefficient in zip(self.features, self.coefficients))
+        return f"DurationModel({terms}; samples={self.samples})"
+
+
+class DeployHistory(object):
+    '''本地的部署耗时历史
+
+    记录追加到path指定的文件（每行一条json），同时保存在内存中；每个后端及操作类型
+    只保留最近config.deploy_history_max_records条记录用于拟合。
+
+    Attributes:
+        path(str): 历史文件路径，默认为config.deploy_history_path；为None时只保存
+            在内存中
+    '''
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._records = None # 首次使用时从文件读取
+        self._models = {} # (后端, 操作类型) -> DurationModel
+
+    @property
+    def path(self):
+        path = self._path if self._path is not None else getattr(config,
+            "deploy_history_path", None)
+        return None if path is None else os.path.expanduser(path)
+
+    def _load(self):
+        if self._records is not None:
+            return self._records
+        self._records = []
+        path = self.path
+        if path is not None and os.path.exists(path):
+            with open(path) as fp:
+                for line in fp:
+                    try:
+                        self._records.append(DeployRecord(**json.loads(line)))
+                    except (ValueError, TypeError):
+                        continue # 跳过损坏或旧格式的行
+        return self._records
+
+    def add(self, record):
+        '''追加一条记录，写入历史文件失败时只保存在内存中
+
+        Args:
+            record(DeployRecord): 耗时记录
+        '''
+        with self._lock:
+            records = self._load()
+            records.append(record)
+            self._models.pop((record.backend, record.usage), None)
+            max_records = getattr(config, "deploy_history_max_records", 1000)
+            path = self.path
+            if path is None:
+                del records[:-max_records * 4]
+                return
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                if len(records) > max_records * 4:
+                    # 文件过大时只保留最近的记录
+                    del records[:-max_records * 2]
+                    _rewrite(path, records)
+                else:
+                    with open(path, "a") as fp:
+                        fp.write(json.dumps(record.dictform()) + "\n")
+            except OSError:
+                pass
+
+    def records(self, backend=None, usage=None, ok=None):
+        '''查询记录
+
+        Args:
+            backend(str): 后端url，默认为None，即不限
+            usage(str): 操作类型，默认为None，即不限
+            ok(bool): 是否成功，默认为None，即不限
+
+        Returns:
+            DeployRecord对象的列表，按时间先后排列
+        '''
+        with self._lock:
+            return [record for record in self._load()
+                if (backend is None or record.backend == backend)
+                and (usage is None or record.usage == usage)
+                and (ok is None or record.ok == ok)]
+
+    def last_shape(self, backend, user, project):
+        '''某项目最近一次成功部署的拓扑规模
+
+        Args:
+            backend(str): 后端url
+            user(str): 用户名
+            project(str): 项目名
+
+        Returns:
+            拓扑规模（见topo_shape），没有记录时为空拓扑的规模
+        '''
+        with self._lock:
+            for record in reversed(self._load()):
+                if (record.ok and record.usage == "deploy"
+                        and record.backend == backend and record.user == user
+                        and record.project == project):
+                    return record.shape
+        return topo_shape({})
+
+    def model(self, backend, usage="deploy"):
+        '''某后端某操作类型的耗时模型
+
+        Returns:
+            DurationModel对象，没有成功的记录时为None
+        '''
+        key = (backend, usage)
+        with self._lock:
+            if key not in self._models:
+                max_records = getattr(config, "deploy_history_max_records",
+                    1000)
+                records = [record for record in self._load()
+                    if record.ok and record.backend == backend
+                    and record.usage == usage][-max_records:]
+                self._models[key] = DurationModel.fit(records)
+            return self._models[key]
+
+    def predict(self, topo, backend, usage="deploy"):
+        '''预测部署/删除的耗时
+
+        Args:
+            topo(Topo or dict): Topo对象或拓扑字典
+            backend(str): 后端url，如ProjectManager.url
+            usage(str): 操作类型，"deploy"或"delete"
+
+        Returns:
+            预测的耗时（秒），没有历史记录时为None
+        '''
+        model = self.model(backend, usage)
+        return None if model is None else model.predict(topo_shape(topo))
+
+    def clear(self):
+        '''清空内存中的记录及历史文件'''
+        with self._lock:
+            self._records = []
+            self._models.clear()
+            path = self.path
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+
+def _rewrite(path, records):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as fp:
+        for record in records:
+            fp.write(json.dumps(record.dictform()) + "\n")
+    os.replace(tmp_path, path)
+
+
+class DeployTimer(object):
+    '''记录一次部署/删除的耗时，并为进度事件估计剩余时间
+
+    由ProjectManager在提交请求前创建，提交后调用submitted()，每个进度事件传给
+    observe()，结束时调用finish()写入历史。
+    '''
+    def __init__(self, history, backend, user, project, usage, shape):
+        self._history = history
+        self.record = DeployRecord(backend, user, project, usage, shape)
+        model = history.model(backend, usage)
+        self.predicted_s = None if model is None else model.predict(shape)
+        self._started = time.monotonic()
+
+    def elapsed_s(self):
+        return time.monotonic() - self._started
+
+    def submitted(self):
+        self.record.submit_s = round(self.elapsed_s(), 3)
+
+    def timeout_min(self):
+        '''按预测耗时计算的超时时间（分钟），没有历史记录时为None'''
+        if self.predicted_s is None:
+            return None
+        return max(self.predicted_s * getattr(config, "deploy_timeout_factor",
+            3), getattr(config, "deploy_timeout_floor_s", 300)) / 60
+
+    def observe(self, event):
+        '''记录进度，并设置event.eta_s'''
+        elapsed_s = self.elapsed_s()
+        record = self.record
+        if record.first_progress_s is None and event.value > 0:
+            record.first_progress_s = round(elapsed_s, 3)
+        record.curve.append([round(elapsed_s, 3), event.value])
+        if event.done:
+            event.eta_s = 0.0
+        elif self.predicted_s is not None and elapsed_s < self.predicted_s:
+            event.eta_s = self.predicted_s - elapsed_s
+        elif event.value > 0:
+            # 已超过预测耗时（或没有历史记录），按当前进度线性外推
+            event.eta_s = elapsed_s * (100 - event.value) / event.value
+
+    def finish(self, error=None):
+        record = self.record
+        record.total_s = round(self.elapsed_s(), 3)
+        record.ok = error is None and bool(record.curve) \
+            and record.curve[-1][1] >= 100
+        if error is not None:
+            record.error = repr(error)
+        elif not record.ok:
+            record.error = "stopped before completion"
+        if getattr(config, "record_deploy_history", True):
+            self._history.add(record)
+        return record
+
+
+#: DeployHistory: 默认的部署耗时历史
+deploy_history = DeployHistory()
@@ -0,0 +1,224 @@
+import bisect
+import json
+import os
+import re
+import threading
+from .. import config
+
+
+'''请求指标
+
+transport.send()每发出一次HTTP请求（含重试），都会调用已注册的请求钩子，传入一条
+记录（方法、接口、状态码、耗时、请求/响应字节数、异常类型等）。本模块提供默认钩子
+RequestMetrics，按(接口, 方法)汇总调用次数、耗时直方图、请求/响应字节数及错误类型，
+并可导出为json快照或Prometheus文本格式。
+'''
+
+#: tuple: 默认的耗时直方图分桶上界（秒）
+DEFAULT_LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5,
+    5, 10, 30, 60, 120)
+
+# 含有项目名、节点名等变量的接口，归一化后再统计，避免每个项目各占一条指标
+_ENDPOINT_PATTERNS = (
+    (re.compile(r"^/re/project/[^/]+/(node|link|worker_ip)/$"),
+        r"/re/project/{project}/\1/"),
+    (re.compile(r"^/re/project/[^/]+/$"), "/re/project/{project}/"),
+    (re.compile(r"^/master/worker/[^/]+/$"), "/master/worker/{worker_ip}/"),
+)
+
+
+def normalize_endpoint(url_suffix):
+    '''将url中的接口部分归一化，如/re/project/p1/node/归一化为
+    /re/project/{project}/node/
+
+    Args:
+        url_suffix(str): url中的接口部分，可带查询参数
+
+    Returns:
+        归一化后的接口
+    '''
+    path = url_suffix.split("?", 1)[0] or "/"
+    for pattern, repl in _ENDPOINT_PATTERNS:
+        if pattern.match(path):
+            return pattern.sub(repl, path)
+    return path
+
+
+class _EndpointStats(object):
+    __slots__ = ("count", "bucket_counts", "latency_sum_s", "latency_max_s",
+        "request_bytes", "response_bytes", "statuses", "errors")
+
+    def __init__(self, num_buckets):
+        self.count = 0
+        self.bucket_counts = [0] * (num_buckets + 1) # 最后一个为+Inf
+        self.latency_sum_s = 0.0
+        self.latency_max_s = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.statuses = {}
+        self.errors = {}
+
+
+class RequestMetrics(object):
+    '''按(接口, 方法)汇总的请求指标
+
+    Attributes:
+        buckets_s(tuple): 耗时直方图分桶上界（秒），默认为
+            config.metrics_latency_buckets_s
+    '''
+    def __init__(self, buckets_s=None):
+        self.buckets_s = tuple(sorted(buckets_s or getattr(config,
+            "metrics_latency_buckets_s", DEFAULT_LATENCY_BUCKETS_S)))
+        self._lock = threading.Lock()
+        self._stats = {} # (接口, 方法) -> _EndpointStats
+
+    def __call__(self, record):
+        '''请求钩子，汇总一条请求记录。config.collect_metrics为False时不统计。
+
+        Args:
+            record(dict): 请求记录，包含method、endpoint、status、latency_s、
+                request_bytes、response_bytes、error等字段
+        '''
+        if not getattr(config, "collect_metrics", True):
+            return
+        key = (record["endpoint"], record["method"])
+        latency_s = record["latency_s"]
+        bucket = bisect.bisect_left(self.buckets_s, latency_s)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _EndpointStats(len(self.buckets_s))
+            stats.count += 1
+            stats.bucket_counts[bucket] += 1
+            stats.latency_sum_s += latency_s
+            stats.latency_max_s = max(stats.latency_max_s, latency_s)
+            stats.request_bytes += record["request_bytes"]
+            stats.response_bytes += record["response_bytes"]
+            if record["status"] is not None:
+                status = str(record["status"])
+                stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            error = record["error"]
+            if error is not None:
+                stats.errors[error] = stats.errors.get(error, 0) + 1
+
+    def reset(self):
+        '''清空已汇总的指标'''
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self):
+        '''返回指标快照
+
+        Returns:
+            列表，每个元素为一个(接口, 方法)的指标，如：
+
+            [{"endpoint": "/master/topo/", "method": "POST", "count": 1,
+              "latency_sum_s": 0.12, "latency_max_s": 0.12,
+              "latency_buckets": {"0.005": 0, ..., "+Inf": 1},
+              "request_bytes": 5321, "response_bytes": 40,
+              "statuses": {"200": 1}, "errors": {}}]
+
+            其中latency_buckets为累计计数，即耗时不超过各上界的请求数。
+        '''
+        labels = [str(bound) for bound in self.buckets_s] + ["+Inf"]
+        result = []
+        with self._lock:
+            for (endpoint, method), stats in sorted(self._stats.items()):
+                cumulative, buckets = 0, {}
+                for label, count in zip(labels, stats.bucket_counts):
+                    cumulative += count
+                    buckets[label] = cumulative
+                result.append({"endpoint": endpoint, "method": method,
+                    "count": stats.count,
+                    "latency_sum_s": round(stats.latency_sum_s, 6),
+                    "latency_max_s": round(stats.latency_max_s, 6),
+                    "latency_buckets": buckets,
+                    "request_bytes": stats.request_bytes,
+                    "response_bytes": stats.response_bytes,
+                    "statuses": dict(stats.statuses),
+                    "errors": dict(stats.errors)})
+        return result
+
+    def to_json(self, path=None):
+        '''导出json格式的指标快照
+
+        Args:
+            path(str): 文件路径，默认为None，即不写文件
+
+        Returns:
+            json字符串
+        '''
+        text = json.dumps(self.snapshot(), indent=2)
+        if path is not None:
+            _write_atomically(path, text)
+        return text
+
+    def to_prometheus(self, path=None):
+        '''导出Prometheus文本格式的指标
+
+        文件可交由node_exporter的textfile collector采集。
+
+        Args:
+            path(str): 文件路径，默认为None，即不写文件
+
+        Returns:
+            Prometheus文本格式的字符串
+        '''
+        lines = []
+
+        def header(name, metric_type, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        snapshot = self.snapshot()
+        header("klonet_client_requests_total", "counter",
+            "HTTP requests sent to the Klonet master.")
+        for item in snapshot:
+            for status, count in sorted(item["statuses"].items()):
+                lines.append(f"klonet_client_requests_total{{"
+                    f"{_labels(item)},status=\"{status}\"}} {count}")
+
+        header("klonet_client_request_duration_seconds", "histogram",
+            "HTTP request latency in seconds.")
+        for item in snapshot:
+            name = "klonet_client_request_duration_seconds"
+            for bound, count in item["latency_buckets"].items():
+                lines.append(f"{name}_bucket{{{_labels(item)},le=\"{bound}\"}} "
+                    f"{count}")
+            lines.append(f"{name}_sum{{{_labels(item)}}} "
+                f"{item['latency_sum_s']}")
+            lines.append(f"{name}_count{{{_labels(item)}}} {item['count']}")
+
+        for field, help_text in (("request_bytes", "Request payload bytes."),
+            ("response_bytes", "Response payload bytes.")):
+            name = f"klonet_client_{field}_total"
+            header(name, "counter", help_text)
+            for item in snapshot:
+                lines.append(f"{name}{{{_labels(item)}}} {item[field]}")
+
+        header("klonet_client_errors_total", "counter",
+            "HTTP requests that failed with an exception.")
+        for item in snapshot:
+            for error, count in sorted(item["errors"].items()):
+                lines.append(f"klonet_client_errors_total{{{_labels(item)},"
+                    f"error=\"{error}\"}} {count}")
+
+        text = "\n".join(lines) + "\n"
+        if path is not None:
+            _write_atomically(path, text)
+        return text
+
+
+def _labels(item):
+    return f"endpoint=\"{item['endpoint']}\",method=\"{item['method']}\""
+
+
+def _write_atomically(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as fp:
+        fp.write(text)
+    os.replace(tmp_path, path)
+
+
+#: RequestMetrics: 默认注册的请求指标
+request_metrics = RequestMetrics()
@@ -0,0 +1,247 @@
+import base64
+import collections
+import contextlib
+import gzip
+import hashlib
+import json
+import threading
+import time
+from http import HTTPStatus
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from . import transport
+from .errors import ReplayMismatchError
+
+
+'''请求录制与回放
+
+录制：RecordingAdapter在传输层（所有Manager及KlonetAI共享的Session）记录每一次
+HTTP交互，写入gzip压缩的jsonl日志。第一行为文件头，其余每行为一次交互：
+
+    {"t": 0.52, "d": 0.031, "m": "POST", "u": "/master/topo/",
+     "q": "9c1185a5c5e9fc54", "s": 200, "c": "application/json",
+     "r": "{\\"code\\":1,\\"msg\\":\\"success\\"}"}
+
+其中t为相对录制开始的时间（秒），d为请求耗时（秒），u为不含后端地址的路径及查询
+参数，q为请求体的摘要，r为（已解压的）响应体，二进制响应体以base64保存在r64中。
+
+回放：ReplayAdapter不访问后端，而是按(方法, 路径)依次返回日志中的响应；同一路径有
+多条记录时，优先返回请求体摘要相同的最早一条。speed为1时按原耗时等待，为10时等待
+十分之一，为0时不等待，从而可单独测量客户端开销（构建Topo、json处理等）。例子：
+
+    with recording("session.jsonl.gz"):
+        project_manager.deploy("p1", topo)
+
+    with replaying("session.jsonl.gz", speed=0):
+        project_manager.deploy("p1", topo, pool_interval_s=0)
+'''
+
+#: int: 日志格式版本
+LOG_VERSION = 1
+
+
+def _body_digest(body):
+    if body is None:
+        body = b""
+    elif isinstance(body, str):
+        body = body.encode("utf-8")
+    elif not isinstance(body, bytes): # 如流式上传的文件对象
+        return ""
+    return hashlib.sha1(body).hexdigest()[:16]
+
+
+def _path_of(url):
+    parts = urlsplit(url)
+    return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+
+class SessionRecorder(object):
+    '''将HTTP交互写入gzip压缩的jsonl日志
+
+    Attributes:
+        path(str): 日志路径
+        count(int): 已记录的交互数
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        self._fp = gzip.open(path, "wt", encoding="utf-8")
+        self._write({"version": LOG_VERSION, "created": time.time()})
+
+    def _write(self, entry):
+        self._fp.write(json.dumps(entry, ensure_ascii=False,
+            separators=(",", ":")))
+        self._fp.write("\n")
+
+    def record(self, request, response, started_at, duration_s):
+        '''记录一次交互
+
+        Args:
+            request(PreparedRequest): 请求
+            response(Response): 响应
+            started_at(float): 请求开始时的time.monotonic()
+            duration_s(float): 请求耗时（秒）
+        '''
+        entry = {"t": round(started_at - self._started_at, 6),
+            "d": round(duration_s, 6), "m": request.method,
+            "u": _path_of(request.url), "q": _body_digest(request.body),
+            "s": response.status_code,
+            "c": response.headers.get("Content-Type", "")}
+        content = response.content
+        try:
+            entry["r"] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["r64"] = base64.b64encode(content).decode("ascii")
+        with self._lock:
+            self._write(entry)
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._fp.close()
+
+
+class RecordingAdapter(HTTPAdapter):
+    '''正常发出请求，并将每次交互交给SessionRecorder记录'''
+    def __init__(self, recorder, **kwargs):
+        self.recorder = recorder
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        started_at = time.monotonic()
+        response = super().send(request, **kwargs)
+        # 读取响应体后再计时，与正常使用时的耗时一致
+        response.content
+        self.recorder.record(request, response, started_at,
+            time.monotonic() - started_at)
+        return response
+
+
+class SessionLog(object):
+    '''录制日志，按(方法, 路径)索引，供ReplayAdapter依次取用
+
+    Attributes:
+        entries(list): 全部交互记录
+    '''
+    def __init__(self, path):
+        self.entries = []
+        with gzip.open(path, "rt", encoding="utf-8") as fp:
+            header = json.loads(fp.readline())
+            if header.get("version") != LOG_VERSION:
+                raise ValueError(f"Unsupported replay log version "
+                    f"{header.get('version')} in {path}")
+            for line in fp:
+                if line.strip():
+                    self.entries.append(json.loads(line))
+        self._lock = threading.Lock()
+        self._queues = collections.defaultdict(collections.deque)
+        for entry in self.entries:
+            self._queues[(entry["m"], entry["u"])].append(entry)
+
+    def take(self, method, path, digest):
+        '''取出与请求对应的记录
+
+        Returns:
+            交互记录；找不到时返回None
+        '''
+        with self._lock:
+            queue = self._queues.get((method, path))
+            if not queue:
+                return None
+            for i, entry in enumerate(queue):
+                if entry["q"] == digest:
+                    del queue[i]
+                    return entry
+            return queue.popleft()
+
+    def remaining(self):
+        '''返回尚未被取用的记录数'''
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+
+class ReplayAdapter(BaseAdapter):
+    '''不访问后端，直接以录制日志中的记录作为响应
+
+    Attributes:
+        log(SessionLog): 录制日志
+        speed(float): 回放速度。1为按原耗时等待，0为不等待
+        replayed_s(float): 累计模拟的后端耗时（秒）
+    '''
+    def __init__(self, log, speed=1.0):
+        super().__init__()
+        self.log = log
+        self.speed = speed
+        self.replayed_s = 0.0
+
+    def send(self, request, **kwargs):
+        path = _path_of(request.url)
+        entry = self.log.take(request.method, path, _body_digest(request.body))
+        if entry is None:
+            raise ReplayMismatchError(f"No recorded response left for "
+                f"{request.method} {path}")
+        if self.speed:
+            time.sleep(entry["d"] / self.speed)
+        self.replayed_s += entry["d"]
+
+        response = requests.Response()
+        response.status_code = entry["s"]
+        try:
+            response.reason = HTTPStatus(entry["s"]).phrase
+        except ValueError:
+            response.reason = ""
+        response.headers = CaseInsensitiveDict({"Content-Type": entry["c"]})
+        if "r64" in entry:
+            response._content = base64.b64decode(entry["r64"])
+        else:
+            response._content = entry["r"].encode("utf-8")
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
+
+
+@contextlib.contextmanager
+def recording(path):
+    '''在with块内录制所有经由共享Session的HTTP交互
+
+    Args:
+        path(str): 日志路径，建议以.jsonl.gz结尾
+
+    Yields:
+        SessionRecorder对象
+    '''
+    recorder = SessionRecorder(path)
+    transport.set_adapter_factory(lambda pool_maxsize: RecordingAdapter(
+        recorder, pool_connections=1, pool_maxsize=pool_maxsize))
+    try:
+        yield recorder
+    finally:
+        transport.set_adapter_factory(None)
+        recorder.close()
+
+
+@contextlib.contextmanager
+def replaying(path, speed=1.0):
+    '''在with块内以录制日志代替后端
+
+    Args:
+        path(str): recording()生成的日志路径
+        speed(float): 回放速度，默认为1，即按原耗时等待；为0时不等待
+
+    Yields:
+        ReplayAdapter对象
+    '''
+    adapter = ReplayAdapter(SessionLog(path), speed=speed)
+    transport.set_adapter_factory(lambda pool_maxsize: adapter)
+    try:
+        yield adapter
+    finally:
+        transport.set_adapter_factory(None)
@@ -0,0 +1,98 @@
+import json
+import threading
+from .errors import DeadlineExceededError
+
+
+'''并发请求合并（single-flight）
+
+多个线程同时发出完全相同的只读请求时，只有第一个线程（leader）真正发出请求，其余
+线程等待并共享leader的结果（或异常）。请求结束后立即从在途表中移除，因此不会缓存
+任何结果，后续请求仍会访问后端。
+'''
+
+
+class _Call(object):
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    '''合并相同key的并发调用
+
+    Attributes:
+        executed(int): 实际执行的调用次数
+        shared(int): 共享了其它调用结果的次数
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, func, timeout=None):
+        '''执行func，若相同key的调用正在进行，则等待并共享其结果。
+
+        Args:
+            key(hashable): 调用的key，相同key的并发调用会被合并
+            func(callable): 无参数的调用
+            timeout(float): 等待其它线程的调用的最长时间（秒），如当前线程截止时间
+                的剩余时间。默认为None，即一直等待
+
+        Returns:
+            func的返回值
+
+        Raises:
+            func抛出的异常会同时抛给所有共享该调用的线程
+            DeadlineExceededError: 等待超过timeout时，触发此异常
+        '''
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            if not call.event.wait(None if timeout is None
+                    else max(timeout, 0)):
+                raise DeadlineExceededError(f"Deadline exceeded while "
+                    f"waiting for a coalesced request")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self):
+        '''返回合并统计，如{"executed": 3, "shared": 7, "in_flight": 0}'''
+        with self._lock:
+            return {"executed": self.executed, "shared": self.shared,
+                "in_flight": len(self._calls)}
+
+
+def request_key(method, url, params=None, json_body=None, data=None):
+    '''生成请求的key，参数顺序不同但内容相同的请求得到相同的key'''
+    return (method, url,
+        json.dumps(params, sort_keys=True, default=str),
+        json.dumps(json_body, sort_keys=True, default=str),
+        data if isinstance(data, (str, bytes, type(None))) else
+            json.dumps(data, sort_keys=True, default=str))
+
+
+#: SingleFlight: 所有Manager共享的GET请求合并器
+inflight_gets = SingleFlight()
@@ -0,0 +1,279 @@
+import copy
+import mmap
+from . import codec
+
+
+'''拓扑文件
+
+Topo.save/Topo.load使用的行分隔格式（每行一个json数组），与完整的dictform() json
+相比，同一镜像的节点只保存一次公共属性，未配置的链路不保存空的config：
+
+    {"format": "klonet-topo", "version": 1, "categories": ["links", "hosts", ...]}
+    ["t", "hosts", {"type": "host", "image_name": "ubuntu:20.04", ...}]
+    ["n", 0, "h1", 120, 600, [{"ip": "10.0.0.2", ...}]]
+    ["l", "l1", "h1", "s1", "10.0.0.2/24", "", {"sourceType": "host", ...}]
+    ["i", {"nodes": [...], "node_offsets": [...], "links": [...], ...}]
+    ["e", 12345]
+
+第一行为文件头；"t"为节点模板（节点中除name、x、y、interfaces外的全部属性），
+"n"为节点（模板序号、节点名、坐标、接口），"l"为链路（链路名、两端节点名、两端地址
+及其余属性）；"i"为索引，记录各节点、链路及模板所在行的字节偏移；最后一行"e"记录
+索引行的偏移。
+
+顺序读取时逐行解析，不需要把整个文件读入内存；按名称读取单个节点或链路时，先由
+最后一行找到索引，再通过mmap直接解析对应的行。
+'''
+
+#: str: 文件头中的格式名
+FORMAT = "klonet-topo"
+#: int: 格式版本
+FORMAT_VERSION = 1
+
+# 节点中不属于模板的属性
+_NODE_OWN_KEYS = ("name", "x", "y", "interfaces")
+# 链路中单独保存的属性，其余属性保存在最后一项的字典中
+_LINK_KEYS = ("name", "source", "target", "sourceIP", "targetIP")
+
+
+def _node_categories(topo_dict):
+    return [category for category, elements in topo_dict.items()
+        if category != "links" and isinstance(elements, dict)]
+
+
+def write_topo(topo_dict, path, default_link_config=None):
+    '''将拓扑字典写入拓扑文件
+
+    Args:
+        topo_dict(dict): 拓扑字典，即Topo对象的dictform()
+        path(str): 文件路径
+        default_link_config(callable): 返回链路默认config的函数，与默认值相同的
+            config不写入文件
+
+    Returns:
+        写入的字节数
+    '''
+    templates = {} # 模板的json -> 序号
+    offsets = {"templates": [], "nodes": [], "node_offsets": [], "links": [],
+        "link_offsets": []}
+    position = 0
+    default_config = default_link_config() if default_link_config else None
+
+    with open(path, "wb") as fp:
+        def write(record):
+            nonlocal position
+            line = codec.dumps(record) + b"\n"
+            fp.write(line)
+            offset, position = position, position + len(line)
+            return offset
+
+        write({"format": FORMAT, "version": FORMAT_VERSION,
+            "categories": list(topo_dict)})
+        for category in _node_categories(topo_dict):
+            for node_name, node_dict in topo_dict[category].items():
+                template = {key: value for key, value in node_dict.items()
+                    if key not in _NODE_OWN_KEYS}
+                key = codec.dumps([category, template])
+                template_id = templates.get(key)
+                if template_id is None:
+                    template_id = templates[key] = len(templates)
+                    offsets["templates"].append(
+                        write(["t", category, template]))
+                offsets["nodes"].append(node_name)
+                offsets["node_offsets"].append(write(["n", template_id,
+                    node_name, node_dict.get("x", 0), node_dict.get("y", 0),
+                    node_dict.get("interfaces", [])]))
+
+        for link_name, link_dict in topo_dict.get("links", {}).items():
+            rest = {key: value for key, value in link_dict.items()
+                if key not in _LINK_KEYS}
+            if default_config is not None and rest.get(
+                    "config") == default_config:
+                del rest["config"]
+            offsets["links"].append(link_name)
+            offsets["link_offsets"].append(write(["l", link_name,
+                link_dict["source"], link_dict["target"],
+                link_dict.get("sourceIP", ""), link_dict.get("targetIP", ""),
+                rest]))
+
+        write(["e", write(["i", offsets])])
+    return position
+
+
+def _check_header(header, path):
+    if not isinstance(header, dict) or header.get("format") != FORMAT:
+        raise ValueError(f"{path} is not a topo file")
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"unsupported topo file version "
+            f"{header.get('version')} in {path}")
+
+
+class _Template(object):
+    '''节点模板，各节点拷贝出互不影响的属性（只含标量的容器浅拷贝即可）'''
+    __slots__ = ("category", "template", "shallow_keys", "deep_keys")
+
+    def __init__(self, category, template):
+        self.category = category
+        self.template = template
+        self.shallow_keys, self.deep_keys = [], []
+        for key, value in template.items():
+            if not isinstance(value, (dict, list)):
+                continue
+            members = value.values() if isinstance(value, dict) else value
+            if any(isinstance(m, (dict, list)) for m in members):
+                self.deep_keys.append(key)
+            else:
+                self.shallow_keys.append(key)
+
+    def new_node_dict(self):
+        node_dict = self.template.copy()
+        for key in self.shallow_keys:
+            node_dict[key] = node_dict[key].copy()
+        for key in self.deep_keys:
+            node_dict[key] = copy.deepcopy(node_dict[key])
+        return node_dict
+
+
+def _node_from_record(record, templates):
+    _, template_id, node_name, x, y, interfaces = record
+    template = templates[template_id]
+    node_dict = template.new_node_dict()
+    node_dict.update(name=node_name, x=x, y=y, interfaces=interfaces)
+    return template.category, node_dict
+
+
+def _link_from_record(record, default_link_config):
+    _, link_name, source, target, source_ip, target_ip, rest = record
+    link_dict = {"name": link_name, "source": source, "target": target,
+        "sourceIP": source_ip, "targetIP": target_ip}
+    link_dict.update(rest)
+    if "config" not in link_dict and default_link_config is not None:
+        link_dict["config"] = default_link_config()
+    return link_dict
+
+
+def iter_topo(path, default_link_config=None):
+    '''逐行读取拓扑文件
+
+    每次只解析一行，模板以外的内容不会在读取器中保留。
+
+    Args:
+        path(str): 文件路径
+        default_link_config(callable): 返回链路默认config的函数，用于还原未写入文件
+            的config
+
+    Yields:
+        文件头之后依次为("node", 类别, 节点字典)及("link", "links", 链路字典)；第一个
+        元素为("header", None, 文件头字典)
+
+    Raises:
+        ValueError: 当文件不是拓扑文件或版本不支持时，触发此异常
+    '''
+    templates = []
+    with open(path, "rb") as fp:
+        header = codec.loads(fp.readline())
+        _check_header(header, path)
+        yield "header", None, header
+        for line in fp:
+            record = codec.loads(line)
+            kind = record[0]
+            if kind == "n":
+                category, node_dict = _node_from_record(record, templates)
+                yield "node", category, node_dict
+            elif kind == "l":
+                yield "link", "links", _link_from_record(record,
+                    default_link_config)
+            elif kind == "t":
+                templates.append(_Template(record[1], record[2]))
+            else: # 索引，之后不再有节点或链路
+                break
+
+
+def read_topo(path, default_link_config=None):
+    '''流式读取拓扑文件，返回拓扑字典
+
+    Args:
+        path(str): 文件路径
+        default_link_config(callable): 同iter_topo
+
+    Returns:
+        拓扑字典，可直接用于构建Topo对象
+    '''
+    topo_dict = {}
+    for kind, category, element in iter_topo(path, default_link_config):
+        if kind == "header":
+            for name in element.get("categories", []):
+                topo_dict[name] = {}
+        else:
+            topo_dict.setdefault(category, {})[element["name"]] = element
+    return topo_dict
+
+
+class TopoFileIndex(object):
+    '''以mmap打开的拓扑文件，按名称读取单个节点或链路
+
+    打开时只解析文件头、模板及索引行；节点、链路在读取时才解析对应的行。
+
+    Attributes:
+        path(str): 文件路径
+        header(dict): 文件头
+        categories(list): 拓扑中的类别名（含"links"）
+        node_names(list): 全部节点名，顺序与文件中相同
+        link_names(list): 全部链路名，顺序与文件中相同
+    '''
+    def __init__(self, path, default_link_config=None):
+        self.path = path
+        self._default_link_config = default_link_config
+        self._fp = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+            self.header = self._record(0)
+            _check_header(self.header, path)
+            last_line = self._mm.rfind(b"\n", 0, len(self._mm) - 1) + 1
+            trailer = self._record(last_line)
+            if not isinstance(trailer, list) or trailer[0] != "e":
+                raise ValueError(f"{path} is truncated (no index)")
+            index = self._record(trailer[1])[1]
+        except Exception:
+            self.close()
+            raise
+        self.categories = self.header.get("categories", [])
+        self.node_names = index["nodes"]
+        self.link_names = index["links"]
+        self._node_offsets = dict(zip(index["nodes"], index["node_offsets"]))
+        self._link_offsets = dict(zip(index["links"], index["link_offsets"]))
+        self._templates = [_Template(*self._record(offset)[1:])
+            for offset in index["templates"]]
+
+    def _record(self, offset):
+        end = self._mm.find(b"\n", offset)
+        return codec.loads(self._mm[offset:end if end >= 0 else len(self._mm)])
+
+    def has_node(self, node_name):
+        return node_name in self._node_offsets
+
+    def has_link(self, link_name):
+        return link_name in self._link_offsets
+
+    def node(self, node_name):
+        '''返回(类别, 节点字典)
+
+        Raises:
+            KeyError: 当节点不存在时，触发此异常
+        '''
+        return _node_from_record(self._record(self._node_offsets[node_name]),
+            self._templates)
+
+    def link(self, link_name):
+        '''返回链路字典
+
+        Raises:
+            KeyError: 当链路不存在时，触发此异常
+        '''
+        return _link_from_record(self._record(self._link_offsets[link_name]),
+            self._default_link_config)
+
+    def close(self):
+        mm = getattr(self, "_mm", None)
+        if mm is not None:
+            mm.close()
+        self._fp.close()
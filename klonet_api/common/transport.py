@@ -0,0 +1,568 @@
+import contextlib
+import gzip
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from .. import config
+from . import codec
+from .metrics import normalize_endpoint, request_metrics
+from .errors import DeadlineExceededError, CircuitOpenError
+
+
+'''HTTP传输层
+
+所有Manager以及KlonetAI的请求均经由本模块维护的共享Session发出。每个后端
+（即每个"http://ip:port"）对应一个keep-alive的requests.Session，从而使同一后端的
+连续请求可以复用TCP连接，而不是每次请求都重新握手。
+
+send()为所有请求的统一出口，负责：
+1. 按接口设置连接/读取超时（见config.endpoint_timeouts）。
+2. 对幂等请求（GET及显式声明幂等的请求，如进度条轮询）在连接失败、超时或后端
+   返回502/503/504时，以带随机抖动的指数退避自动重试。
+3. 遵守request_deadline()设置的整体截止时间：多请求操作（如动态添加链路）中的
+   每个请求的超时及重试等待都不会超过剩余时间。
+4. 熔断：每个后端有一个熔断器（CircuitBreaker），连续失败达到阈值后熔断器打开，
+   之后的请求立即抛出CircuitOpenError，而不是各自等待超时；冷却期过后放行一个
+   试探请求（半开状态），成功则关闭熔断器。
+5. 每次HTTP请求（含重试）结束后调用已注册的请求钩子（见add_request_hook()），
+   默认钩子为metrics.request_metrics。
+'''
+
+#: 幂等的HTTP方法，默认可重试
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+#: 可重试的HTTP状态码
+RETRY_STATUS_CODES = (502, 503, 504)
+
+_lock = threading.Lock()
+_sessions = {}  # 后端url -> requests.Session
+_pool_sizes = {}  # 后端url -> 连接池大小
+_breakers = {}  # 后端url -> CircuitBreaker
+_local = threading.local()  # 线程内的截止时间及试探标记
+_request_hooks = [request_metrics]
+_adapter_factory = None  # pool_maxsize -> 适配器，为None时使用HTTPAdapter
+
+
+def backend_url(backend_ip, backend_port):
+    '''拼接后端url
+
+    Args:
+        backend_ip(str): 后端服务器IP
+        backend_port(int): 后端服务器端口
+
+    Returns:
+        后端url，如"http://127.0.0.1:12352"
+    '''
+    return f"http://{backend_ip}:{backend_port}"
+
+
+def _mount_adapter(session, pool_maxsize):
+    if _adapter_factory is not None:
+        adapter = _adapter_factory(pool_maxsize)
+    else:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+
+def get_session(url):
+    '''获取目标后端的共享Session，若不存在则创建。
+
+    Args:
+        url(str): 后端url，如"http://127.0.0.1:12352"
+
+    Returns:
+        该后端对应的requests.Session对象
+    '''
+    session = _sessions.get(url)
+    if session is not None:
+        return session
+
+    with _lock:
+        session = _sessions.get(url)
+        if session is None:
+            session = requests.Session()
+            # 大型项目文档压缩后通常只有原大小的10%左右
+            session.headers["Accept-Encoding"] = "gzip, deflate"
+            pool_maxsize = _pool_sizes.get(url,
+                getattr(config, "pool_maxsize", 10))
+            _mount_adapter(session, pool_maxsize)
+            _sessions[url] = session
+    return session
+
+
+def configure_pool(backend_ip, backend_port, pool_maxsize):
+    '''配置某个后端的连接池大小。
+
+    连接池大小决定了同一后端最多可同时保持的keep-alive连接数，并发请求数超过该值
+    时，多出的连接在使用后不会被放回池中。若该后端的Session已经存在，则会以新的池
+    大小重新挂载适配器（已有的空闲连接将被关闭）。
+
+    Args:
+        backend_ip(str): 后端服务器IP
+        backend_port(int): 后端服务器端口
+        pool_maxsize(int): 连接池大小，需为正整数
+
+    Raises:
+        ValueError: 当pool_maxsize不是正整数时，触发此异常
+    '''
+    if not isinstance(pool_maxsize, int) or pool_maxsize <= 0:
+        raise ValueError(f"pool_maxsize must be a positive integer, "
+            f"got {pool_maxsize}")
+
+    _set_pool_size(backend_url(backend_ip, backend_port), pool_maxsize)
+
+
+def ensure_pool_size(url, pool_maxsize):
+    '''保证目标后端的连接池大小不小于pool_maxsize。
+
+    用于并发调用方（如异步管理类），避免并发数超过连接池大小时连接无法复用。
+
+    Args:
+        url(str): 后端url
+        pool_maxsize(int): 所需的最小连接池大小
+    '''
+    current = _pool_sizes.get(url, getattr(config, "pool_maxsize", 10))
+    if pool_maxsize > current:
+        _set_pool_size(url, pool_maxsize)
+
+
+def _set_pool_size(url, pool_maxsize):
+    with _lock:
+        _pool_sizes[url] = pool_maxsize
+        session = _sessions.get(url)
+        if session is not None:
+            for adapter in set(session.adapters.values()):
+                adapter.close()
+            _mount_adapter(session, pool_maxsize)
+
+
+def set_adapter_factory(factory):
+    '''替换所有共享Session使用的传输适配器。
+
+    用于在传输层插入录制、回放等功能（见replay模块）。已存在的Session会立即以新
+    适配器重新挂载，之后新建的Session也会使用新适配器。
+
+    Args:
+        factory(callable): 接受连接池大小、返回requests适配器的可调用对象。为None
+            时恢复默认的HTTPAdapter
+    '''
+    global _adapter_factory
+    with _lock:
+        _adapter_factory = factory
+        for url, session in _sessions.items():
+            for adapter in set(session.adapters.values()):
+                adapter.close()
+            _mount_adapter(session, _pool_sizes.get(url,
+                getattr(config, "pool_maxsize", 10)))
+
+
+def connection_stats(url=None):
+    '''统计各后端的连接复用情况。
+
+    Args:
+        url(str): 后端url。默认为None，表示统计所有后端
+
+    Returns:
+        一个字典，key为后端url，value为该后端的统计信息。例子：
+            {"http://127.0.0.1:12352": {
+                "pool_maxsize": 10, # 连接池大小
+                "requests": 500, # 已发出的请求数
+                "connections": 2, # 新建立的TCP连接数
+                "reused": 498 # 复用已有连接的请求数
+            }}
+    '''
+    stats = {}
+    with _lock:
+        items = [(u, s) for u, s in _sessions.items() if url in (None, u)]
+    for u, session in items:
+        num_requests = num_connections = 0
+        for adapter in set(session.adapters.values()):
+            poolmanager = getattr(adapter, "poolmanager", None)
+            if poolmanager is None:
+                continue
+            for key in list(poolmanager.pools.keys()):
+                pool = poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                num_requests += pool.num_requests
+                num_connections += pool.num_connections
+        stats[u] = {
+            "pool_maxsize": _pool_sizes.get(u,
+                getattr(config, "pool_maxsize", 10)),
+            "requests": num_requests,
+            "connections": num_connections,
+            "reused": max(num_requests - num_connections, 0),
+        }
+    return stats
+
+
+class CircuitBreaker(object):
+    '''后端熔断器
+
+    状态说明：
+    closed: 正常放行请求；连续失败（连接失败、超时或5xx）达到阈值后转为open。
+    open: 立即拒绝请求；冷却期（reset_timeout_s）过后放行一个试探请求。
+    half_open: 试探请求进行中，其余请求仍被拒绝；试探成功则转为closed，失败则
+        重新转为open。
+
+    Attributes:
+        name(str): 熔断器名称，一般为后端url
+        failure_threshold(int): 触发熔断的连续失败次数
+        reset_timeout_s(float): 熔断后的冷却时间（秒）
+    '''
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=None, reset_timeout_s=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or getattr(config,
+            "breaker_failure_threshold", 5)
+        self.reset_timeout_s = reset_timeout_s or getattr(config,
+            "breaker_reset_timeout_s", 30)
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def before_request(self):
+        '''请求前调用，熔断器打开时抛出CircuitOpenError'''
+        if getattr(_local, "probing", False):
+            return
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            elapsed_s = time.monotonic() - self._opened_at
+            if (self._state == self.OPEN and not self._trial_in_flight
+                and elapsed_s >= self.reset_timeout_s):
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = True
+                return
+            retry_in_s = max(self.reset_timeout_s - elapsed_s, 0)
+            raise CircuitOpenError(f"Klonet backend {self.name} is unhealthy "
+                f"({self._failures} consecutive failures), failing fast. "
+                f"It will be probed again in {retry_in_s:.0f}s, or run "
+                f"test_klonet_connection() to probe it now.")
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if (self._state != self.CLOSED
+                or self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        '''请求未得到后端的结果（如参数错误）时调用，归还试探请求的名额'''
+        with self._lock:
+            if self._trial_in_flight:
+                self._trial_in_flight = False
+                self._state = self.OPEN
+
+    @contextlib.contextmanager
+    def probe(self):
+        '''在with块中无视熔断状态放行请求，用于主动探测后端是否恢复'''
+        outer = getattr(_local, "probing", False)
+        _local.probing = True
+        try:
+            yield self
+        finally:
+            _local.probing = outer
+
+    def stats(self):
+        '''返回熔断器状态，如{"state": "closed", "failures": 0}'''
+        with self._lock:
+            return {"state": self._state, "failures": self._failures}
+
+
+def get_breaker(url):
+    '''获取目标后端的熔断器，若不存在则创建'''
+    with _lock:
+        breaker = _breakers.get(url)
+        if breaker is None:
+            breaker = _breakers[url] = CircuitBreaker(url)
+    return breaker
+
+
+@contextlib.contextmanager
+def request_deadline(seconds):
+    '''为当前线程中的请求设置整体截止时间。
+
+    在with块中发出的所有请求共享同一截止时间；嵌套使用时取较早的截止时间。超过
+    截止时间后，后续请求会直接抛出DeadlineExceededError。例子：
+
+        with request_deadline(10):
+            link_manager.dynamic_add_link("l1", h1, s1, src_IP="10.0.0.1/24")
+
+    Args:
+        seconds(float): 从现在起的剩余秒数。为None时不设置截止时间
+    '''
+    if seconds is None:
+        yield
+        return
+
+    outer = getattr(_local, "deadline", None)
+    deadline = time.monotonic() + seconds
+    _local.deadline = deadline if outer is None else min(outer, deadline)
+    try:
+        yield
+    finally:
+        _local.deadline = outer
+
+
+def remaining_time():
+    '''返回当前线程截止时间的剩余秒数，未设置截止时间时返回None'''
+    deadline = getattr(_local, "deadline", None)
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def endpoint_timeout(url_suffix):
+    '''返回接口的(连接超时, 读取超时)，单位为秒。
+
+    按url前缀在config.endpoint_timeouts中进行最长匹配，未匹配时使用
+    config.connect_timeout_s及config.read_timeout_s。
+    '''
+    connect_s = getattr(config, "connect_timeout_s", 3.05)
+    read_s = getattr(config, "read_timeout_s", 30)
+    matched = ""
+    for prefix, timeout in getattr(config, "endpoint_timeouts", {}).items():
+        if url_suffix.startswith(prefix) and len(prefix) > len(matched):
+            matched = prefix
+            connect_s, read_s = timeout
+    return connect_s, read_s
+
+
+def _backoff_delay(attempt):
+    # full jitter：在[0, min(上限, 基数*2^attempt)]中均匀取值
+    base_s = getattr(config, "retry_backoff_s", 0.5)
+    max_s = getattr(config, "retry_backoff_max_s", 8)
+    return random.uniform(0, min(max_s, base_s * (2 ** attempt)))
+
+
+def _clamp_timeout(timeout, remaining):
+    if remaining is None:
+        return timeout
+    if isinstance(timeout, tuple):
+        return tuple(min(t, remaining) for t in timeout)
+    return min(timeout, remaining)
+
+
+def send(session, method, url, url_suffix="", timeout=None, idempotent=None,
+    breaker=None, **kwargs):
+    '''发出请求，附带超时、重试、截止时间及熔断控制。
+
+    Args:
+        session(Session): requests.Session对象
+        method(str): HTTP方法
+        url(str): 完整url
+        url_suffix(str): url中的接口部分，用于匹配接口超时
+        timeout(float/tuple): 超时时间，默认由endpoint_timeout()决定
+        idempotent(bool): 是否可安全重试。默认为None，即仅GET等幂等方法可重试
+        breaker(CircuitBreaker): 该后端的熔断器，默认为None，即不进行熔断控制
+        **kwargs: 传给Session.request的其它参数
+
+    Returns:
+        requests库的Response对象
+
+    Raises:
+        DeadlineExceededError: 当超过request_deadline()设置的截止时间时，触发此异常
+        CircuitOpenError: 当后端熔断器处于打开状态时，触发此异常
+        requests.exceptions.RequestException: 重试次数用尽后的连接失败或超时
+    '''
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    retries = getattr(config, "max_retries", 3) if idempotent else 0
+    if timeout is None:
+        timeout = endpoint_timeout(url_suffix)
+
+    attempt = 0
+    while True:
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceededError(f"Deadline exceeded before "
+                f"{method} {url_suffix or url}")
+        if breaker is not None:
+            breaker.before_request()
+        started_at = time.perf_counter()
+        try:
+            resp = session.request(method, url,
+                timeout=_clamp_timeout(timeout, remaining), **kwargs)
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout) as e:
+            _notify_hooks(method, url_suffix, started_at, error=e,
+                data=kwargs.get("data"))
+            if breaker is not None:
+                breaker.record_failure()
+            remaining = remaining_time()
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceededError(f"Deadline exceeded during "
+                    f"{method} {url_suffix or url}: {e}") from e
+            if attempt >= retries:
+                raise
+        except BaseException as e:
+            _notify_hooks(method, url_suffix, started_at, error=e,
+                data=kwargs.get("data"))
+            if breaker is not None:
+                breaker.release()
+            raise
+        else:
+            _notify_hooks(method, url_suffix, started_at, resp=resp)
+            if breaker is not None:
+                if resp.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            if (resp.status_code not in RETRY_STATUS_CODES
+                or attempt >= retries):
+                return resp
+
+        delay = _backoff_delay(attempt)
+        remaining = remaining_time()
+        if remaining is not None and remaining <= delay:
+            raise DeadlineExceededError(f"Deadline exceeded while retrying "
+                f"{method} {url_suffix or url}")
+        time.sleep(delay)
+        attempt += 1
+
+
+def add_request_hook(hook):
+    '''注册请求钩子
+
+    每次HTTP请求（含重试）结束后，钩子会被调用一次，参数为一条请求记录：
+
+        {"method": "GET", "endpoint": "/re/project/{project}/",
+         "url_suffix": "/re/project/p1/", "status": 200, "latency_s": 0.03,
+         "request_bytes": 0, "response_bytes": 5321, "error": None}
+
+    其中endpoint为归一化后的接口；请求以异常结束时status为None，error为异常类名。
+    钩子在发出请求的线程中同步调用，应尽快返回；钩子抛出的异常会被忽略。
+
+    Args:
+        hook(callable): 接受一条请求记录的可调用对象
+    '''
+    with _lock:
+        if hook not in _request_hooks:
+            _request_hooks.append(hook)
+
+
+def remove_request_hook(hook):
+    '''注销请求钩子
+
+    Args:
+        hook(callable): 已注册的钩子
+    '''
+    with _lock:
+        if hook in _request_hooks:
+            _request_hooks.remove(hook)
+
+
+def _body_size(body):
+    if isinstance(body, (bytes, str)):
+        return len(body)
+    return 0
+
+
+def _notify_hooks(method, url_suffix, started_at, resp=None, error=None,
+    data=None):
+    if not _request_hooks:
+        return
+    if resp is not None:
+        request_bytes = _body_size(resp.request.body)
+        response_bytes = len(resp.content)
+    else:
+        request_bytes, response_bytes = _body_size(data), 0
+    record = {"method": method, "endpoint": normalize_endpoint(url_suffix),
+        "url_suffix": url_suffix,
+        "status": resp.status_code if resp is not None else None,
+        "latency_s": time.perf_counter() - started_at,
+        "request_bytes": request_bytes, "response_bytes": response_bytes,
+        "error": type(error).__name__ if error is not None else None}
+    for hook in list(_request_hooks):
+        try:
+            hook(record)
+        except Exception:
+            pass
+
+
+def encode_json_body(obj):
+    '''将请求体编码为json，必要时进行gzip压缩。
+
+    当config.gzip_requests为True且编码后的请求体不小于config.gzip_min_bytes时，
+    会对请求体进行gzip压缩并设置Content-Encoding头。该功能需要后端支持解压请求体，
+    因此默认关闭。
+
+    Args:
+        obj: 请求体对象
+
+    Returns:
+        (请求体字节串, 需附加的请求头字典)
+    '''
+    return prepare_json_body(codec.dumps(obj))
+
+
+def prepare_json_body(body):
+    '''为已编码的json请求体附加请求头，必要时进行gzip压缩（见encode_json_body）。
+
+    Args:
+        body(bytes): json字节串
+
+    Returns:
+        (请求体字节串, 需附加的请求头字典)
+    '''
+    headers = {"Content-Type": "application/json"}
+    if (getattr(config, "gzip_requests", False)
+        and len(body) >= getattr(config, "gzip_min_bytes", 64 * 1024)):
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
+
+
+def read_json(response):
+    '''解析response中的json，并将结果缓存在response对象上。
+
+    合并后的请求由多个调用方共享同一个response对象，缓存可避免对同一响应体重复解析。
+
+    Args:
+        response(Response): requests库的Response对象
+
+    Returns:
+        解析后的json
+
+    Raises:
+        requests.exceptions.JSONDecodeError: 当返回体不包含json时，触发此异常
+    '''
+    try:
+        return response._klonet_json
+    except AttributeError:
+        pass
+    try:
+        response._klonet_json = codec.loads(response.content)
+    except ValueError:
+        # 非utf-8编码等情况交由requests处理，其异常类型与response.json()一致
+        response._klonet_json = response.json()
+    return response._klonet_json
+
+
+def close_sessions():
+    '''关闭所有共享Session及其连接池'''
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,277 @@
+from .. import config
+from .base_funcs import get_plural_of_words, ip_to_int, prefix_to_mask
+
+
+'''拓扑校验
+
+validate_topo对拓扑字典做一次线性扫描（先节点后链路，每个元素只访问一次，全部查找
+均为字典操作），在提交给后端之前找出以下问题：
+
+    unsupported_type        节点类型不受支持，或节点所在类别与类型不符
+    duplicate_node          同一节点名出现在多个类别中
+    coordinate_out_of_range 坐标不是数值，或超出[0, config.max_coordinate]
+    interface_collision     同一节点上的接口名重复（含截断到IFNAME_MAX_LEN后重复）
+    interface_name_too_long 接口名超过IFNAME_MAX_LEN，将被截断（警告）
+    dangling_link           链路的端点节点不存在
+    self_loop               链路两端为同一节点
+    parallel_link           两条链路连接同一对节点
+    endpoint_type_mismatch  链路记录的端点类型（sourceType/targetType）与节点不符
+    invalid_address         链路或接口的地址不合法
+    duplicate_ip            同一ip地址被多个链路端点（或接口）使用
+    subnet_mismatch         链路两端的地址不在同一子网
+
+结果为ValidationReport，万级节点的拓扑也只需数十毫秒。例子：
+
+    report = topo.validate()
+    if not report.ok:
+        print(report)
+'''
+
+#: int: 接口名的最大长度（Linux的IFNAMSIZ减去结尾的\0）
+IFNAME_MAX_LEN = 15
+#: str: 问题的严重程度，error会导致部署失败，warning不会
+ERROR, WARNING = "error", "warning"
+
+
+class ValidationIssue(object):
+    '''校验发现的一个问题
+
+    Attributes:
+        severity(str): "error"或"warning"
+        code(str): 问题类型，见模块说明
+        element(str): 相关的节点名或链路名
+        message(str): 便于阅读的说明
+    '''
+    __slots__ = ("severity", "code", "element", "message")
+
+    def __init__(self, severity, code, element, message):
+        self.severity = severity
+        self.code = code
+        self.element = element
+        self.message = message
+
+    def dictform(self):
+        return {"severity": self.severity, "code": self.code,
+            "element": self.element, "message": self.message}
+
+    def __str__(self):
+        return f"[{self.severity}] {self.code} {self.element}: {self.message}"
+
+    def __repr__(self):
+        return f"ValidationIssue({self.code!r}, {self.element!r})"
+
+
+class ValidationReport(object):
+    '''拓扑校验的结果
+
+    Attributes:
+        issues(list): 全部问题（ValidationIssue对象），按发现的顺序排列
+        num_nodes(int): 校验的节点数
+        num_links(int): 校验的链路数
+    '''
+    def __init__(self, issues, num_nodes, num_links):
+        self.issues = issues
+        self.num_nodes = num_nodes
+        self.num_links = num_links
+
+    @property
+    def errors(self):
+        return [issue for issue in self.issues if issue.severity == ERROR]
+
+    @property
+    def warnings(self):
+        return [issue for issue in self.issues if issue.severity == WARNING]
+
+    @property
+    def ok(self):
+        '''没有error（可以有warning）时为True'''
+        return not any(issue.severity == ERROR for issue in self.issues)
+
+    def counts(self):
+        '''各问题类型的数量，如{"dangling_link": 2}'''
+        counts = {}
+        for issue in self.issues:
+            counts[issue.code] = counts.get(issue.code, 0) + 1
+        return counts
+
+    def dictform(self):
+        return {"ok": self.ok, "nodes": self.num_nodes,
+            "links": self.num_links, "counts": self.counts(),
+            "issues": [issue.dictform() for issue in self.issues]}
+
+    def __str__(self):
+        errors, warnings = len(self.errors), len(self.warnings)
+        lines = [f"{self.num_nodes} nodes, {self.num_links} links: "
+            f"{errors} error(s), {warnings} warning(s)"]
+        lines.extend(f"  {issue}" for issue in self.issues[:20])
+        if len(self.issues) > 20:
+            lines.append(f"  ... and {len(self.issues) - 20} more")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return (f"ValidationReport(ok={self.ok}, issues={len(self.issues)}, "
+            f"counts={self.counts()})")
+
+
+# 节点类型 -> 类别，不支持的类型为None
+_categories = {}
+
+
+def _category_of(node_type):
+    if node_type not in _categories:
+        try:
+            _categories[node_type] = get_plural_of_words(node_type)
+        except TypeError:
+            _categories[node_type] = None
+    return _categories[node_type]
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_topo(topo_dict):
+    '''校验拓扑字典
+
+    Args:
+        topo_dict(dict): 拓扑字典，即Topo对象的dictform()
+
+    Returns:
+        ValidationReport对象
+    '''
+    issues = []
+    max_coordinate = getattr(config, "max_coordinate", 10 ** 7)
+    node_types = {} # 节点名 -> 类型
+    ip_owners = {} # ip地址（整数）-> (首个使用者的节点名, 说明)
+    duplicate_ips = set()
+    ip_values = {} # 已解析的地址（含掩码）-> 整数，接口与链路端点的地址只解析一次
+
+    def ip_value(address):
+        value = ip_values.get(address)
+        if value is None:
+            value = ip_values[address] = ip_to_int(address)
+        return value
+
+    def issue(severity, code, element, message):
+        issues.append(ValidationIssue(severity, code, element, message))
+
+    def claim_ip(value, node_name, owner, element, address):
+        if value in ip_owners:
+            if value not in duplicate_ips:
+                duplicate_ips.add(value)
+                issue(ERROR, "duplicate_ip", element, f"{address} is also "
+                    f"used by {ip_owners[value][1]}")
+        else:
+            ip_owners[value] = (node_name, owner)
+
+    # 节点
+    for category, elements in topo_dict.items():
+        if category == "links" or not isinstance(elements, dict):
+            continue
+        for node_name, node_dict in elements.items():
+            node_type = node_dict.get("type")
+            expected = _category_of(node_type)
+            if expected is None:
+                issue(ERROR, "unsupported_type", node_name,
+                    f"node type {node_type!r} is not supported")
+            elif expected != category:
+                issue(ERROR, "unsupported_type", node_name, f"node of type "
+                    f"{node_type!r} is in {category!r}, expected {expected!r}")
+            if node_name in node_types:
+                issue(ERROR, "duplicate_node", node_name,
+                    f"node name appears in more than one category")
+            node_types[node_name] = node_type
+
+            x, y = node_dict.get("x", 0), node_dict.get("y", 0)
+            if not (_is_number(x) and _is_number(y)
+                    and 0 <= x <= max_coordinate and 0 <= y <= max_coordinate):
+                issue(ERROR, "coordinate_out_of_range", node_name,
+                    f"({x!r}, {y!r}) is not within [0, {max_coordinate}]")
+
+            names = set()
+            for interface in node_dict.get("interfaces", []):
+                name = interface.get("name", "")
+                short_name = name[:IFNAME_MAX_LEN]
+                if short_name in names:
+                    issue(ERROR, "interface_collision", node_name,
+                        f"interface name {name!r} is used more than once"
+                        + ("" if name == short_name else
+                        f" after truncation to {short_name!r}"))
+                elif name != short_name:
+                    issue(WARNING, "interface_name_too_long", node_name,
+                        f"interface name {name!r} is longer than "
+                        f"{IFNAME_MAX_LEN} characters and will be truncated")
+                names.add(short_name)
+                address = interface.get("ip")
+                if not address:
+                    continue
+                try:
+                    value = ip_value(address)
+                    ip_value(interface.get("netmask") or "0.0.0.0")
+                except (ValueError, AttributeError):
+                    issue(ERROR, "invalid_address", node_name,
+                        f"interface {name!r} has an illegal address "
+                        f"{address!r}/{interface.get('netmask')!r}")
+                    continue
+                # 链路端点的地址同时出现在接口中，以接口为准只登记一次
+                claim_ip(value, node_name, f"{node_name}:{name}", node_name,
+                    address)
+
+    # 链路
+    link_pairs = {} # 无序端点对 -> 链路名
+    links = topo_dict.get("links", {})
+    for link_name, link_dict in links.items():
+        source, target = link_dict.get("source"), link_dict.get("target")
+        if source == target:
+            issue(ERROR, "self_loop", link_name,
+                f"both ends are node {source!r}")
+        elif source in node_types and target in node_types:
+            # 节点名为字符串，以排序后拼接的字符串作为无序端点对
+            pair = (f"{source}\0{target}" if source < target
+                else f"{target}\0{source}")
+            if pair in link_pairs:
+                issue(ERROR, "parallel_link", link_name, f"connects the same "
+                    f"nodes as link {link_pairs[pair]!r}")
+            else:
+                link_pairs[pair] = link_name
+
+        network_of_source = None
+        for end, node_name, type_key, ip_key in (
+                ("source", source, "sourceType", "sourceIP"),
+                ("target", target, "targetType", "targetIP")):
+            if node_name not in node_types:
+                issue(ERROR, "dangling_link", link_name,
+                    f"{end} node {node_name!r} does not exist")
+            elif link_dict.get(type_key, node_types[node_name]) \
+                    != node_types[node_name]:
+                issue(ERROR, "endpoint_type_mismatch", link_name,
+                    f"{type_key} is {link_dict[type_key]!r} but node "
+                    f"{node_name!r} is a {node_types[node_name]!r}")
+
+            address = link_dict.get(ip_key)
+            if not address:
+                continue
+            try:
+                ip, _, prefix = address.partition("/")
+                prefix_len = int(prefix)
+                if not 0 <= prefix_len <= 32:
+                    raise ValueError(address)
+                value = ip_value(ip)
+                network = value & prefix_to_mask(prefix_len)
+            except (ValueError, TypeError, AttributeError):
+                issue(ERROR, "invalid_address", link_name,
+                    f"{ip_key} {address!r} is not a legal cidr address")
+                continue
+            if end == "source":
+                network_of_source = (network, prefix_len)
+            elif network_of_source not in (None, (network, prefix_len)):
+                issue(ERROR, "subnet_mismatch", link_name,
+                    f"{link_dict['sourceIP']} and {link_dict['targetIP']} are "
+                    f"not in the same subnet")
+            # 未同步到接口的地址（如直接修改了links字典）也参与重复检查
+            owner = ip_owners.get(value)
+            if owner is None or owner[0] != node_name:
+                claim_ip(value, node_name, f"{link_name}:{end}", link_name,
+                    address.partition("/")[0])
+
+    return ValidationReport(issues, len(node_types), len(links))
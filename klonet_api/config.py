@@ -7,3 +7,73 @@
 backend_ip = "220.243.137.82"
 #: int: 后端服务器端口
 backend_port = 12352
+#: int: 每个后端的keep-alive连接池大小，可通过configure_pool()针对单个后端修改
+pool_maxsize = 10
+#: float: 项目快照缓存的有效期（秒），为0时关闭缓存
+snapshot_ttl_s = 5
+#: bool: 是否合并相同的并发GET请求
+coalesce_gets = True
+#: float: 默认连接超时（秒）
+connect_timeout_s = 3.05
+#: float: 默认读取超时（秒）
+read_timeout_s = 30
+#: dict: 按接口前缀设置的(连接超时, 读取超时)，覆盖上面的默认值
+endpoint_timeouts = {
+    "/master/topo/": (3.05, 120),
+    "/master/node_exec_cmd/": (3.05, 90),
+    "/master/batch_exec_cmd/": (3.05, 90),
+    "/master/ssh_service/": (3.05, 300),
+    "/file/uload/": (3.05, 600),
+}
+#: int: 幂等请求失败后的最大重试次数
+max_retries = 3
+#: float: 重试退避的基数（秒），第n次重试前等待[0, 基数*2^n]内的随机时间
+retry_backoff_s = 0.5
+#: float: 重试退避的上限（秒）
+retry_backoff_max_s = 8
+#: int: 同一后端连续失败多少次后熔断
+breaker_failure_threshold = 5
+#: float: 熔断后的冷却时间（秒），之后放行一个试探请求
+breaker_reset_timeout_s = 30
+#: bool: 是否对较大的json请求体进行gzip压缩（需后端支持Content-Encoding: gzip）
+gzip_requests = False
+#: int: 请求体达到多少字节时才进行压缩
+gzip_min_bytes = 64 * 1024
+#: bool: 部署前若有节点坐标重叠（如均未指定坐标），是否自动计算布局
+auto_layout = True
+#: bool: 部署前是否校验拓扑（Topo.validate），有错误时不提交并抛出TopoValidationError
+validate_before_deploy = True
+#: float: 部署/删除时轮询进度条API的最小间隔（秒），进度变化后回到此间隔
+progress_poll_min_s = 1
+#: float: 轮询进度条API的最大间隔（秒）
+progress_poll_max_s = 10
+#: float: 进度未变化时轮询间隔的增长倍数
+progress_poll_backoff = 1.5
+#: float: 进度超过多少秒未变化视为停滞
+progress_stall_s = 120
+#: int: deploy_projects/destroy_projects同时进行的部署/删除数上限
+orchestrate_max_concurrency = 8
+#: bool: 是否记录每次部署/删除的耗时（见history模块）
+record_deploy_history = True
+#: str: 部署耗时历史文件的路径（每行一条json），为None时只保存在内存中
+deploy_history_path = "~/.klonet_api/deploy_history.jsonl"
+#: int: 每个后端及操作类型用于拟合耗时模型的最近记录数
+deploy_history_max_records = 1000
+#: float: 未指定timeout_min时，超时时间为预测耗时的多少倍
+deploy_timeout_factor = 3
+#: float: 按预测耗时计算的超时时间的下限（秒）
+deploy_timeout_floor_s = 300
+#: float: 未指定timeout_min且没有历史记录时的超时时间（分钟）
+deploy_default_timeout_min = 30
+#: int: 分批部署（ProjectManager.deploy_staged）每批的节点数上限
+staged_batch_nodes = 500
+#: int: 分批部署中失败的节点/链路逐个重试的次数
+staged_retries = 2
+#: float: 节点坐标的上限，校验时坐标须在[0, max_coordinate]内（万级节点的分层布局
+#: 宽度约为数十万）
+max_coordinate = 10 ** 7
+#: bool: 是否统计各接口的请求指标（次数、耗时、字节数、错误）
+collect_metrics = True
+#: tuple: 请求耗时直方图的分桶上界（秒）
+metrics_latency_buckets_s = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5,
+    5, 10, 30, 60, 120)
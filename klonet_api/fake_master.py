@@ -0,0 +1,727 @@
+import argparse
+import copy
+import gzip
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from . import config
+from .common import codec
+from .common.base_funcs import get_plural_of_words
+
+
+'''本地模拟的Klonet master
+
+FakeKlonetMaster在本进程内启动一个HTTP服务，实现了客户端（各Manager及KlonetAI）
+用到的后端接口，并在内存中维护项目、节点、链路及链路配置。可配置请求时延、失败注入
+及部署耗时，用于离线测试与性能回归，例如：
+
+    with FakeKlonetMaster(latency_s=0.01, deploy_time_s=2) as master:
+        master.set_as_default_backend()
+        project_manager = ProjectManager("demo_user")
+        ...
+
+也可作为独立进程运行：python -m klonet_api.fake_master --port 12352
+'''
+
+#: dict: 默认提供的镜像，key为镜像名（subtype）
+DEFAULT_IMAGES = {
+    "ubuntu": {"type": "host", "subtype": "ubuntu",
+        "image_name": "ubuntu:20.04"},
+    "ovs": {"type": "switch", "subtype": "ovs", "image_name": "ovs:latest"},
+    "quagga": {"type": "router", "subtype": "quagga",
+        "image_name": "quagga:latest"},
+    "ryu": {"type": "controller", "subtype": "ryu", "image_name": "ryu:latest"},
+}
+
+_NODE_CATEGORIES = ("controllers", "hosts", "routers", "switches")
+
+
+def _image_dict(name, image):
+    image_dict = {"resource_limit": {"cpu": "100", "mem": "1024"},
+        "config": {}, "interfaces": [], "x": 0, "y": 0, "name": name}
+    image_dict.update(copy.deepcopy(image))
+    return image_dict
+
+
+class _Project(object):
+    def __init__(self, topo):
+        self.topo = topo
+        self.link_configs = {} # (链路名, 节点名) -> 链路配置
+        self.public_network = set()
+        self.port_mappings = {}
+        self.operation = None # (usage, 开始时间, 耗时)
+
+    def progress(self, usage):
+        if self.operation is None or self.operation[0] != usage:
+            return 100.0
+        _, started_at, duration_s = self.operation
+        if duration_s <= 0:
+            return 100.0
+        return round(min(100.0, (time.monotonic() - started_at) / duration_s
+            * 100), 1)
+
+    def nodes(self):
+        for category in _NODE_CATEGORIES:
+            for name, node in self.topo.get(category, {}).items():
+                yield category, name, node
+
+    def find_node(self, node_name):
+        for category, name, node in self.nodes():
+            if name == node_name:
+                return category, node
+        return None, None
+
+
+class FakeKlonetMaster(object):
+    '''本地模拟的Klonet master
+
+    Attributes:
+        host(str): 监听地址
+        port(int): 监听端口，为0时由系统分配，启动后可通过backend_port获取
+        latency_s(float/tuple): 每个请求的附加时延（秒）；为(最小值, 最大值)时在
+            其中均匀取值
+        endpoint_latency_s(dict): 按接口前缀设置的附加时延，覆盖latency_s
+        failure_rate(float): 请求失败的概率（0~1），失败时返回failure_status
+        failure_status(int): 注入失败时返回的HTTP状态码
+        endpoint_failure_rate(dict): 按接口前缀设置的失败概率，覆盖failure_rate
+        deploy_time_s(float): 部署/删除一个项目的基础耗时（秒）
+        deploy_time_per_node_s(float): 每个节点额外增加的部署/删除耗时（秒）
+        images(dict): 提供的镜像，key为镜像名，默认为DEFAULT_IMAGES
+        request_counts(dict): 各"方法 接口"的请求次数
+    '''
+    def __init__(self, host="127.0.0.1", port=0, latency_s=0,
+        failure_rate=0, failure_status=503, deploy_time_s=1,
+        deploy_time_per_node_s=0, images=None, seed=None):
+        self.host = host
+        self.port = port
+        self.latency_s = latency_s
+        self.endpoint_latency_s = {}
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.endpoint_failure_rate = {}
+        self.deploy_time_s = deploy_time_s
+        self.deploy_time_per_node_s = deploy_time_per_node_s
+        self.images = images if images is not None else DEFAULT_IMAGES
+        self.request_counts = {}
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._projects = {} # (用户名, 项目名) -> _Project
+        self._workers = set()
+        self._fail_next = []
+        self._server = None
+        self._thread = None
+        self._routes = [
+            ("GET", r"/my/image/", self._get_images),
+            ("POST", r"/master/topo/", self._deploy),
+            ("DELETE", r"/master/topo/", self._destroy),
+            ("GET", r"/master/topo/", self._deploy_status),
+            ("POST", r"/master/process_bar/", self._process_bar),
+            ("GET", r"/re/project/", self._get_projects),
+            ("GET", r"/re/project/(?P<project>[^/]+)/", self._get_project),
+            ("GET", r"/re/project/(?P<project>[^/]+)/node/",
+                self._get_node_info),
+            ("GET", r"/re/project/(?P<project>[^/]+)/link/",
+                self._get_link_info),
+            ("GET", r"/re/project/(?P<project>[^/]+)/worker_ip/",
+                self._get_worker_ip),
+            ("POST", r"/modification/container/", self._add_node),
+            ("PUT", r"/modification/container/", self._update_node),
+            ("DELETE", r"/modification/container/", self._delete_node),
+            ("POST", r"/modification/link/", self._add_link),
+            ("DELETE", r"/modification/link/", self._delete_link),
+            ("POST", r"/master/link/", self._config_link),
+            ("DELETE", r"/master/link/", self._clear_link),
+            ("POST", r"/master/linkquery/", self._query_link),
+            ("POST", r"/master/node_exec_cmd/", self._exec_cmds),
+            ("POST", r"/master/batch_exec_cmd/", self._batch_exec),
+            ("POST", r"/master/ssh_service/", self._ssh_service),
+            ("GET", r"/master/ssh_service/", self._get_port_mapping),
+            ("PUT", r"/master/modify_port_mapping/", self._modify_port_mapping),
+            ("GET", r"/my/edit/", self._get_nic_names),
+            ("POST", r"/master/node/network/", self._public_network_on),
+            ("DELETE", r"/master/node/network/", self._public_network_off),
+            ("GET", r"/master/node/network/", self._public_network_status),
+            ("POST", r"/master/worker/(?P<worker_ip>[^/]+)/", self._add_worker),
+            ("DELETE", r"/master/worker/(?P<worker_ip>[^/]+)/",
+                self._delete_worker),
+            ("POST", r"/file/uload/", self._upload_file),
+            ("POST", r"/generate", self._generate),
+            ("GET", r"/master/heartbeat_health/", self._heartbeat_health),
+        ]
+        self._routes = [(method, re.compile(f"^{pattern}$"), func)
+            for method, pattern, func in self._routes]
+
+    '''服务控制'''
+
+    @property
+    def backend_ip(self):
+        return self.host
+
+    @property
+    def backend_port(self):
+        return self._server.server_address[1] if self._server else self.port
+
+    def start(self):
+        '''在后台线程中启动服务
+
+        Returns:
+            self，便于链式调用
+        '''
+        master = self
+
+        class Handler(_FakeMasterHandler):
+            pass
+        Handler.master = master
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever,
+            name="FakeKlonetMaster", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        '''停止服务'''
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def serve_forever(self):
+        '''在当前线程中运行服务（尚未启动时先启动），直至被中断'''
+        if self._server is None:
+            self.start()
+        try:
+            self._thread.join()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def set_as_default_backend(self):
+        '''将config.backend_ip/backend_port指向本服务，未指定后端的Manager将使用本服务'''
+        config.backend_ip = self.backend_ip
+        config.backend_port = self.backend_port
+
+    def fail_next(self, count=1, status=None):
+        '''令接下来的count个请求失败
+
+        Args:
+            count(int): 失败的请求数
+            status(int): 返回的HTTP状态码，默认为failure_status
+        '''
+        with self._lock:
+            self._fail_next.extend([status or self.failure_status] * count)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    '''请求处理'''
+
+    def _match(self, table, path, default):
+        matched, value = "", default
+        for prefix, prefix_value in table.items():
+            if path.startswith(prefix) and len(prefix) > len(matched):
+                matched, value = prefix, prefix_value
+        return value
+
+    def _inject(self, path):
+        '''按配置注入时延，返回需注入的失败状态码（不失败时返回None）'''
+        latency_s = self._match(self.endpoint_latency_s, path, self.latency_s)
+        if isinstance(latency_s, (tuple, list)):
+            latency_s = self._random.uniform(*latency_s)
+        if latency_s:
+            time.sleep(latency_s)
+
+        with self._lock:
+            if self._fail_next:
+                return self._fail_next.pop(0)
+            failure_rate = self._match(self.endpoint_failure_rate, path,
+                self.failure_rate)
+            if failure_rate and self._random.random() < failure_rate:
+                return self.failure_status
+        return None
+
+    def handle(self, method, path, query, body):
+        '''处理一个请求
+
+        Returns:
+            (HTTP状态码, 响应体对象)
+        '''
+        for route_method, pattern, func in self._routes:
+            match = pattern.match(path)
+            if match is None or route_method != method:
+                continue
+            key = f"{method} {pattern.pattern[1:-1]}"
+            with self._lock:
+                self.request_counts[key] = self.request_counts.get(key, 0) + 1
+            status = self._inject(path)
+            if status is not None:
+                return status, {"code": 0, "msg": "injected failure"}
+            with self._lock:
+                return 200, func(query=query, body=body, **match.groupdict())
+        return 404, {"code": 0, "msg": f"{method} {path} not found"}
+
+    def _project(self, user, project):
+        '''返回项目；删除已完成的项目会在此时被移除'''
+        proj = self._projects.get((user, project))
+        if (proj is not None and proj.operation is not None
+            and proj.operation[0] == "delete" and proj.progress("delete") >= 100):
+            del self._projects[(user, project)]
+            return None
+        return proj
+
+    def _project_from_body(self, body):
+        return self._project(body.get("user"), body.get("topo"))
+
+    @staticmethod
+    def _fail(msg):
+        return {"code": 0, "msg": msg}
+
+    @staticmethod
+    def _ok(msg="success", **fields):
+        return {"code": 1, "msg": msg, **fields}
+
+    '''镜像'''
+
+    def _get_images(self, query, body):
+        registry = {}
+        for name, image in self.images.items():
+            registry.setdefault(image["type"], []).append(
+                _image_dict(name, image))
+        return {"public": registry}
+
+    '''项目'''
+
+    def _deploy(self, query, body):
+        key = (body.get("user"), body.get("topo"))
+        if self._project(*key) is not None:
+            return self._fail(f"project {key[1]} already exists")
+        topo = copy.deepcopy(body.get("networks") or {})
+        for category in ("links",) + _NODE_CATEGORIES:
+            topo.setdefault(category, {})
+        proj = self._projects[key] = _Project(topo)
+        num_nodes = sum(1 for _ in proj.nodes())
+        proj.operation = ("deploy", time.monotonic(),
+            self.deploy_time_s + self.deploy_time_per_node_s * num_nodes)
+        return self._ok("deploying")
+
+    def _destroy(self, query, body):
+        proj = self._project_from_body(body)
+        if proj is None:
+            return self._fail(f"project {body.get('topo')} does not exist")
+        num_nodes = sum(1 for _ in proj.nodes())
+        proj.operation = ("delete", time.monotonic(),
+            self.deploy_time_s + self.deploy_time_per_node_s * num_nodes)
+        return self._ok("destroying")
+
+    def _deploy_status(self, query, body):
+        proj = self._project(query.get("user"), query.get("topo"))
+        deployed = proj is not None and proj.progress("deploy") >= 100
+        return self._ok(stat=deployed)
+
+    def _process_bar(self, query, body):
+        proj = self._project_from_body(body)
+        usage = body.get("usage", "deploy")
+        if proj is None:
+            value = 100.0 if usage == "delete" else 0.0
+        else:
+            value = proj.progress(usage)
+            self._project_from_body(body) # 删除完成时移除项目
+        return self._ok(process_value=value)
+
+    def _get_projects(self, query, body):
+        user = query.get("user")
+        names = [project for (owner, project) in list(self._projects)
+            if owner == user and self._project(owner, project) is not None]
+        return self._ok(topo_list=names)
+
+    def _get_project(self, query, body, project):
+        proj = self._project(query.get("user"), project)
+        if proj is None:
+            return self._fail(f"project {project} does not exist")
+        return self._ok(project={"name": project, "topo": proj.topo})
+
+    def _get_node_info(self, query, body, project):
+        proj = self._project(query.get("user"), project)
+        if proj is None:
+            return self._fail(f"project {project} does not exist")
+        node_info = {name: {"type": node.get("type"), "status": "running",
+            "interfaces": node.get("interfaces", [])}
+            for _, name, node in proj.nodes()}
+        return self._ok(node_info=node_info)
+
+    def _get_link_info(self, query, body, project):
+        proj = self._project(query.get("user"), project)
+        if proj is None:
+            return self._fail(f"project {project} does not exist")
+        return self._ok(link_info={name: {"source": link["source"],
+            "target": link["target"], "status": "up"}
+            for name, link in proj.topo["links"].items()})
+
+    def _get_worker_ip(self, query, body, project):
+        proj = self._project(query.get("user"), project)
+        if proj is None:
+            return self._fail(f"project {project} does not exist")
+        return self._ok(worker_ip={name: self.host
+            for _, name, _ in proj.nodes()})
+
+    '''节点'''
+
+    def _add_node(self, query, body):
+        proj = self._project_from_body(body)
+        info = body.get("info") or {}
+        if proj is None:
+            return self._fail(f"project {body.get('topo')} does not exist")
+        if proj.find_node(info.get("name"))[1] is not None:
+            return self._fail(f"node {info.get('name')} already exists")
+        try:
+            category = get_plural_of_words(info.get("type"))
+        except TypeError as e:
+            return self._fail(str(e))
+        info.setdefault("interfaces", [])
+        proj.topo.setdefault(category, {})[info["name"]] = info
+        return self._ok()
+
+    def _update_node(self, query, body):
+        proj = self._project_from_body(body)
+        info = body.get("info") or {}
+        if proj is None:
+            return self._fail(f"project {body.get('topo')} does not exist")
+        category, node = proj.find_node(info.get("name"))
+        if node is None:
+            return self._fail(f"node {info.get('name')} does not exist")
+        proj.topo[category][info["name"]] = info
+        return self._ok()
+
+    def _delete_node(self, query, body):
+        proj = self._project_from_body(body)
+        name = (body.get("info") or {}).get("name")
+        if proj is None:
+            return self._fail(f"project {body.get('topo')} does not exist")
+        category, node = proj.find_node(name)
+        if node is None:
+            return self._fail(f"node {name} does not exist")
+        del proj.topo[category][name]
+        for link_name, link in list(proj.topo["links"].items()):
+            if name in (link["source"], link["target"]):
+                del proj.topo["links"][link_name]
+        return self._ok()
+
+    '''链路'''
+
+    def _add_link(self, query, body):
+        proj = self._project_from_body(body)
+        info = body.get("info") or {}
+        if proj is None:
+            return self._fail(f"project {body.get('topo')} does not exist")
+        if info.get("name") in proj.topo["links"]:
+            return self._fail(f"link {info.get('name')} already exists")
+        for end in ("source", "target"):
+            if proj.find_node(info.get(end))[1] is None:
+                return self._fail(f"node {info.get(end)} does not exist")
+        proj.topo["links"][info["name"]] = info
+        return self._ok()
+
+    def _delete_link(self, query, body):
+        proj = self._project_from_body(body)
+        name = (body.get("info") or {}).get("name")
+        if proj is None:
+            return self._fail(f"project {body.get('topo')} does not exist")
+        if proj.topo["links"].pop(name, None) is None:
+            return self._fail(f"link {name} does not exist")
+        for key in [key for key in proj.link_configs if key[0] == name]:
+            del proj.link_configs[key]
+        return self._ok()
+
+    @staticmethod
+    def _link_name(name):
+        return name[len("link_"):] if name.startswith("link_") else name
+
+    def _config_link(self, query, body):
+        proj = self._project_from_body(body)
+        if proj is None:
+            return self._fail(f"project {body.get('topo')} does not exist")
+        for link_config in body.get("links", []):
+            name = self._link_name(link_config.get("link", ""))
+            if name not in proj.topo["links"]:
+                return self._fail(f"link {name} does not exist")
+            proj.link_configs[(name, link_config.get("ne"))] = link_config
+        return self._ok()
+
+    def _clear_link(self, query, body):
+        proj = self._project_from_body(body)
+        if proj is None:
+            return self._fail(f"project {body.get('topo')} does not exist")
+        for link_config in body.get("links", []):
+            name = self._link_name(link_config.get("link", ""))
+            proj.link_configs.pop((name, link_config.get("ne")), None)
+        return self._ok()
+
+    def _query_link(self, query, body):
+        proj = self._project_from_body(body)
+        if proj is None:
+            return self._fail(f"project {body.get('topo')} does not exist")
+        static = {}
+        for link_query in body.get("links", []):
+            name = self._link_name(link_query.get("link", ""))
+            static.update(proj.link_configs.get(
+                (name, link_query.get("ne")), {}))
+        return self._ok(static=static)
+
+    '''命令执行'''
+
+    def _exec_cmds(self, query, body):
+        proj = self._project_from_body(body)
+        if proj is None:
+            return self._fail(f"project {body.get('topo')} does not exist")
+        results = {}
+        for node_name, cmds in (body.get("node_and_cmd") or {}).items():
+            if proj.find_node(node_name)[1] is None:
+                return self._fail(f"node {node_name} does not exist")
+            results[node_name] = {cmd: {"exit_code": 0, "output": ""}
+                for cmd in cmds}
+        return self._ok(exec_results=results)
+
+    def _batch_exec(self, query, body):
+        proj = self._project_from_body(body)
+        if proj is None:
+            return self._fail(f"project {body.get('topo')} does not exist")
+        ctns = body.get("ctns") or {}
+        list_type = ctns.get("list_type", "all")
+        selected = ctns.get("list", [])
+        results = {}
+        for category, name, _ in proj.nodes():
+            if (list_type == "all"
+                or (list_type == "specified_ctn_type" and category in selected)
+                or (list_type == "specified_ctn_list" and name in selected)):
+                results[name] = {"exit_code": 0, "output": ""}
+        return self._ok(exec_results={self.host: {
+            "worker_exec_results": results}})
+
+    '''节点服务'''
+
+    def _ssh_service(self, query, body):
+        proj = self._project_from_body(body)
+        if proj is None or proj.find_node(body.get("ne"))[1] is None:
+            return self._fail(f"node {body.get('ne')} does not exist")
+        return self._ok()
+
+    def _get_port_mapping(self, query, body):
+        body = body or query
+        proj = self._project_from_body(body)
+        if proj is None or proj.find_node(body.get("ne"))[1] is None:
+            return self._fail(f"node {body.get('ne')} does not exist")
+        return self._ok(worker_ip=self.host,
+            ne_port=proj.port_mappings.get(body.get("ne"), []))
+
+    def _modify_port_mapping(self, query, body):
+        proj = self._project_from_body(body)
+        if proj is None or proj.find_node(body.get("ne"))[1] is None:
+            return self._fail(f"node {body.get('ne')} does not exist")
+        proj.port_mappings[body["ne"]] = body.get("port_mapping", [])
+        return self._ok()
+
+    def _get_nic_names(self, query, body):
+        proj = self._project(query.get("username"), query.get("toponame"))
+        if proj is None:
+            return self._fail(f"project {query.get('toponame')} does not exist")
+        static = {name: {nic["name"]: f"{abs(hash(nic['name'])) % 16**10:010x}"
+            for nic in node.get("interfaces", [])}
+            for _, name, node in proj.nodes()}
+        return self._ok(static=static)
+
+    def _public_network_on(self, query, body):
+        proj = self._project_from_body(body)
+        if proj is None or proj.find_node(body.get("ne"))[1] is None:
+            return self._fail(f"node {body.get('ne')} does not exist")
+        proj.public_network.add(body["ne"])
+        return self._ok()
+
+    def _public_network_off(self, query, body):
+        proj = self._project_from_body(body)
+        if proj is None:
+            return self._fail(f"project {body.get('topo')} does not exist")
+        proj.public_network.discard(body.get("ne"))
+        return self._ok()
+
+    def _public_network_status(self, query, body):
+        proj = self._project_from_body(query)
+        if proj is None:
+            return self._fail(f"project {query.get('topo')} does not exist")
+        return self._ok(status=int(query.get("ne") in proj.public_network))
+
+    def _add_worker(self, query, body, worker_ip):
+        self._workers.add(worker_ip)
+        return self._ok()
+
+    def _delete_worker(self, query, body, worker_ip):
+        self._workers.discard(worker_ip)
+        return self._ok()
+
+    def _upload_file(self, query, body):
+        return self._ok("upload success")
+
+    def _heartbeat_health(self, query, body):
+        proj = self._project(query.get("user"), query.get("project"))
+        if proj is None:
+            return self._fail(f"project {query.get('project')} does not exist")
+        return self._ok(is_broken=False, broken_nes=[])
+
+    '''模板'''
+
+    def _generate(self, query, body):
+        topology_type = body.get("topology_type")
+        if topology_type == "star":
+            edges = [("s1", f"h{i}") for i in range(1, body["star_n"] + 1)]
+        elif topology_type == "linear":
+            num_switches, num_hosts = body["linear_m"], body["linear_n"]
+            edges = [(f"s{i}", f"s{i + 1}") for i in range(1, num_switches)]
+            edges += [(f"s{i}", f"h{(i - 1) * num_hosts + j}")
+                for i in range(1, num_switches + 1)
+                for j in range(1, num_hosts + 1)]
+        elif topology_type == "tree":
+            edges, level, counter = [], ["s1"], 1
+            for _ in range(body["tree_depths"] - 1):
+                children = []
+                for parent in level:
+                    for _ in range(body["tree_branches"]):
+                        counter += 1
+                        children.append(f"s{counter}")
+                        edges.append((parent, f"s{counter}"))
+                level = children
+            density = body["tree_host_density"]
+            edges += [(switch, f"h{i * density + j}")
+                for i, switch in enumerate(level) for j in range(1, density + 1)]
+        elif topology_type == "fattree":
+            k = body["fattree_k"]
+            half = k // 2
+            core = [f"s{i + 1}" for i in range(half * half)]
+            edges, counter, host = [], len(core), 0
+            for pod in range(k):
+                aggs = [f"s{counter + i + 1}" for i in range(half)]
+                edges_ = [f"s{counter + half + i + 1}" for i in range(half)]
+                counter += k
+                for i, agg in enumerate(aggs):
+                    edges += [(core[i * half + j], agg) for j in range(half)]
+                    edges += [(agg, edge) for edge in edges_]
+                for edge in edges_:
+                    for _ in range(half):
+                        host += 1
+                        edges.append((edge, f"h{host}"))
+        else:
+            return self._fail(f"unsupported topology_type {topology_type}")
+
+        prefix = body.get("ip_prefix", "10.0.0.0/24")
+        network, prefix_len = prefix.split("/")
+        base = [int(part) for part in network.split(".")]
+        host_image = _image_dict("", self.images["ubuntu"])
+        switch_image = _image_dict("", self.images["ovs"])
+        net = {category: {} for category in ("links",) + _NODE_CATEGORIES}
+        for index, (src, dst) in enumerate(edges, start=1):
+            for name in (src, dst):
+                if name in net["hosts"] or name in net["switches"]:
+                    continue
+                is_host = name.startswith("h")
+                node = copy.deepcopy(host_image if is_host else switch_image)
+                node["name"] = name
+                category = "hosts" if is_host else "switches"
+                net[category][name] = node
+            dst_ip = ""
+            if dst.startswith("h"):
+                value = (base[0] << 24 | base[1] << 16 | base[2] << 8
+                    | base[3]) + int(dst[1:]) + 1
+                ip = ".".join(str(value >> shift & 255)
+                    for shift in (24, 16, 8, 0))
+                dst_ip = f"{ip}/{prefix_len}"
+                net["hosts"][dst]["interfaces"].append({"ip": ip,
+                    "netmask": ".".join(str((0xffffffff << (32
+                        - int(prefix_len))) >> shift & 255)
+                        for shift in (24, 16, 8, 0)),
+                    "name": f"{dst}{src}"})
+            net["links"][f"l{index}"] = {"name": f"l{index}", "source": src,
+                "sourceIP": "", "sourceType": "switch", "target": dst,
+                "targetIP": dst_ip,
+                "targetType": "host" if dst.startswith("h") else "switch",
+                "config": {}}
+        return self._ok(net=net)
+
+
+class _FakeMasterHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    master = None
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Encoding") == "gzip":
+            raw = gzip.decompress(raw)
+
+        body = {}
+        content_type = self.headers.get("Content-Type", "")
+        if raw and content_type.startswith("application/json"):
+            try:
+                body = codec.loads(raw)
+            except ValueError:
+                return self._send(400, {"code": 0, "msg": "invalid json"})
+        elif raw and content_type.startswith("application/x-www-form-urlencoded"):
+            body = {key: values[-1] for key, values
+                in parse_qs(raw.decode("utf-8")).items()}
+
+        status, resp = self.master.handle(self.command, url.path, query, body)
+        self._send(status, resp)
+
+    def _send(self, status, resp):
+        payload = codec.dumps(resp)
+        use_gzip = (len(payload) >= 1024
+            and "gzip" in self.headers.get("Accept-Encoding", ""))
+        if use_gzip:
+            payload = gzip.compress(payload, compresslevel=5)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Klonet master.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12352)
+    parser.add_argument("--latency", type=float, default=0,
+        help="extra latency per request in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0,
+        help="probability of answering a request with --failure-status")
+    parser.add_argument("--failure-status", type=int, default=503)
+    parser.add_argument("--deploy-time", type=float, default=1,
+        help="base deploy/destroy duration in seconds")
+    parser.add_argument("--deploy-time-per-node", type=float, default=0)
+    args = parser.parse_args()
+
+    master = FakeKlonetMaster(args.host, args.port, latency_s=args.latency,
+        failure_rate=args.failure_rate, failure_status=args.failure_status,
+        deploy_time_s=args.deploy_time,
+        deploy_time_per_node_s=args.deploy_time_per_node)
+    master.start()
+    print(f"Fake Klonet master listening on "
+        f"http://{master.backend_ip}:{master.backend_port}")
+    master.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
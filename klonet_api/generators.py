@@ -0,0 +1,301 @@
+import ipaddress
+import numpy as np
+from .common.base_classes import Topo
+from .layout import (CANVAS_MARGIN, MIN_NODE_SPACING, layered_xy, ring_xy,
+    ring_radius, rank_within_group, satellite_xy, neighbor_centroids, force_xy)
+
+
+'''拓扑模板生成
+
+在本地生成常见拓扑的Topo对象，无需调用后端的/generate接口。支持的模板：
+
+    tree      树形，depth层交换机，每个交换机branches个子交换机，叶交换机各连
+              host_density个主机
+    star      星形，1个交换机连num_hosts个主机
+    fattree   k元胖树，(k/2)^2个核心交换机，k个pod，每个pod含k/2个汇聚交换机、
+              k/2个接入交换机，每个接入交换机连k/2个主机
+    linear    线形，num_switches个交换机串联，每个交换机连hosts_per_switch个主机
+    mesh      全连接，num_switches个交换机两两相连
+    torus     二维环面，rows×cols个交换机，每行、每列首尾相连
+    random    随机连通图，先生成随机生成树保证连通，再以edge_prob的概率添加其余边
+
+交换机依次命名为s1、s2……，主机为h1、h2……，链路为l1、l2……。主机的ip按编号从
+子网中依次分配（hX分配子网的第X+1个地址，第1个地址保留给网关），交换机端口不配置ip。
+ip地址与画布坐标均以numpy批量计算（坐标由layout模块计算：层次化的模板分层排列，
+mesh为环形，torus为网格，random为力导向布局），随后通过Topo.add_nodes/add_links批量构建，
+k=16的胖树（320个交换机、1024个主机、3072条链路）可在1秒内生成。例子：
+
+    topo = generate_topo("fattree", images["ubuntu"], images["ovs"],
+                         subnet="10.0.0.0/16", k=4)
+    project_manager.deploy("p1", topo)
+'''
+
+class _Skeleton(object):
+    '''模板的图结构及坐标，交换机、主机均以从0开始的编号表示
+
+    Attributes:
+        num_switches(int): 交换机数量
+        switch_edges(ndarray): 交换机之间的边，形状为(边数, 2)
+        host_parents(ndarray): 每个主机所连交换机的编号
+        switch_xy(ndarray): 交换机坐标，形状为(交换机数, 2)
+        host_xy(ndarray): 主机坐标，形状为(主机数, 2)
+    '''
+    def __init__(self, num_switches, switch_edges, host_parents, switch_xy,
+                 host_xy):
+        self.num_switches = num_switches
+        self.switch_edges = np.asarray(switch_edges, dtype=np.int64).reshape(-1, 2)
+        self.host_parents = np.asarray(host_parents, dtype=np.int64)
+        self.switch_xy = switch_xy
+        self.host_xy = host_xy
+
+
+def _check_positive(**params):
+    for name, value in params.items():
+        if not isinstance(value, (int, np.integer)) or value < 1:
+            raise ValueError(f"{name} must be a positive integer, got {value!r}")
+
+
+def _tree(depth=2, branches=2, host_density=1):
+    _check_positive(depth=depth, branches=branches, host_density=host_density)
+    level_sizes = [branches ** level for level in range(depth)]
+    offsets = np.cumsum([0] + level_sizes)
+    edges = []
+    for level in range(1, depth):
+        children = np.arange(level_sizes[level])
+        edges.append(np.column_stack((offsets[level - 1] + children // branches,
+            offsets[level] + children)))
+    num_leaves = level_sizes[-1]
+    host_parents = offsets[depth - 1] + np.arange(num_leaves * host_density) \
+        // host_density
+    rows = layered_xy(level_sizes + [num_leaves * host_density])
+    return _Skeleton(int(offsets[-1]),
+        np.concatenate(edges) if edges else [], host_parents,
+        np.concatenate(rows[:-1]), rows[-1])
+
+
+def _star(num_hosts=3):
+    _check_positive(num_hosts=num_hosts)
+    center = ring_radius(num_hosts) + CANVAS_MARGIN
+    return _Skeleton(1, [], np.zeros(num_hosts, dtype=np.int64),
+        np.array([[center, center]]),
+        ring_xy(num_hosts, center, ring_radius(num_hosts)))
+
+
+def _fattree(k=4):
+    _check_positive(k=k)
+    if k % 2:
+        raise ValueError(f"k of a fat-tree must be even, got {k}")
+    half = k // 2
+    num_core = half * half
+    # 编号：核心交换机在前，随后每个pod依次为k/2个汇聚、k/2个接入交换机
+    pods = np.arange(k)
+    pod_offsets = num_core + pods * k
+    aggs = pod_offsets[:, None] + np.arange(half)        # (k, half)
+    edges_ = pod_offsets[:, None] + half + np.arange(half) # (k, half)
+    # 第i个汇聚交换机连接核心交换机i*half..i*half+half-1
+    core = np.arange(num_core).reshape(half, half)
+    core_agg = np.column_stack((
+        np.broadcast_to(core[None, :, :], (k, half, half)).ravel(),
+        np.broadcast_to(aggs[:, :, None], (k, half, half)).ravel()))
+    agg_edge = np.column_stack((
+        np.broadcast_to(aggs[:, :, None], (k, half, half)).ravel(),
+        np.broadcast_to(edges_[:, None, :], (k, half, half)).ravel()))
+    host_parents = np.repeat(edges_.ravel(), half)
+
+    rows = layered_xy([num_core, k * half, k * half, k * half * half])
+    switch_xy = np.empty((num_core + k * k, 2))
+    switch_xy[:num_core] = rows[0]
+    switch_xy[aggs.ravel()] = rows[1]
+    switch_xy[edges_.ravel()] = rows[2]
+    return _Skeleton(num_core + k * k, np.concatenate((core_agg, agg_edge)),
+        host_parents, switch_xy, rows[3])
+
+
+def _linear(num_switches=3, hosts_per_switch=2):
+    _check_positive(num_switches=num_switches,
+        hosts_per_switch=hosts_per_switch)
+    chain = np.arange(num_switches - 1)
+    host_parents = np.repeat(np.arange(num_switches), hosts_per_switch)
+    rows = layered_xy([num_switches, num_switches * hosts_per_switch])
+    return _Skeleton(num_switches, np.column_stack((chain, chain + 1)),
+        host_parents, rows[0], rows[1])
+
+
+def _on_ring(num_switches, switch_edges, hosts_per_switch):
+    # 主机沿切向展开，每个交换机需预留hosts_per_switch个节点的弧长
+    radius = ring_radius(num_switches, max(hosts_per_switch, 1))
+    center = radius + 2 * CANVAS_MARGIN + MIN_NODE_SPACING
+    switch_xy = ring_xy(num_switches, center, radius) if num_switches > 1 \
+        else np.array([[center, center]])
+    host_parents = np.repeat(np.arange(num_switches), hosts_per_switch)
+    host_xy = satellite_xy(switch_xy, host_parents,
+        np.array([center, center]), 2 * CANVAS_MARGIN)
+    return _Skeleton(num_switches, switch_edges, host_parents, switch_xy,
+        host_xy)
+
+
+def _mesh(num_switches=4, hosts_per_switch=1):
+    _check_positive(num_switches=num_switches,
+        hosts_per_switch=hosts_per_switch)
+    src, dst = np.triu_indices(num_switches, k=1)
+    return _on_ring(num_switches, np.column_stack((src, dst)),
+        hosts_per_switch)
+
+
+def _torus(rows=3, cols=3, hosts_per_switch=1):
+    _check_positive(rows=rows, cols=cols, hosts_per_switch=hosts_per_switch)
+    grid = np.arange(rows * cols).reshape(rows, cols)
+    candidates = np.concatenate((
+        np.column_stack((grid.ravel(), np.roll(grid, -1, axis=1).ravel())),
+        np.column_stack((grid.ravel(), np.roll(grid, -1, axis=0).ravel()))))
+    # 行或列只有1、2个交换机时，首尾相连会产生自环或平行链路，需去除
+    candidates = np.sort(candidates, axis=1)
+    candidates = candidates[candidates[:, 0] != candidates[:, 1]]
+    _, first = np.unique(candidates, axis=0, return_index=True)
+    switch_edges = candidates[np.sort(first)]
+
+    spacing = max(MIN_NODE_SPACING * (hosts_per_switch + 1), 80)
+    row_index, col_index = np.divmod(np.arange(rows * cols), cols)
+    switch_xy = np.column_stack((CANVAS_MARGIN + col_index * spacing,
+        CANVAS_MARGIN + row_index * spacing)).astype(float)
+    host_parents = np.repeat(np.arange(rows * cols), hosts_per_switch)
+    # 主机放在交换机右下方，沿对角线排开
+    host_rank = rank_within_group(host_parents) + 1
+    host_xy = switch_xy[host_parents] + host_rank[:, None] \
+        * (spacing / (hosts_per_switch + 1)) * np.array([1.0, 0.5])
+    return _Skeleton(rows * cols, switch_edges, host_parents, switch_xy,
+        host_xy)
+
+
+def _random(num_switches=10, hosts_per_switch=1, edge_prob=0.1, seed=None):
+    _check_positive(num_switches=num_switches,
+        hosts_per_switch=hosts_per_switch)
+    if not 0 <= edge_prob <= 1:
+        raise ValueError(f"edge_prob must be within [0, 1], got {edge_prob}")
+    rng = np.random.default_rng(seed)
+    # 随机生成树：第i个交换机连接前i个交换机中的随机一个，保证连通
+    children = rng.permutation(num_switches)
+    parents = children[(rng.random(num_switches - 1)
+        * np.arange(1, num_switches)).astype(np.int64)]
+    tree_edges = np.sort(np.column_stack((parents, children[1:])), axis=1)
+    src, dst = np.triu_indices(num_switches, k=1)
+    extra = rng.random(len(src)) < edge_prob
+    extra_edges = np.column_stack((src[extra], dst[extra]))
+    # 去掉与生成树重复的边
+    tree_keys = tree_edges[:, 0] * num_switches + tree_edges[:, 1]
+    extra_keys = extra_edges[:, 0] * num_switches + extra_edges[:, 1]
+    extra_edges = extra_edges[~np.isin(extra_keys, tree_keys)]
+    switch_edges = np.concatenate((tree_edges, extra_edges))
+    switch_xy = force_xy(num_switches, switch_edges, seed=seed,
+        ideal_length=2 * MIN_NODE_SPACING * (1 + np.sqrt(hosts_per_switch)))
+    switch_xy -= switch_xy.min(axis=0) - 2 * CANVAS_MARGIN
+    host_parents = np.repeat(np.arange(num_switches), hosts_per_switch)
+    host_xy = satellite_xy(switch_xy, host_parents,
+        neighbor_centroids(switch_xy, switch_edges), 1.5 * MIN_NODE_SPACING)
+    return _Skeleton(num_switches, switch_edges, host_parents, switch_xy,
+        host_xy)
+
+
+_TEMPLATES = {
+    "tree": _tree,
+    "star": _star,
+    "fattree": _fattree,
+    "linear": _linear,
+    "mesh": _mesh,
+    "torus": _torus,
+    "random": _random,
+}
+
+#: tuple: 支持的模板名称
+TOPOLOGY_TYPES = tuple(_TEMPLATES)
+
+
+def host_addresses(subnet, num_hosts):
+    '''从子网中为num_hosts个主机依次分配cidr形式的ip地址
+
+    第1个地址保留给网关，第i个主机（从1开始）分配子网的第i+1个地址。
+
+    Args:
+        subnet(str): 子网，如192.168.1.0/24，主机位非0时按所在子网处理
+        num_hosts(int): 主机数量
+
+    Returns:
+        cidr形式的ip地址列表，如["192.168.1.2/24", "192.168.1.3/24"]
+
+    Raises:
+        ValueError: 子网不合法或容纳不下全部主机时，触发此异常
+    '''
+    network = ipaddress.IPv4Network(subnet, strict=False)
+    # 去掉网络地址、网关地址和广播地址
+    capacity = max(network.num_addresses - 3, 0)
+    if num_hosts > capacity:
+        raise ValueError(f"Subnet {subnet} can hold at most {capacity} hosts, "
+            f"but {num_hosts} hosts are required, please use a larger subnet")
+    addresses = int(network.network_address) + np.arange(2, num_hosts + 2,
+        dtype=np.int64)
+    octets = (addresses[:, None] >> np.array([24, 16, 8, 0])) & 255
+    prefix_len = network.prefixlen
+    return [f"{a}.{b}.{c}.{d}/{prefix_len}" for a, b, c, d in octets.tolist()]
+
+
+def generate_topo(topology_type, host_image, switch_image,
+                  subnet="10.0.0.0/24", topo=None, **params):
+    '''在本地生成模板拓扑
+
+    Args:
+        topology_type(str): 模板名称，见TOPOLOGY_TYPES
+        host_image(Image): 主机所用的镜像，如images["ubuntu"]
+        switch_image(Image): 交换机所用的镜像，如images["ovs"]
+        subnet(str): 为主机分配ip的子网，默认为10.0.0.0/24
+        topo(Topo): 添加到的Topo对象，默认为None，即新建一个Topo对象。其中已有的
+            节点、链路名不能与模板生成的名称冲突
+        **params: 模板参数，各模板的参数及默认值如下：
+            tree: depth=2, branches=2, host_density=1
+            star: num_hosts=3
+            fattree: k=4
+            linear: num_switches=3, hosts_per_switch=2
+            mesh: num_switches=4, hosts_per_switch=1
+            torus: rows=3, cols=3, hosts_per_switch=1
+            random: num_switches=10, hosts_per_switch=1, edge_prob=0.1, seed=None
+
+    Returns:
+        Topo对象
+
+    Raises:
+        ValueError: 模板名称或参数不合法、子网容纳不下全部主机时，触发此异常
+        TopoBuildError: 生成的节点、链路与topo中已有的冲突时，触发此异常
+    '''
+    if topology_type not in _TEMPLATES:
+        raise ValueError(f"Unsupported topology type {topology_type!r}, "
+            f"supported types: {', '.join(TOPOLOGY_TYPES)}")
+    try:
+        skeleton = _TEMPLATES[topology_type](**params)
+    except TypeError as e:
+        raise ValueError(f"Invalid parameters for {topology_type} "
+            f"topology: {e}") from None
+    num_hosts = len(skeleton.host_parents)
+    addresses = host_addresses(subnet, num_hosts)
+
+    topo = Topo() if topo is None else topo
+    switch_names = [f"s{i}" for i in range(1, skeleton.num_switches + 1)]
+    host_names = [f"h{i}" for i in range(1, num_hosts + 1)]
+    switch_xy = np.rint(skeleton.switch_xy).astype(np.int64).tolist()
+    host_xy = np.rint(skeleton.host_xy).astype(np.int64).tolist()
+    topo.add_nodes(
+        [{"image": switch_image, "node_name": name,
+          "location": {"x": x, "y": y}}
+         for name, (x, y) in zip(switch_names, switch_xy)]
+        + [{"image": host_image, "node_name": name,
+            "location": {"x": x, "y": y}}
+           for name, (x, y) in zip(host_names, host_xy)])
+
+    links = [{"src_node": switch_names[src], "dst_node": switch_names[dst]}
+        for src, dst in skeleton.switch_edges.tolist()]
+    links += [{"src_node": switch_names[parent], "dst_node": name,
+               "dst_IP": address}
+        for parent, name, address in zip(skeleton.host_parents.tolist(),
+            host_names, addresses)]
+    for index, link in enumerate(links, start=1):
+        link["link_name"] = f"l{index}"
+    topo.add_links(links)
+    return topo
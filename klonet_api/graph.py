@@ -0,0 +1,408 @@
+import numpy as np
+
+
+'''拓扑图分析
+
+TopoGraph将Topo对象（或项目的拓扑字典）转换为以编号表示的无向图，邻接表为CSR格式
+（indptr、indices），在此基础上以numpy整体计算：
+
+    hops_from / shortest_path  单源BFS的跳数及最短路径
+    hops                       多源（全源）跳数矩阵
+    diameter                   直径及其两端节点
+    components                 连通分量
+    articulation_points        割点（删除后图不再连通的节点）
+    bridges                    桥（删除后图不再连通的链路）
+    min_cut                    两节点之间的最小割（链路数）及割边
+
+BFS每一层只做一次数组运算；直径只在非叶子节点导出的子图中计算（叶子节点的跳数
+由其相邻节点的跳数加1得到），因此胖树等主机较多的拓扑也只需对交换机做BFS。例子：
+
+    graph = TopoGraph(topo)
+    graph.shortest_path("h1", "h8")     # ["h1", "s5", "s1", "s7", "h8"]
+    graph.diameter()                    # (6, "h1", "h16")
+'''
+
+#: int: 多源BFS时每批的源节点数，决定跳数矩阵分块的大小
+HOPS_CHUNK_SIZE = 256
+
+
+class TopoGraph(object):
+    '''拓扑的CSR邻接表表示，节点顺序与Topo中一致
+
+    Attributes:
+        names(list): 节点名
+        index(dict): 节点名 -> 编号
+        categories(list): 各节点的类别，如"hosts"、"switches"
+        is_host(ndarray): 是否为主机
+        link_names(list): 链路名，与edges的行一一对应
+        edges(ndarray): 边，形状为(边数, 2)
+        degree(ndarray): 各节点的度
+        indptr, indices(ndarray): CSR格式的邻接表，节点i的邻居为
+            indices[indptr[i]:indptr[i + 1]]
+        arc_edges(ndarray): CSR中每个位置（有向弧）对应的边编号
+    '''
+    def __init__(self, topo):
+        topo_dict = topo.dictform() if hasattr(topo, "dictform") else topo
+        self.names, self.categories = [], []
+        for category, elements in topo_dict.items():
+            if category == "links" or not isinstance(elements, dict):
+                continue
+            self.names.extend(elements)
+            self.categories.extend([category] * len(elements))
+        self.is_host = np.array([category == "hosts"
+            for category in self.categories], dtype=bool)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        links = topo_dict.get("links", {})
+        self.link_names = list(links)
+        edges = [(self.index[link["source"]], self.index[link["target"]])
+            for link in links.values()]
+        self._build(np.array(edges, dtype=np.int64).reshape(-1, 2))
+
+    def _build(self, edges):
+        '''由边（形状为(边数, 2)的编号数组）构建度及CSR邻接表'''
+        self.edges = edges
+        num_nodes, num_edges = len(self.names), len(self.edges)
+        self.degree = np.bincount(self.edges.ravel(), minlength=num_nodes)
+        src = np.concatenate((self.edges[:, 0], self.edges[:, 1]))
+        dst = np.concatenate((self.edges[:, 1], self.edges[:, 0]))
+        edge_ids = np.tile(np.arange(num_edges, dtype=np.int64), 2)
+        order = np.argsort(src, kind="stable")
+        self.indices = dst[order]
+        self.arc_edges = edge_ids[order]
+        self.indptr = np.concatenate(([0], np.cumsum(
+            np.bincount(src, minlength=num_nodes))))
+        self._arc_sources = src[order]
+
+    def __len__(self):
+        return len(self.names)
+
+    def _subgraph(self, nodes):
+        '''nodes（编号数组）导出的子图，子图中的节点按nodes的顺序重新编号'''
+        graph = TopoGraph.__new__(TopoGraph)
+        graph.names = [self.names[i] for i in nodes]
+        graph.categories = [self.categories[i] for i in nodes]
+        graph.is_host = self.is_host[nodes]
+        graph.index = {name: i for i, name in enumerate(graph.names)}
+        new_ids = np.full(len(self), -1, dtype=np.int64)
+        new_ids[nodes] = np.arange(len(nodes))
+        kept = np.flatnonzero((new_ids[self.edges] >= 0).all(axis=1))
+        graph.link_names = [self.link_names[edge] for edge in kept]
+        graph._build(new_ids[self.edges[kept]].reshape(-1, 2))
+        return graph
+
+    def _ids(self, nodes):
+        '''节点名（或其列表）-> 编号数组'''
+        if isinstance(nodes, str):
+            nodes = [nodes]
+        try:
+            return np.array([self.index[name] for name in nodes],
+                dtype=np.int64)
+        except KeyError as e:
+            raise KeyError(f"node {e.args[0]} is not in the topology") from None
+
+    def arcs_of(self, nodes):
+        '''返回nodes（编号数组）中所有节点的出弧在CSR中的位置'''
+        starts = self.indptr[nodes]
+        lengths = self.indptr[nodes + 1] - starts
+        total = lengths.sum()
+        if not total:
+            return np.empty(0, dtype=np.int64)
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(total)
+
+    def neighbors_of(self, nodes):
+        '''返回nodes（编号数组）中所有节点的邻居（可能重复）'''
+        return self.indices[self.arcs_of(nodes)]
+
+    def bfs_levels(self, sources):
+        '''多源BFS，返回各节点到sources的跳数；sources不可达的分量从其中编号最小
+        的节点重新开始计数'''
+        levels = np.full(len(self), -1, dtype=np.int64)
+        frontier = np.unique(np.asarray(sources, dtype=np.int64))
+        while True:
+            level = 0
+            while len(frontier):
+                levels[frontier] = level
+                neighbors = self.neighbors_of(frontier)
+                frontier = np.unique(neighbors[levels[neighbors] < 0])
+                level += 1
+            unreached = np.flatnonzero(levels < 0)
+            if not len(unreached):
+                return levels
+            frontier = unreached[:1]
+
+    def _bfs(self, source, usable_arcs=None):
+        '''单源BFS，返回(跳数, 到达各节点所经的弧)，不可达为-1
+
+        usable_arcs为布尔数组时，只经过其中为True的弧。
+        '''
+        hops = np.full(len(self), -1, dtype=np.int64)
+        parent_arcs = np.full(len(self), -1, dtype=np.int64)
+        hops[source] = 0
+        frontier, level = np.array([source], dtype=np.int64), 0
+        while len(frontier):
+            arcs = self.arcs_of(frontier)
+            if usable_arcs is not None:
+                arcs = arcs[usable_arcs[arcs]]
+            neighbors = self.indices[arcs]
+            new = hops[neighbors] < 0
+            frontier, first = np.unique(neighbors[new], return_index=True)
+            level += 1
+            hops[frontier] = level
+            parent_arcs[frontier] = arcs[new][first]
+        return hops, parent_arcs
+
+    def _path(self, parent_arcs, target):
+        '''由BFS的parent_arcs还原到target的路径（节点编号列表）'''
+        path = [target]
+        while parent_arcs[path[-1]] >= 0:
+            path.append(int(self._arc_sources[parent_arcs[path[-1]]]))
+        return path[::-1]
+
+    def hops_from(self, source):
+        '''单源跳数
+
+        Args:
+            source(str): 源节点名
+
+        Returns:
+            字典，节点名 -> 跳数，不含不可达的节点
+        '''
+        hops, _ = self._bfs(self._ids(source)[0])
+        reached = np.flatnonzero(hops >= 0)
+        return dict(zip([self.names[i] for i in reached],
+            hops[reached].tolist()))
+
+    def shortest_path(self, source, target):
+        '''两节点之间（跳数最少）的一条最短路径
+
+        Args:
+            source(str): 源节点名
+            target(str): 目的节点名
+
+        Returns:
+            节点名列表，含两端节点；不可达时返回None
+        '''
+        src, dst = self._ids([source, target])
+        hops, parent_arcs = self._bfs(src)
+        if hops[dst] < 0:
+            return None
+        return [self.names[i] for i in self._path(parent_arcs, dst)]
+
+    def _hops_matrix(self, sources):
+        '''sources（编号数组）到全部节点的跳数矩阵，不可达为-1'''
+        num_nodes = len(self)
+        result = np.full((len(sources), num_nodes), -1, dtype=np.int32)
+        # 去重用：同一(行, 节点)在边界中出现多次时，只保留最后写入的一个
+        claims = np.empty(min(len(sources), HOPS_CHUNK_SIZE) * num_nodes,
+            dtype=np.int64)
+        for start in range(0, len(sources), HOPS_CHUNK_SIZE):
+            chunk = sources[start:start + HOPS_CHUNK_SIZE]
+            hops = result[start:start + len(chunk)].reshape(-1)
+            # 所有源节点的BFS同时进行，边界为(行, 节点)对，表示为行*节点数+节点
+            keys = np.arange(len(chunk), dtype=np.int64) * num_nodes + chunk
+            level = 0
+            hops[keys] = 0
+            while len(keys):
+                rows, nodes = np.divmod(keys, num_nodes)
+                keys = (np.repeat(rows * num_nodes, self.degree[nodes])
+                    + self.indices[self.arcs_of(nodes)])
+                keys = keys[hops[keys] < 0]
+                order = np.arange(len(keys))
+                claims[keys] = order
+                keys = keys[claims[keys] == order]
+                level += 1
+                hops[keys] = level
+        return result
+
+    def hops(self, sources=None, targets=None):
+        '''多源跳数矩阵
+
+        Args:
+            sources(list): 源节点名列表，默认为None，即全部节点
+            targets(list): 目的节点名列表，默认为None，即全部节点
+
+        Returns:
+            形状为(源节点数, 目的节点数)的int32数组，不可达为-1
+        '''
+        sources = (np.arange(len(self), dtype=np.int64) if sources is None
+            else self._ids(sources))
+        matrix = self._hops_matrix(sources)
+        return matrix if targets is None else matrix[:, self._ids(targets)]
+
+    def components(self):
+        '''连通分量
+
+        Returns:
+            节点名列表的列表，按分量大小从大到小排列
+        '''
+        labels = np.full(len(self), -1, dtype=np.int64)
+        label = 0
+        for node in range(len(self)):
+            if labels[node] >= 0:
+                continue
+            frontier = np.array([node], dtype=np.int64)
+            while len(frontier):
+                labels[frontier] = label
+                neighbors = self.neighbors_of(frontier)
+                frontier = np.unique(neighbors[labels[neighbors] < 0])
+            label += 1
+        order = np.argsort(labels, kind="stable")
+        groups = np.split(order, np.cumsum(np.bincount(labels,
+            minlength=label))[:-1])
+        groups.sort(key=len, reverse=True)
+        return [[self.names[i] for i in group] for group in groups]
+
+    def diameter(self):
+        '''直径，即各连通分量内最远两节点之间跳数的最大值
+
+        只从度大于1的节点出发做BFS：度为1的节点u（其邻居为p）到其它节点的跳数等于p
+        到该节点的跳数加1，因此u的离心率为p的离心率加1。
+
+        Returns:
+            (直径, 一端的节点名, 另一端的节点名)；没有链路时返回(0, 节点名, 节点名)，
+            没有节点时返回(0, None, None)
+        '''
+        if not len(self):
+            return 0, None, None
+        if not len(self.edges):
+            return 0, self.names[0], self.names[0]
+        best = (0, 0, 0)
+        # 只有一条链路的分量（两端度均为1）
+        for src, dst in self.edges:
+            if self.degree[src] == 1 and self.degree[dst] == 1:
+                best = (1, int(src), int(dst))
+                break
+        inner = np.flatnonzero(self.degree > 1)
+        leaves = np.flatnonzero(self.degree == 1)
+        # 度为1的节点 -> 其邻居
+        leaf_parent = self.indices[self.indptr[leaves]]
+        leaf_count = np.bincount(leaf_parent, minlength=len(self))[inner]
+        # 最短路径不经过度为1的节点，因此只需在非叶子节点导出的子图中做BFS，
+        # 到某节点所连叶子节点的跳数为到该节点的跳数加1
+        graph = self._subgraph(inner)
+        extra = (leaf_count > 0).astype(np.int32)
+        for start in range(0, len(inner), HOPS_CHUNK_SIZE):
+            rows = np.arange(start, min(start + HOPS_CHUNK_SIZE, len(inner)))
+            hops = graph._hops_matrix(rows)
+            hops = np.where(hops >= 0, hops + extra, -1)
+            # 到自身的叶子节点：至少连有两个叶子节点时，两叶子之间跳数为2
+            hops[np.arange(len(rows)), rows] = leaf_count[rows] > 1
+            far = hops.argmax(axis=1)
+            ecc = hops[np.arange(len(rows)), far] + extra[rows]
+            row = int(ecc.argmax())
+            if ecc[row] <= best[0]:
+                continue
+            # 连有叶子节点的一端以叶子节点代替
+            src, dst = int(inner[rows[row]]), int(inner[far[row]])
+            src_leaves = leaves[leaf_parent == src]
+            dst_leaves = leaves[leaf_parent == dst]
+            if len(dst_leaves):
+                dst = int(dst_leaves[-1])
+            if len(src_leaves):
+                src = int(src_leaves[0])
+            best = (int(ecc[row]), src, dst)
+        return best[0], self.names[best[1]], self.names[best[2]]
+
+    def _tarjan(self):
+        '''迭代的Tarjan算法，返回(是否为割点的列表, 桥的边编号列表)'''
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        arc_edges = self.arc_edges.tolist()
+        num_nodes = len(self)
+        disc, low = [-1] * num_nodes, [0] * num_nodes
+        is_cut, bridges = [False] * num_nodes, []
+        timer = 0
+        for root in range(num_nodes):
+            if disc[root] >= 0:
+                continue
+            disc[root] = low[root] = timer
+            timer += 1
+            children = 0
+            # (节点, 进入该节点的边, 下一条待访问的弧)
+            stack = [(root, -1, indptr[root])]
+            while stack:
+                node, parent_edge, arc = stack[-1]
+                if arc < indptr[node + 1]:
+                    stack[-1] = (node, parent_edge, arc + 1)
+                    neighbor, edge = indices[arc], arc_edges[arc]
+                    if edge == parent_edge:
+                        continue
+                    if disc[neighbor] < 0:
+                        disc[neighbor] = low[neighbor] = timer
+                        timer += 1
+                        stack.append((neighbor, edge, indptr[neighbor]))
+                        if node == root:
+                            children += 1
+                    elif disc[neighbor] < low[node]:
+                        low[node] = disc[neighbor]
+                    continue
+                stack.pop()
+                if not stack:
+                    continue
+                parent = stack[-1][0]
+                if low[node] < low[parent]:
+                    low[parent] = low[node]
+                if low[node] >= disc[parent] and parent != root:
+                    is_cut[parent] = True
+                if low[node] > disc[parent]:
+                    bridges.append(parent_edge)
+            if children > 1:
+                is_cut[root] = True
+        return is_cut, bridges
+
+    def articulation_points(self):
+        '''割点，即删除后所在连通分量不再连通的节点（如连有主机的交换机）
+
+        Returns:
+            节点名列表
+        '''
+        is_cut, _ = self._tarjan()
+        return [name for name, cut in zip(self.names, is_cut) if cut]
+
+    def bridges(self):
+        '''桥，即删除后所在连通分量不再连通的链路（如主机的接入链路）
+
+        Returns:
+            链路名列表
+        '''
+        _, bridges = self._tarjan()
+        return [self.link_names[edge] for edge in sorted(bridges)]
+
+    def min_cut(self, source, target):
+        '''两节点之间的最小割，即至少删除多少条链路才能使两者不连通
+
+        每条链路的容量为1，以BFS寻找增广路径求最大流，增广次数不超过两端节点的度。
+
+        Args:
+            source(str): 源节点名
+            target(str): 目的节点名
+
+        Returns:
+            (割的链路数, 割边的链路名列表)；两节点不连通时返回(0, [])
+        '''
+        src, dst = self._ids([source, target])
+        if src == dst:
+            raise ValueError("source and target must be different nodes")
+        num_arcs = len(self.indices)
+        # 每条边的两条弧互为反向弧
+        by_edge = np.argsort(self.arc_edges, kind="stable")
+        reverse = np.empty(num_arcs, dtype=np.int64)
+        reverse[by_edge[0::2]] = by_edge[1::2]
+        reverse[by_edge[1::2]] = by_edge[0::2]
+        flow = np.zeros(num_arcs, dtype=np.int64)
+        cut_size = 0
+        while True:
+            hops, parent_arcs = self._bfs(src, usable_arcs=flow < 1)
+            if hops[dst] < 0:
+                break
+            node = dst
+            while node != src:
+                arc = parent_arcs[node]
+                flow[arc] += 1
+                flow[reverse[arc]] -= 1
+                node = self._arc_sources[arc]
+            cut_size += 1
+        reachable = hops >= 0
+        cut = reachable[self.edges[:, 0]] != reachable[self.edges[:, 1]]
+        return cut_size, [self.link_names[edge] for edge in np.flatnonzero(cut)]
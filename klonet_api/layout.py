@@ -0,0 +1,418 @@
+import numpy as np
+from .graph import TopoGraph
+
+
+'''拓扑自动布局
+
+为整个Topo计算互不重叠的画布坐标，写入各节点的x、y。提供两种模式：
+
+    hierarchical  分层布局，适用于树、胖树等层次化拓扑：以主机（无主机时为度为1的
+                  节点）为最底层，按到最底层的跳数分层，层内按相邻层的重心排序以减少
+                  交叉
+    force         力导向布局（Fruchterman-Reingold），适用于一般拓扑：斥力、引力均以
+                  numpy整体计算；度为1的节点（如主机）不参与迭代，而是围绕其所连节点
+                  展开，因此数千个节点的拓扑也可在1秒内完成
+
+mode为auto时，若每条链路都连接相邻两层，则使用分层布局，否则使用力导向布局。
+ProjectManager.deploy在提交拓扑前会调用auto_layout：若有节点坐标重叠（如均未指定
+坐标），则自动布局，已指定且不重叠的坐标保持不变。例子：
+
+    layout_topo(topo)                  # 自动选择模式
+    layout_topo(topo, mode="force", seed=1)
+'''
+
+#: int: 画布的最小宽度与高度，与前端画布一致
+CANVAS_SIZE = 700
+#: int: 相邻节点的最小间距，节点较多时画布随之扩大
+MIN_NODE_SPACING = 40
+#: int: 节点距画布边缘的距离
+CANVAS_MARGIN = 50
+
+#: int: 力导向布局中，节点数超过此值时，每次迭代随机抽取此数量的节点计算斥力
+REPULSION_SAMPLES = 512
+
+#: tuple: 支持的布局模式
+LAYOUT_MODES = ("auto", "hierarchical", "force")
+
+
+'''坐标计算的基本方法，亦供generators使用'''
+
+
+def row_x(count, width):
+    '''在宽度为width的画布上均匀排列count个节点，返回x坐标'''
+    if count == 1:
+        return np.array([width / 2])
+    return np.linspace(CANVAS_MARGIN, width - CANVAS_MARGIN, count)
+
+
+def layered_xy(rows):
+    '''分层排列：rows依次为从上到下每一层的节点数，各层在同一宽度内均匀分布
+
+    Returns:
+        列表，每个元素为对应层的坐标数组
+    '''
+    width = max(CANVAS_SIZE,
+        (max(rows) - 1) * MIN_NODE_SPACING + 2 * CANVAS_MARGIN)
+    height = max(CANVAS_SIZE, width * 0.6)
+    ys = row_x(len(rows), height) if len(rows) > 1 else np.array([height / 2])
+    return [np.column_stack((row_x(count, width), np.full(count, y)))
+        for count, y in zip(rows, ys)]
+
+
+def ring_xy(count, center, radius):
+    '''在以(center, center)为圆心的圆上均匀排列count个节点'''
+    angles = np.linspace(0, 2 * np.pi, count, endpoint=False) - np.pi / 2
+    return np.column_stack((center + radius * np.cos(angles),
+        center + radius * np.sin(angles)))
+
+
+def ring_radius(count, slot_size=1):
+    '''周长足以容纳count个、每个占slot_size个节点间距的位置的半径'''
+    return max(CANVAS_SIZE / 2 - CANVAS_MARGIN,
+        count * slot_size * MIN_NODE_SPACING / (2 * np.pi))
+
+
+def rank_within_group(groups):
+    '''返回每个元素在同组元素中的序号（按原顺序，从0开始）'''
+    groups = np.asarray(groups)
+    ranks = np.empty(len(groups), dtype=np.int64)
+    sort_index = np.argsort(groups, kind="stable")
+    sorted_groups = groups[sort_index]
+    ranks[sort_index] = np.arange(len(groups)) \
+        - np.searchsorted(sorted_groups, sorted_groups)
+    return ranks
+
+
+def satellite_xy(parent_xy, parents, away_from, offset):
+    '''将节点放在所连父节点外侧，同一父节点的节点沿切向展开
+
+    Args:
+        parent_xy(ndarray): 父节点坐标，形状为(父节点数, 2)
+        parents(ndarray): 每个节点所连父节点的编号
+        away_from(ndarray): 远离的点，形状为(2,)或(父节点数, 2)，节点放在父节点
+            背离该点的方向上
+        offset(float): 节点与父节点的距离
+
+    Returns:
+        坐标数组，形状为(节点数, 2)
+    '''
+    parents = np.asarray(parents, dtype=np.int64)
+    anchor = parent_xy[parents]
+    away_from = np.asarray(away_from, dtype=float)
+    if away_from.ndim == 2:
+        away_from = away_from[parents]
+    direction = anchor - away_from
+    norm = np.linalg.norm(direction, axis=1, keepdims=True)
+    # 与远离点重合时朝下放置
+    direction = np.where(norm > 1e-9, direction / np.maximum(norm, 1e-9),
+        np.array([0.0, 1.0]))
+    tangent = np.column_stack((-direction[:, 1], direction[:, 0]))
+    counts = np.bincount(parents, minlength=len(parent_xy))
+    spread = rank_within_group(parents) - (counts[parents] - 1) / 2
+    # 节点较多时拉远，使展开的弧不至于过宽
+    distance = np.maximum(offset, counts[parents] * MIN_NODE_SPACING / 4)
+    return anchor + direction * distance[:, None] \
+        + tangent * (spread[:, None] * MIN_NODE_SPACING)
+
+
+def neighbor_centroids(xy, edges):
+    '''返回每个节点的邻居坐标的重心，没有邻居的节点取全部节点的重心'''
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    num_nodes = len(xy)
+    counts = np.bincount(edges.ravel(), minlength=num_nodes)
+    centroids = np.empty((num_nodes, 2))
+    for axis in (0, 1):
+        centroids[:, axis] = np.bincount(edges[:, 0], xy[edges[:, 1], axis],
+            num_nodes) + np.bincount(edges[:, 1], xy[edges[:, 0], axis],
+            num_nodes)
+    return np.where(counts[:, None] > 0,
+        centroids / np.maximum(counts, 1)[:, None], xy.mean(axis=0))
+
+
+'''分层布局'''
+
+
+def _hierarchy_levels(graph):
+    if graph.is_host.any():
+        bottom = np.flatnonzero(graph.is_host)
+    elif (graph.degree == 1).any():
+        bottom = np.flatnonzero(graph.degree == 1)
+    else:
+        bottom = np.array([0])
+    return graph.bfs_levels(bottom)
+
+
+def _is_layered(graph, levels):
+    '''每条边都连接相邻两层时，适合分层布局'''
+    if not len(graph.edges):
+        return False
+    diff = np.abs(levels[graph.edges[:, 0]] - levels[graph.edges[:, 1]])
+    return bool(np.all(diff == 1))
+
+
+def hierarchical_xy(graph, sweeps=4):
+    '''分层布局，返回坐标数组，形状为(节点数, 2)'''
+    levels = _hierarchy_levels(graph)
+    rows = levels.max() - levels # 最底层（主机）在最下方
+    num_rows = int(rows.max()) + 1
+    members = [np.flatnonzero(rows == r) for r in range(num_rows)]
+    # pos: 节点在所在层中的相对位置（0~1），按相邻层的重心迭代排序
+    pos = np.zeros(len(graph))
+    for nodes in members:
+        pos[nodes] = np.arange(len(nodes)) / max(len(nodes) - 1, 1)
+    src = np.concatenate((graph.edges[:, 0], graph.edges[:, 1]))
+    dst = np.concatenate((graph.edges[:, 1], graph.edges[:, 0]))
+
+    def reorder(r, neighbor_row):
+        nodes = members[r]
+        mask = (rows[src] == r) & (rows[dst] == neighbor_row)
+        sums = np.bincount(src[mask], weights=pos[dst[mask]],
+            minlength=len(graph))[nodes]
+        counts = np.bincount(src[mask], minlength=len(graph))[nodes]
+        # 没有相邻层邻居的节点保持原位置
+        keys = np.where(counts > 0, sums / np.maximum(counts, 1), pos[nodes])
+        order = np.lexsort((pos[nodes], keys))
+        members[r] = nodes = nodes[order]
+        pos[nodes] = np.arange(len(nodes)) / max(len(nodes) - 1, 1)
+
+    for sweep in range(sweeps):
+        if sweep % 2 == 0:
+            for r in range(1, num_rows):
+                reorder(r, r - 1)
+        else:
+            for r in range(num_rows - 2, -1, -1):
+                reorder(r, r + 1)
+    for r in range(1, num_rows): # 最后自上而下，使主机排在所连交换机下方
+        reorder(r, r - 1)
+
+    xy = np.empty((len(graph), 2))
+    for nodes, row_xy in zip(members, layered_xy([len(m) for m in members])):
+        xy[nodes] = row_xy
+    return xy
+
+
+'''力导向布局'''
+
+
+def _repulsion(xy, sources, k2, chunk_size):
+    '''各节点受sources中节点的斥力k^2/d之和，按块计算以限制内存占用'''
+    x, y = xy[:, 0], xy[:, 1]
+    sx, sy = xy[sources, 0], xy[sources, 1]
+    displacement = np.empty_like(xy)
+    for start in range(0, len(xy), chunk_size):
+        dx = x[start:start + chunk_size, None] - sx[None, :]
+        dy = y[start:start + chunk_size, None] - sy[None, :]
+        weight = dx * dx
+        weight += dy * dy
+        np.maximum(weight, 1e-2, out=weight)
+        np.divide(k2, weight, out=weight)
+        displacement[start:start + chunk_size, 0] = np.einsum("ij,ij->i",
+            dx, weight)
+        displacement[start:start + chunk_size, 1] = np.einsum("ij,ij->i",
+            dy, weight)
+    return displacement
+
+
+def force_xy(num_nodes, edges, init_xy=None, fixed=None, iterations=50,
+             ideal_length=2 * MIN_NODE_SPACING, seed=0):
+    '''Fruchterman-Reingold力导向布局
+
+    Args:
+        num_nodes(int): 节点数
+        edges(ndarray): 边，形状为(边数, 2)
+        init_xy(ndarray): 初始坐标，默认为None，即随机初始化
+        fixed(ndarray): 布尔数组，为True的节点保持init_xy中的坐标不动
+        iterations(int): 迭代次数
+        ideal_length(float): 理想边长
+        seed(int): 随机种子
+
+    Returns:
+        坐标数组，形状为(节点数, 2)
+    '''
+    side = ideal_length * max(np.sqrt(num_nodes), 1)
+    if init_xy is None:
+        xy = np.random.default_rng(seed).random((num_nodes, 2)) * side
+    else:
+        xy = np.array(init_xy, dtype=float)
+    if num_nodes < 2:
+        return xy
+    movable = np.ones(num_nodes, dtype=bool) if fixed is None else ~fixed
+    xy = xy.astype(np.float32)
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    rng = np.random.default_rng(seed)
+    # 节点较多时，每次迭代只计算来自随机抽取的部分节点的斥力，并按比例放大，
+    # 使每次迭代的开销为O(节点数 * REPULSION_SAMPLES)
+    num_sources = min(num_nodes, REPULSION_SAMPLES)
+    k2 = np.float32(ideal_length ** 2 * num_nodes / num_sources)
+    # 每块约1M个节点对
+    chunk_size = max(1, (1 << 20) // num_sources)
+    initial_temperature = side / 10
+    for i in range(iterations):
+        # 线性降温，每次移动的距离不超过temperature
+        temperature = initial_temperature * (1 - i / iterations)
+        sources = slice(None) if num_sources == num_nodes \
+            else rng.choice(num_nodes, num_sources, replace=False)
+        displacement = _repulsion(xy, sources, k2, chunk_size)
+        delta = xy[edges[:, 0]] - xy[edges[:, 1]]
+        dist = np.sqrt(np.einsum("ij,ij->i", delta, delta)) + 1e-6
+        attraction = delta * (dist / ideal_length)[:, None]
+        for axis in (0, 1):
+            displacement[:, axis] += np.bincount(edges[:, 1],
+                attraction[:, axis], num_nodes) - np.bincount(edges[:, 0],
+                attraction[:, axis], num_nodes)
+        length = np.linalg.norm(displacement, axis=1, keepdims=True) + 1e-6
+        step = displacement / length * np.minimum(length, temperature)
+        xy[movable] += step[movable]
+    return xy.astype(float)
+
+
+def _remove_overlaps(xy, fixed, cell):
+    '''将节点吸附到边长为cell的网格上，已被占用时放到最近的空闲格，使任意两个节点
+    的距离不小于cell。固定的节点保持原坐标并占用所在格'''
+    cells = np.rint(xy / cell).astype(np.int64)
+    occupied = set(map(tuple, cells[fixed].tolist()))
+    result = xy.copy()
+    for index in np.flatnonzero(~fixed).tolist():
+        cx, cy = cells[index].tolist()
+        radius = 0
+        while True:
+            # 依次搜索以原格为中心、半径为radius的方环
+            found = None
+            for dx in range(-radius, radius + 1):
+                for dy in (-radius, radius) if abs(dx) != radius \
+                        else range(-radius, radius + 1):
+                    if (cx + dx, cy + dy) not in occupied:
+                        found = (cx + dx, cy + dy)
+                        break
+                if found:
+                    break
+            if found:
+                break
+            radius += 1
+        occupied.add(found)
+        result[index] = (found[0] * cell, found[1] * cell)
+    return result
+
+
+def _force_layout(graph, fixed, init_xy, iterations, seed):
+    num_nodes = len(graph)
+    # 度为1、且所连节点度大于1的非固定节点作为卫星节点，不参与迭代
+    neighbor = np.full(num_nodes, -1, dtype=np.int64)
+    leaves = np.flatnonzero(graph.degree == 1)
+    neighbor[leaves] = graph.indices[graph.indptr[leaves]]
+    is_satellite = (graph.degree == 1) & ~fixed
+    is_satellite[is_satellite] = graph.degree[neighbor[is_satellite]] > 1
+    core = np.flatnonzero(~is_satellite)
+    core_index = np.full(num_nodes, -1, dtype=np.int64)
+    core_index[core] = np.arange(len(core))
+    core_edges = core_index[graph.edges]
+    core_edges = core_edges[(core_edges >= 0).all(axis=1)]
+
+    # 理想边长随卫星节点数增长，为其预留空间
+    satellites = np.flatnonzero(is_satellite)
+    num_satellites = np.bincount(neighbor[satellites], minlength=num_nodes)
+    ideal_length = 2 * MIN_NODE_SPACING * (1 + np.sqrt(np.median(
+        num_satellites[core]) if len(core) else 0))
+    core_fixed = fixed[core]
+    core_init = None
+    if core_fixed.any():
+        rng = np.random.default_rng(seed)
+        side = ideal_length * max(np.sqrt(len(core)), 1)
+        core_init = init_xy[core].astype(float)
+        core_init[~core_fixed] = rng.random(((~core_fixed).sum(), 2)) * side \
+            + init_xy[core][core_fixed].min(axis=0)
+    core_xy = force_xy(len(core), core_edges, init_xy=core_init,
+        fixed=core_fixed, iterations=iterations, ideal_length=ideal_length,
+        seed=seed)
+
+    xy = np.empty((num_nodes, 2))
+    xy[core] = core_xy
+    if len(satellites):
+        # 卫星节点放在所连节点背离其核心邻居重心的一侧
+        parents = core_index[neighbor[satellites]]
+        xy[satellites] = satellite_xy(core_xy, parents,
+            neighbor_centroids(core_xy, core_edges), 1.5 * MIN_NODE_SPACING)
+    xy[fixed] = init_xy[fixed]
+    if not fixed.any():
+        xy -= xy.min(axis=0) - CANVAS_MARGIN
+    else:
+        np.maximum(xy, 0, out=xy)
+    return _remove_overlaps(xy, fixed, 0.75 * MIN_NODE_SPACING)
+
+
+'''对外接口'''
+
+
+def _node_dicts(topo):
+    topo_dict = topo.dictform()
+    return [node for category, elements in topo_dict.items()
+        if category != "links" for node in elements.values()]
+
+
+def needs_layout(topo):
+    '''判断Topo中是否有坐标重叠的节点（如均未指定坐标，都在(0, 0)）'''
+    coordinates = [(node.get("x"), node.get("y")) for node in _node_dicts(topo)]
+    return len(set(coordinates)) < len(coordinates)
+
+
+def layout_topo(topo, mode="auto", fixed=(), iterations=50, seed=0):
+    '''计算Topo中所有节点的坐标，并写入各节点的x、y
+
+    Args:
+        topo(Topo): Topo对象
+        mode(str): 布局模式，auto、hierarchical或force，默认为auto
+        fixed(iterable): 保持原坐标不动的节点名，指定时使用力导向布局
+        iterations(int): 力导向布局的迭代次数，默认为50
+        seed(int): 力导向布局的随机种子，相同的种子得到相同的布局
+
+    Returns:
+        实际使用的布局模式，hierarchical或force
+
+    Raises:
+        ValueError: 布局模式不合法时，触发此异常
+    '''
+    if mode not in LAYOUT_MODES:
+        raise ValueError(f"Unsupported layout mode {mode!r}, supported modes: "
+            f"{', '.join(LAYOUT_MODES)}")
+    graph = TopoGraph(topo)
+    if not len(graph):
+        return mode if mode != "auto" else "hierarchical"
+    node_dicts = _node_dicts(topo)
+    fixed_names = set(fixed)
+    is_fixed = np.array([name in fixed_names for name in graph.names],
+        dtype=bool)
+    if mode == "auto":
+        layered = not is_fixed.any() \
+            and _is_layered(graph, _hierarchy_levels(graph))
+        mode = "hierarchical" if layered else "force"
+
+    if mode == "hierarchical":
+        xy = hierarchical_xy(graph)
+    else:
+        init_xy = np.array([(node.get("x") or 0, node.get("y") or 0)
+            for node in node_dicts], dtype=float)
+        xy = _force_layout(graph, is_fixed, init_xy, iterations, seed)
+    for node, (x, y) in zip(node_dicts, np.rint(xy).astype(np.int64).tolist()):
+        node["x"], node["y"] = x, y
+    return mode
+
+
+def auto_layout(topo):
+    '''若有节点坐标重叠，则自动布局；坐标已指定（不为(0, 0)）且不与其它节点重叠的
+    节点保持不动
+
+    Returns:
+        是否进行了布局
+    '''
+    if not needs_layout(topo):
+        return False
+    node_dicts = _node_dicts(topo)
+    coordinates = [(node.get("x") or 0, node.get("y") or 0)
+        for node in node_dicts]
+    counts = {}
+    for coordinate in coordinates:
+        counts[coordinate] = counts.get(coordinate, 0) + 1
+    fixed = [node["name"] for node, coordinate in zip(node_dicts, coordinates)
+        if coordinate != (0, 0) and counts[coordinate] == 1]
+    layout_topo(topo, fixed=fixed)
+    return True
@@ -1,4 +1,6 @@
-from .common import Manager, Link, LinkNotExistsError, LinkParallelError, LinkInconsistentError, cidr2ip_and_netmask
+import copy
+from .common import Manager, request_deadline, Link, LinkNotExistsError, LinkParallelError, LinkInconsistentError, cidr2ip_and_netmask
+from .common import get_plural_of_words, plan_link_addresses
 
 class LinkManager(Manager):
     '''链路管理类
@@ -17,7 +19,7 @@ class LinkManager(Manager):
         self.project = project_name
 
     def dynamic_add_link(self, link_name, src_node, dst_node, src_IP="",
-        dst_IP=""):
+        dst_IP="", deadline_s=None, address_pool=None):
         '''动态添加链路
 
         注意：该API仅对已创建项目生效！
@@ -29,6 +31,10 @@ class LinkManager(Manager):
             dst_node(Node): 目的节点的Node对象
             src_IP(str): 源节点的IP地址，例如"192.168.1.1/24"，默认为""
             dst_IP(str): 目的节点的IP地址，例如"192.168.1.2/24"，默认为""
+            deadline_s(float): 整个操作（含其中的多次请求）的截止时间（秒），默认为
+                None，即不限制
+            address_pool(AddressPool): 地址池，默认为None。指定且src_IP、dst_IP均为""
+                时，按plan_addresses的规则自动分配地址
 
         Returns:
             None
@@ -39,75 +45,129 @@ class LinkManager(Manager):
             VemuExecError: 当HTTP请求成功，但json中的返回码不为1时，触发此异常
             LinkParallelError: 当出现平行边（即新边与已有边的两端节点名相同）时，触发
                 此异常
+            AddressConflictError: 自动分配地址时，项目中同一地址被多个接口使用，触发
+                此异常
         '''
-        # 参数检查
-        if src_node.name == dst_node.name:
-            raise ValueError(f"Node cannot connect to itself!")
-        if src_IP != "":
-            cidr2ip_and_netmask(src_IP)
-        if dst_IP != "":
-            cidr2ip_and_netmask(dst_IP)
-
-        # 检查平行边
-        self._check_parallel_link(link_name, src_node.name, dst_node.name)
-
-        # 创建链路
-        payload = {
-            "user": self.user,
-            "topo": self.project,
-            "info": {
-                "config": {
-                    "source": {"bw_kbit":"", "queue_size_byte":"", "delay_us":"",
-                        "loss_rate":"", "jitter_us":"", "correlation":"",
-                        "delay_distribution":"normal"},
-                    "target":{"bw_kbit":"", "queue_size_byte":"", "delay_us":"",
-                        "loss_rate":"", "jitter_us":"", "correlation":"",
-                        "delay_distribution":"normal"}
+        with request_deadline(deadline_s):
+            # 参数检查
+            if src_node.name == dst_node.name:
+                raise ValueError(f"Node cannot connect to itself!")
+            if address_pool is not None and src_IP == "" and dst_IP == "":
+                src_IP, dst_IP = self.plan_addresses(
+                    [(link_name, src_node, dst_node)], address_pool).get(
+                    link_name, ("", ""))
+            if src_IP != "":
+                cidr2ip_and_netmask(src_IP)
+            if dst_IP != "":
+                cidr2ip_and_netmask(dst_IP)
+
+            # 检查平行边
+            self._check_parallel_link(link_name, src_node.name, dst_node.name)
+
+            # 创建链路
+            payload = {
+                "user": self.user,
+                "topo": self.project,
+                "info": {
+                    "config": {
+                        "source": {"bw_kbit":"", "queue_size_byte":"", "delay_us":"",
+                            "loss_rate":"", "jitter_us":"", "correlation":"",
+                            "delay_distribution":"normal"},
+                        "target":{"bw_kbit":"", "queue_size_byte":"", "delay_us":"",
+                            "loss_rate":"", "jitter_us":"", "correlation":"",
+                            "delay_distribution":"normal"}
+                    }
                 }
             }
-        }
-        payload["info"]["name"] = link_name
-        payload["info"]["source"] = src_node.name
-        payload["info"]["sourceIP"] = src_IP
-        payload["info"]["sourceType"] = src_node.type
-        payload["info"]["target"] = dst_node.name
-        payload["info"]["targetIP"] = dst_IP
-        payload["info"]["targetType"] = dst_node.type
-
-        resp = self._post("/modification/link/", json=payload)
-        self._check_resp_code(self._parse_resp(resp))
-
-        # 修改节点信息
-        if src_IP != "":
-            ip, netmask = cidr2ip_and_netmask(src_IP)
-            print(netmask)
-            nic_nickname = f"{src_node.name}{dst_node.name}"
-            src_node.interfaces.append({"ip": ip, "netmask": netmask, 
-                "name": nic_nickname})
-            payload = {}
-            payload = {"user": self.user, "topo": self.project, 
-                "info": src_node.dictform()}
-            resp = self._put("/modification/container/", json=payload)
-            self._check_resp_code(self._parse_resp(resp))
-
-        if dst_IP != "":
-            ip, netmask = cidr2ip_and_netmask(dst_IP)
-            nic_nickname = f"{dst_node.name}{src_node.name}"
-            dst_node.interfaces.append({"ip": ip, "netmask": netmask, 
-                "name": nic_nickname})
-            payload = {}
-            payload = {"user": self.user, "topo": self.project, 
-                "info": dst_node.dictform()}
-            resp = self._put("/modification/container/", json=payload)
-            self._check_resp_code(self._parse_resp(resp))
+            payload["info"]["name"] = link_name
+            payload["info"]["source"] = src_node.name
+            payload["info"]["sourceIP"] = src_IP
+            payload["info"]["sourceType"] = src_node.type
+            payload["info"]["target"] = dst_node.name
+            payload["info"]["targetIP"] = dst_IP
+            payload["info"]["targetType"] = dst_node.type
+
+            try:
+                resp = self._post("/modification/link/", json=payload)
+                self._check_resp_code(self._parse_resp(resp))
+
+                # 修改节点信息
+                if src_IP != "":
+                    ip, netmask = cidr2ip_and_netmask(src_IP)
+                    nic_nickname = f"{src_node.name}{dst_node.name}"
+                    src_node.interfaces.append({"ip": ip, "netmask": netmask, 
+                        "name": nic_nickname})
+                    payload = {}
+                    payload = {"user": self.user, "topo": self.project, 
+                        "info": src_node.dictform()}
+                    resp = self._put("/modification/container/", json=payload)
+                    self._check_resp_code(self._parse_resp(resp))
+
+                if dst_IP != "":
+                    ip, netmask = cidr2ip_and_netmask(dst_IP)
+                    nic_nickname = f"{dst_node.name}{src_node.name}"
+                    dst_node.interfaces.append({"ip": ip, "netmask": netmask, 
+                        "name": nic_nickname})
+                    payload = {}
+                    payload = {"user": self.user, "topo": self.project, 
+                        "info": dst_node.dictform()}
+                    resp = self._put("/modification/container/", json=payload)
+                    self._check_resp_code(self._parse_resp(resp))
+            finally:
+                self._invalidate_project_snapshot(self.user, self.project)
+
+    def plan_addresses(self, new_links, address_pool, p2p_prefix=30):
+        '''为即将动态添加的链路批量规划地址
+
+        以项目当前的拓扑为准：先将项目中所有现有接口的地址登记到地址池，再为new_links
+        统一规划，规则与Topo.assign_addresses相同。规划出的地址在地址池中即被占用，
+        随后应以其调用dynamic_add_link。
 
-    def dynamic_delete_link(self, link_name):
-        '''动态删除节点。
+        Args:
+            new_links(iterable): 每个元素为(链路名, 源节点的Node对象, 目的节点的Node对象)
+            address_pool(AddressPool): 地址池
+            p2p_prefix(int): 点对点子网的前缀长度，30或31，默认为30
+
+        Returns:
+            字典，链路名 -> (源端地址, 目的端地址)，只包含需要配置地址的链路。例子：
+
+            plan = link_manager.plan_addresses(
+                [("l9", h9, s1), ("l10", r1, r2)], pool)
+            for name, src, dst in new_links:
+                link_manager.dynamic_add_link(name, src, dst, *plan.get(name, ("", "")))
+
+        Raises:
+            AddressConflictError: 项目中同一地址被多个接口使用时，触发此异常
+            AddressPoolExhaustedError: 地址池空闲地址不足时，触发此异常
+        '''
+        snapshot = self._get_project_snapshot(self.user, self.project)
+        # 快照为共享对象，只在浅拷贝上添加新链路及新节点
+        topo_dict = dict(snapshot)
+        topo_dict["links"] = dict(snapshot["links"])
+        link_names, copied = [], set()
+        for link_name, src_node, dst_node in new_links:
+            for node in (src_node, dst_node):
+                category = get_plural_of_words(node.type)
+                if node.name not in topo_dict.get(category, {}):
+                    if category not in copied:
+                        topo_dict[category] = dict(topo_dict.get(category, {}))
+                        copied.add(category)
+                    topo_dict[category][node.name] = {"interfaces": []}
+            topo_dict["links"][link_name] = {"source": src_node.name,
+                "target": dst_node.name, "sourceIP": "", "targetIP": ""}
+            link_names.append(link_name)
+        return plan_link_addresses(topo_dict, address_pool, link_names,
+            p2p_prefix)
+
+    def dynamic_delete_link(self, link_name, deadline_s=None):
+        '''动态删除链路，同时删除两端节点上该链路的接口。
         
         注意：该API仅对已创建项目生效！
 
         Args:
-            node_name(str): 要删除节点名
+            link_name(str): 要删除的链路名
+            deadline_s(float): 整个操作（含其中的多次请求）的截止时间（秒），默认为
+                None，即不限制
 
         Returns:
             None
@@ -117,13 +177,38 @@ class LinkManager(Manager):
             JsonDecodeError: 当返回体不包含json时，触发此异常
             VemuExecError: 当HTTP请求成功，但json中的返回码不为1时，触发此异常
         '''
-        link = self.get_link(link_name)
+        with request_deadline(deadline_s):
+            link = self.get_link(link_name)
+            topo = self._get_project_snapshot(self.user, self.project)
 
-        payload = {"user": self.user, "topo": self.project, 
-            "info": link.__dict__}
-        resp = self._delete("/modification/link/", json=payload)
-        resp_json = self._parse_resp(resp)
-        self._check_resp_code(resp_json)
+            payload = {"user": self.user, "topo": self.project, 
+                "info": link.__dict__}
+            try:
+                resp = self._delete("/modification/link/", json=payload)
+                resp_json = self._parse_resp(resp)
+                self._check_resp_code(resp_json)
+
+                # 后端不会删除dynamic_add_link写入端点的接口，需修改节点信息
+                for node_name, peer_name in ((link.source, link.target),
+                        (link.target, link.source)):
+                    node_dict = next((elements[node_name]
+                        for category, elements in topo.items()
+                        if category != "links" and node_name in elements),
+                        None)
+                    nic_nickname = f"{node_name}{peer_name}"
+                    if node_dict is None or not any(nic.get("name") ==
+                            nic_nickname for nic in node_dict.get("interfaces")
+                            or []):
+                        continue
+                    node_dict = copy.deepcopy(node_dict)
+                    node_dict["interfaces"] = [nic for nic in
+                        node_dict["interfaces"] if nic.get("name") != nic_nickname]
+                    payload = {"user": self.user, "topo": self.project,
+                        "info": node_dict}
+                    resp = self._put("/modification/container/", json=payload)
+                    self._check_resp_code(self._parse_resp(resp))
+            finally:
+                self._invalidate_project_snapshot(self.user, self.project)
 
     def config_link(self, src_link_config, dst_link_config):
         '''配置链路属性。
@@ -136,7 +221,10 @@ class LinkManager(Manager):
             dst_link_config(LinkConfiguration): 链路目的端的LinkConfiguration对象
 
         Returns:
-            None
+            后端响应的json，例子：
+                {"code": 1,
+                "msg": "success"
+                }
 
         Raises:
             LinkInconsistentError: 当链路属性配置时，链路两端的LinkConfiguration
@@ -156,39 +244,48 @@ class LinkManager(Manager):
             "links": [src_link_config.dictform(), dst_link_config.dictform()]
         }
 
-        resp = self._post('/master/link/', json=payload)
-        print(self._parse_resp(resp))
-        self._check_resp_code(self._parse_resp(resp))
-        
-
-    def clear_link_configuration(self, link_name):
+        try:
+            resp = self._post('/master/link/', json=payload)
+            resp_json = self._parse_resp(resp)
+            self._check_resp_code(resp_json)
+        finally:
+            self._invalidate_project_snapshot(self.user, self.project)
+        return resp_json
+
+    def clear_link_configuration(self, link_name, deadline_s=None):
         '''清除链路上的队列配置。
 
         Args:
             link_name(str): 链路名
+            deadline_s(float): 整个操作（含其中的多次请求）的截止时间（秒），默认为
+                None，即不限制
 
         Returns:
             None
         '''
-        link = self.get_link(link_name)
-        payload = {
-            "user": self.user,
-            "topo": self.project,
-            "links": [
-                {
-                    "link": f"link_{link_name}",
-                    "linkchoice": "static",
-                    "ne": link.source
-                },
-                {
-                    "link": f"link_{link_name}",
-                    "linkchoice": "static",
-                    "ne": link.target
-                }
-            ]
-        }
-        resp = self._delete("/master/link/", json=payload)
-        self._check_resp_code(self._parse_resp(resp))
+        with request_deadline(deadline_s):
+            link = self.get_link(link_name)
+            payload = {
+                "user": self.user,
+                "topo": self.project,
+                "links": [
+                    {
+                        "link": f"link_{link_name}",
+                        "linkchoice": "static",
+                        "ne": link.source
+                    },
+                    {
+                        "link": f"link_{link_name}",
+                        "linkchoice": "static",
+                        "ne": link.target
+                    }
+                ]
+            }
+            try:
+                resp = self._delete("/master/link/", json=payload)
+                self._check_resp_code(self._parse_resp(resp))
+            finally:
+                self._invalidate_project_snapshot(self.user, self.project)
 
     def get_links(self):
         '''获取该项目下所有的链路名及对应的Link对象
@@ -199,15 +296,11 @@ class LinkManager(Manager):
             {"l1": l1的Link对象,"l2": l2的Link对象}
 
         '''
-        resp = self._get(f"/re/project/{self.project}/",
-            params={"user": self.user})
-        resp_json = self._parse_resp(resp)
-        self._check_resp_code(resp_json)
+        topo = self._get_project_snapshot(self.user, self.project)
 
         links = {}
-        for link_name, link_dict in resp_json["project"]["topo"][
-            "links"].items():
-            links[link_name] = Link(**link_dict)
+        for link_name, link_dict in topo["links"].items():
+            links[link_name] = Link(**copy.deepcopy(link_dict))
 
         return links
 
@@ -226,10 +319,9 @@ class LinkManager(Manager):
             VemuExecError: 当HTTP请求成功，但json中的返回码不为1时，触发此异常
             LinkNotExistsError: 当目标链路不存在时，触发此异常
         '''
-        links = self.get_links()
+        links = self._get_project_snapshot(self.user, self.project)["links"]
         try:
-            link = links[link_name]
-            return link
+            return Link(**copy.deepcopy(links[link_name]))
         except KeyError:
             raise LinkNotExistsError(f"Link [{link_name}] does not exist, "
                 f"avaliable links are {list(links.keys())}")
@@ -248,12 +340,12 @@ class LinkManager(Manager):
             LinkParallelError: 当出现平行边（即新边与已有边的两端节点名相同）时，触发
                 该异常
         '''
-        links = self.get_links()
+        links = self._get_project_snapshot(self.user, self.project)["links"]
         my_endpoints = set([src_node_name, dst_node_name])
         for _, link in links.items():
-            exist_endpoints = set([link.source, link.target])
+            exist_endpoints = set([link["source"], link["target"]])
             if my_endpoints == exist_endpoints:
                 raise LinkParallelError(f"New link {link_name}({src_node_name}"
-                    f"---{dst_node_name}) repeat with exist link {link.name}"
-                    f"({link.source}---{link.target})")
+                    f"---{dst_node_name}) repeat with exist link "
+                    f"{link['name']}({link['source']}---{link['target']})")
 
@@ -1,4 +1,4 @@
-from .common import Manager, Node, NodeNotExistsError
+from .common import Manager, request_deadline, Node, NodeNotExistsError
 import copy
 
 class NodeManager(Manager):
@@ -55,19 +55,24 @@ class NodeManager(Manager):
 
         payload = {"user": self.user, "topo": self.project,
             "info": node.dictform()}
-        resp = self._post("/modification/container/", json=payload)
-        resp_json = self._parse_resp(resp)
-        self._check_resp_code(resp_json)
+        try:
+            resp = self._post("/modification/container/", json=payload)
+            resp_json = self._parse_resp(resp)
+            self._check_resp_code(resp_json)
+        finally:
+            self._invalidate_project_snapshot(self.user, self.project)
 
         return Node(**node.dictform())
 
-    def dynamic_delete_node(self, node_name):
+    def dynamic_delete_node(self, node_name, deadline_s=None):
         '''动态删除节点。
 
         注意：该API仅对已创建项目生效！
 
         Args:
             node_name: 要删除节点名
+            deadline_s(float): 整个操作（含其中的多次请求）的截止时间（秒），默认为
+                None，即不限制
 
         Returns:
             None
@@ -77,13 +82,41 @@ class NodeManager(Manager):
             JsonDecodeError: 当返回体不包含json时，触发此异常
             VemuExecError: 当HTTP请求成功，但json中的返回码不为1时，触发此异常
         '''
-        node = self.get_node(node_name)
+        with request_deadline(deadline_s):
+            node = self.get_node(node_name)
 
-        payload = {"user": self.user, "topo": self.project, 
-            "info": node.__dict__}
-        resp = self._delete("/modification/container/", json=payload)
-        resp_json = self._parse_resp(resp)
-        self._check_resp_code(resp_json)
+            payload = {"user": self.user, "topo": self.project, 
+                "info": node.__dict__}
+            try:
+                resp = self._delete("/modification/container/", json=payload)
+                resp_json = self._parse_resp(resp)
+                self._check_resp_code(resp_json)
+            finally:
+                self._invalidate_project_snapshot(self.user, self.project)
+
+    def dynamic_update_node(self, node):
+        '''动态修改节点信息，如整体写入节点的接口列表。
+
+        注意：该API仅对已创建项目生效！
+
+        Args:
+            node(Node): 修改后的Node对象，以名称确定要修改的节点
+
+        Returns:
+            None
+
+        Raises:
+            HttpStatusError: 当HTTP的返回状态码不为200时，触发此异常
+            JsonDecodeError: 当返回体不包含json时，触发此异常
+            VemuExecError: 当HTTP请求成功，但json中的返回码不为1时，触发此异常
+        '''
+        payload = {"user": self.user, "topo": self.project,
+            "info": node.dictform()}
+        try:
+            resp = self._put("/modification/container/", json=payload)
+            self._check_resp_code(self._parse_resp(resp))
+        finally:
+            self._invalidate_project_snapshot(self.user, self.project)
 
     # def dynamic_modify_node(self, node):
     #     '''
@@ -106,18 +139,14 @@ class NodeManager(Manager):
             JsonDecodeError: 当返回体不包含json时，触发此异常
             VemuExecError: 当HTTP请求成功，但json中的返回码不为1时，触发此异常
         '''
-        resp = self._get(f"/re/project/{self.project}/",
-            params={"user": self.user})
-        resp_json = self._parse_resp(resp)
-        self._check_resp_code(resp_json)
+        topo = self._get_project_snapshot(self.user, self.project)
 
         nodes = {}
-        for type in resp_json["project"]["topo"].keys():
+        for type in topo.keys():
             if type == "links":
                 continue
-            for node_name, node_dict in resp_json["project"]["topo"][
-                type].items():
-                nodes[node_name] = Node(**node_dict)
+            for node_name, node_dict in topo[type].items():
+                nodes[node_name] = Node(**copy.deepcopy(node_dict))
 
         return nodes
 
@@ -136,13 +165,15 @@ class NodeManager(Manager):
             VemuExecError: 当HTTP请求成功，但json中的返回码不为1时，触发此异常
             NodeNotExistsError: 当目标节点不存在时，触发此异常
         '''
-        nodes = self.get_nodes()
-        try:
-            node = nodes[node_name]
-            return node
-        except KeyError:
-            raise NodeNotExistsError(f"Node [{node_name}] does not exist, "
-                f"avaliable nodes are {list(nodes.keys())}")
+        topo = self._get_project_snapshot(self.user, self.project)
+        for type in topo.keys():
+            if type != "links" and node_name in topo[type]:
+                return Node(**copy.deepcopy(topo[type][node_name]))
+
+        node_names = [name for type in topo.keys() if type != "links"
+            for name in topo[type].keys()]
+        raise NodeNotExistsError(f"Node [{node_name}] does not exist, "
+            f"avaliable nodes are {node_names}")
 
 
     def ssh_service(self, node_name, start, passwd="123456"):
@@ -205,7 +236,8 @@ class NodeManager(Manager):
             包含节点上所有端口的昵称到真实名字的对应关系字典，否则直接报错
             字典格式为：{'s1h1': 'ea857d34e8', 's1h2': 'b0a7d30a46'} 
         """
-        resp = self._get(f"/my/edit/", params={"username": self.user, "toponame": self.project})
+        resp = self._get(f"/my/edit/", params={"username": self.user, "toponame": self.project},
+            project=(self.user, self.project))
         resp_json = self._parse_resp(resp)
         nic_data = resp_json["static"]  # 从相应里提取对应关系信息
         return nic_data[node_name]
@@ -237,7 +269,7 @@ class NodeManager(Manager):
         """
         
         resp = self._get(f"/re/project/{self.project}/worker_ip/",
-            params={"user": self.user})
+            params={"user": self.user}, project=(self.user, self.project))
         resp_json = self._parse_resp(resp)
         self._check_resp_code(resp_json)
         all_node_worker_ip_info = resp_json["worker_ip"]
@@ -0,0 +1,279 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from . import config
+from .common import codec
+from .common.transport import ensure_pool_size
+from .project import ProjectManager
+
+
+'''多项目部署/删除
+
+教学场景中，实验课前需要为每个学生（用户）创建同一个拓扑。deploy_projects并发地为
+一组(用户, 项目)创建项目，destroy_projects并发地删除它们：同时进行的部署数受
+max_concurrency限制（后端逐个处理部署请求，过高的并发只会让每个项目都更慢），每个
+项目的进度事件可通过on_progress接收，结束后返回包含各项目耗时及分位数的
+OrchestrationReport。单个项目失败不会影响其它项目，失败的项目及其异常记录在报告中：
+
+    report = deploy_projects(topo, [("alice", "lab1"), ("bob", "lab1")])
+    print(report)           # deploy 2 projects: 2 ok, 0 failed in 35.2s ...
+    report.failed           # [ProjectResult(...), ...]
+'''
+
+
+class ProjectResult(object):
+    '''单个项目的部署/删除结果
+
+    Attributes:
+        user(str): 用户名
+        project(str): 项目名
+        usage(str): 操作类型，"deploy"或"delete"
+        ok(bool): 是否成功
+        error(Exception): 失败时的异常，成功时为None
+        queued_s(float): 从开始批量操作到该项目开始处理的等待时间（秒）
+        submit_s(float): 创建/删除请求的耗时（秒）
+        elapsed_s(float): 该项目开始处理到完成（或失败）的时间（秒），不含等待时间
+        progress(float): 最后一次查询到的进度值
+    '''
+    __slots__ = ("user", "project", "usage", "ok", "error", "queued_s",
+        "submit_s", "elapsed_s", "progress")
+
+    def __init__(self, user, project, usage):
+        self.user = user
+        self.project = project
+        self.usage = usage
+        self.ok = False
+        self.error = None
+        self.queued_s = 0.0
+        self.submit_s = None
+        self.elapsed_s = None
+        self.progress = 0.0
+
+    def dictform(self):
+        return {"user": self.user, "project": self.project,
+            "usage": self.usage, "ok": self.ok,
+            "error": None if self.error is None else repr(self.error),
+            "queued_s": self.queued_s, "submit_s": self.submit_s,
+            "elapsed_s": self.elapsed_s, "progress": self.progress}
+
+    def __str__(self):
+        name = f"{self.usage} {self.user}/{self.project}"
+        if self.elapsed_s is None:
+            return f"{name}: not started"
+        if self.ok:
+            return f"{name}: done in {self.elapsed_s:.1f}s"
+        return f"{name}: failed at {self.progress}% after " \
+            f"{self.elapsed_s:.1f}s: {self.error}"
+
+    def __repr__(self):
+        return (f"ProjectResult({self.user!r}, {self.project!r}, "
+            f"{self.usage!r}, ok={self.ok})")
+
+
+class OrchestrationReport(object):
+    '''批量部署/删除的汇总报告
+
+    Attributes:
+        usage(str): 操作类型，"deploy"或"delete"
+        results(list): ProjectResult对象的列表，顺序与传入的targets相同
+        wall_s(float): 整个批量操作的耗时（秒）
+        max_concurrency(int): 同时进行的操作数上限
+    '''
+    def __init__(self, usage, results, wall_s, max_concurrency):
+        self.usage = usage
+        self.results = results
+        self.wall_s = wall_s
+        self.max_concurrency = max_concurrency
+
+    @property
+    def ok(self):
+        '''是否所有项目都已成功'''
+        return all(result.ok for result in self.results)
+
+    @property
+    def succeeded(self):
+        return [result for result in self.results if result.ok]
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.ok]
+
+    def percentiles(self, field="elapsed_s", qs=(50, 90, 99)):
+        '''成功项目某项耗时的分位数
+
+        Args:
+            field(str): ProjectResult的耗时属性，"elapsed_s"、"submit_s"或
+                "queued_s"，默认为"elapsed_s"
+            qs(tuple): 分位数（0~100），默认为(50, 90, 99)
+
+        Returns:
+            字典，键为分位数，值为耗时（秒），没有成功的项目时值为None。如：
+
+            {50: 31.2, 90: 40.5, 99: 44.0}
+        '''
+        values = sorted(getattr(result, field) for result in self.succeeded)
+        return {q: _percentile(values, q) for q in qs}
+
+    def dictform(self):
+        return {"usage": self.usage, "wall_s": self.wall_s,
+            "max_concurrency": self.max_concurrency,
+            "succeeded": len(self.succeeded), "failed": len(self.failed),
+            "elapsed_s": self.percentiles("elapsed_s", (50, 90, 99, 100)),
+            "submit_s": self.percentiles("submit_s", (50, 90, 99, 100)),
+            "queued_s": self.percentiles("queued_s", (50, 90, 99, 100)),
+            "results": [result.dictform() for result in self.results]}
+
+    def __str__(self):
+        failed = self.failed
+        lines = [f"{self.usage} {len(self.results)} projects: "
+            f"{len(self.results) - len(failed)} ok, {len(failed)} failed in "
+            f"{self.wall_s:.1f}s (max_concurrency={self.max_concurrency})"]
+        if len(failed) < len(self.results):
+            for field in ("elapsed_s", "submit_s", "queued_s"):
+                stats = self.percentiles(field, (50, 90, 99, 100))
+                lines.append(f"  {field:<9} p50 {stats[50]:.2f}s  "
+                    f"p90 {stats[90]:.2f}s  p99 {stats[99]:.2f}s  "
+                    f"max {stats[100]:.2f}s")
+        for result in failed:
+            lines.append(f"  {result}")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return (f"OrchestrationReport({self.usage!r}, "
+            f"{len(self.results)} projects, {len(self.failed)} failed)")
+
+
+def _percentile(values, q):
+    '''已排序列表的分位数（线性插值）'''
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def deploy_projects(topo, targets, max_concurrency=None, quiet=False,
+        timeout_min=None, pool_interval_s=None, on_progress=None,
+        backend_ip=None, backend_port=None):
+    '''并发地为多个(用户, 项目)创建项目
+
+    Args:
+        topo(Topo or callable): 所有项目共用的Topo对象；或以(用户名, 项目名)为参数、
+            返回该项目Topo对象的函数（如按学生生成不同的地址）。共用的Topo对象在
+            开始前校验、布局并编码一次，之后各项目只读
+        targets(list): (用户名, 项目名)的列表
+        max_concurrency(int): 同时进行的部署数上限，默认为
+            config.orchestrate_max_concurrency
+        quiet(bool): 默认为False。若为False，则每个项目结束时打印一行结果
+        timeout_min(float): 单个项目的超时时间（分钟），默认同ProjectManager.deploy，
+            即按历史耗时预测
+        pool_interval_s(float): 轮询进度条API的最小间隔（秒），默认为
+            config.progress_poll_min_s
+        on_progress(callable): 以(用户名, ProgressEvent)为参数的函数，接收每个项目的
+            进度事件（在工作线程中调用），默认为None
+        backend_ip(str): 后端服务器IP，默认为config.backend_ip
+        backend_port(int): 后端服务器端口，默认为config.backend_port
+
+    Returns:
+        OrchestrationReport对象
+
+    Raises:
+        TopoValidationError: 当共用的Topo对象校验有错误时，在发送任何请求前触发此
+            异常。由函数生成的Topo对象在各自的项目中校验，错误记录在报告中
+    '''
+    if not callable(topo):
+        ProjectManager(targets[0][0] if targets else "", backend_ip,
+            backend_port)._prepare_topo(topo)
+        # 共用的拓扑只构建并编码一次，各项目的请求体只有用户名与项目名不同
+        topo_dict = topo.dictform()
+        networks = codec.dumps(topo_dict)
+
+    def run(manager, result, report, started):
+        if callable(topo):
+            project_topo = topo(result.user, result.project)
+            timer = manager._start_timer(result.project, "deploy",
+                project_topo)
+            manager._submit_timed(timer, manager.async_deploy,
+                result.project, project_topo)
+        else:
+            timer = manager._start_timer(result.project, "deploy", topo_dict)
+            manager._submit_timed(timer, manager._submit_deploy,
+                result.project, networks)
+        result.submit_s = time.monotonic() - started
+        manager._wait_progress(result.project, "deploy", True, timeout_min,
+            pool_interval_s, report, timer=timer)
+
+    return _orchestrate("deploy", targets, run, max_concurrency,
+        quiet, on_progress, backend_ip, backend_port)
+
+
+def destroy_projects(targets, max_concurrency=None, quiet=False,
+        timeout_min=None, pool_interval_s=None, on_progress=None,
+        backend_ip=None, backend_port=None):
+    '''并发地删除多个(用户, 项目)
+
+    Args:
+        targets(list): (用户名, 项目名)的列表
+        其余参数同deploy_projects
+
+    Returns:
+        OrchestrationReport对象
+    '''
+    def run(manager, result, report, started):
+        timer = manager._start_timer(result.project, "delete")
+        manager._submit_timed(timer, manager.async_destroy, result.project)
+        result.submit_s = time.monotonic() - started
+        manager._wait_progress(result.project, "delete", True, timeout_min,
+            pool_interval_s, report, timer=timer)
+
+    return _orchestrate("delete", targets, run, max_concurrency,
+        quiet, on_progress, backend_ip, backend_port)
+
+
+def _orchestrate(usage, targets, run, max_concurrency, quiet,
+        on_progress, backend_ip, backend_port):
+    max_concurrency = max_concurrency or getattr(config,
+        "orchestrate_max_concurrency", 8)
+    if max_concurrency <= 0:
+        raise ValueError(f"max_concurrency must be positive, "
+            f"got {max_concurrency}")
+    results = [ProjectResult(user, project, usage)
+        for user, project in targets]
+    if not results:
+        return OrchestrationReport(usage, results, 0.0, max_concurrency)
+    # 每个工作线程都在轮询进度条API，保证连接都能复用
+    url = ProjectManager("", backend_ip, backend_port).url
+    ensure_pool_size(url, max_concurrency)
+
+    lock = threading.Lock()
+    finished = [0]
+    batch_started_at = time.monotonic()
+
+    def work(result):
+        started = time.monotonic()
+        result.queued_s = started - batch_started_at
+
+        def report(event):
+            result.progress = event.value
+            if on_progress is not None:
+                on_progress(result.user, event)
+
+        try:
+            manager = ProjectManager(result.user, backend_ip, backend_port)
+            run(manager, result, report, started)
+            result.ok = True
+        except Exception as e:
+            result.error = e
+        result.elapsed_s = time.monotonic() - started
+        if not quiet:
+            with lock:
+                finished[0] += 1
+                print(f"[{finished[0]}/{len(results)}] {result}")
+
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(results)),
+            thread_name_prefix=f"orchestrate-{usage}") as executor:
+        for future in [executor.submit(work, result) for result in results]:
+            future.result()
+    return OrchestrationReport(usage, results,
+        time.monotonic() - batch_started_at, max_concurrency)
@@ -0,0 +1,247 @@
+import threading
+import time
+from concurrent.futures import CancelledError
+from . import config
+from .common.errors import ProgressTimeoutError
+
+
+'''部署/删除进度
+
+watch_progress轮询进度条API，以迭代器的形式返回ProgressEvent。轮询间隔自适应：进度
+变化时回到最小间隔，未变化时按倍数增大，直至最大间隔，因此部署顺利时反馈及时，后端
+长时间停在同一进度时也不会频繁请求master。只有进度变化、开始停滞及完成时才返回事件，
+调用者可直接打印或转发，不会刷屏：
+
+    for event in project_manager.watch_progress("p1"):
+        print(event)        # deploy p1: 35.0% after 12.3s
+
+进度超过config.progress_stall_s未变化时返回一个stalled为True的事件（进度再次变化后
+重新计时）；超过截止时间仍未完成时抛出ProgressTimeoutError，而不是静默返回。
+
+OperationHandle在后台线程中等待部署/删除完成（见ProjectManager.deploy_async），调用者
+可同时准备链路配置、上传文件等，之后再调用wait()：
+
+    handle = project_manager.deploy_async("p1", topo)
+    ...                     # 部署进行中
+    handle.progress()       # 35.0
+    handle.wait(timeout=600)
+'''
+
+
+class ProgressEvent(object):
+    '''一次进度事件
+
+    Attributes:
+        project(str): 项目名
+        usage(str): 进度条类型，"deploy"或"delete"；增量部署为"reconcile"，进度为
+            已完成步骤的比例
+        value(float): 进度值，100表示完成
+        elapsed_s(float): 开始轮询以来的时间（秒）
+        unchanged_s(float): 进度保持当前值的时间（秒）
+        stalled(bool): 进度是否已超过config.progress_stall_s未变化
+        done(bool): 是否已完成
+        eta_s(float): 预计的剩余时间（秒），由历史耗时预测（见history模块），无法
+            估计时为None
+    '''
+    __slots__ = ("project", "usage", "value", "elapsed_s", "unchanged_s",
+        "stalled", "done", "eta_s")
+
+    def __init__(self, project, usage, value, elapsed_s, unchanged_s=0,
+            stalled=False):
+        self.project = project
+        self.usage = usage
+        self.value = value
+        self.elapsed_s = elapsed_s
+        self.unchanged_s = unchanged_s
+        self.stalled = stalled
+        self.done = value >= 100
+        self.eta_s = None
+
+    def __str__(self):
+        text = f"{self.usage} {self.project}: {self.value}% after " \
+            f"{self.elapsed_s:.1f}s"
+        if self.stalled:
+            text += f" (no progress for {self.unchanged_s:.0f}s)"
+        if self.eta_s is not None and not self.done:
+            text += f", about {self.eta_s:.0f}s left"
+        return text
+
+    def __repr__(self):
+        return (f"ProgressEvent({self.project!r}, {self.usage!r}, "
+            f"{self.value!r}, elapsed_s={self.elapsed_s:.1f})")
+
+
+def watch_progress(poll, project_name, usage="deploy", timeout_s=None,
+        min_interval_s=None, max_interval_s=None, stall_s=None, stop=None):
+    '''轮询进度直至完成
+
+    Args:
+        poll(callable): 无参数，返回当前进度值（0~100）的函数
+        project_name(str): 项目名，用于事件及异常信息
+        usage(str): 进度条类型，"deploy"或"delete"
+        timeout_s(float): 截止时间（秒），默认为None，即不限
+        min_interval_s(float): 最小轮询间隔（秒），默认为config.progress_poll_min_s
+        max_interval_s(float): 最大轮询间隔（秒），默认为config.progress_poll_max_s
+        stall_s(float): 进度多久未变化视为停滞（秒），默认为config.progress_stall_s
+        stop(threading.Event): 被设置后立即停止轮询（迭代结束），默认为None
+
+    Yields:
+        ProgressEvent对象：第一次轮询、进度变化、开始停滞及完成时各返回一个
+
+    Raises:
+        ProgressTimeoutError: 当超过截止时间仍未完成时，触发此异常
+    '''
+    if min_interval_s is None:
+        min_interval_s = getattr(config, "progress_poll_min_s", 1)
+    if max_interval_s is None:
+        max_interval_s = getattr(config, "progress_poll_max_s", 10)
+    if stall_s is None:
+        stall_s = getattr(config, "progress_stall_s", 120)
+    backoff = getattr(config, "progress_poll_backoff", 1.5)
+    max_interval_s = max(min_interval_s, max_interval_s)
+
+    started_at = time.monotonic()
+    deadline = None if timeout_s is None else started_at + timeout_s
+    interval_s = min_interval_s
+    last_value, changed_at, stall_reported = None, started_at, False
+    while True:
+        value = poll()
+        now = time.monotonic()
+        if value != last_value:
+            last_value, changed_at, stall_reported = value, now, False
+            interval_s = min_interval_s
+            yield ProgressEvent(project_name, usage, value, now - started_at)
+        else:
+            interval_s = min(interval_s * backoff, max_interval_s)
+            if not stall_reported and now - changed_at >= stall_s:
+                stall_reported = True
+                yield ProgressEvent(project_name, usage, value,
+                    now - started_at, now - changed_at, stalled=True)
+        if value >= 100:
+            return
+
+        now = time.monotonic()
+        if deadline is not None and now >= deadline:
+            raise ProgressTimeoutError(project_name, usage, value,
+                now - started_at, now - changed_at)
+        interval_s = (interval_s if deadline is None
+            else min(interval_s, deadline - now))
+        if stop is None:
+            time.sleep(interval_s)
+        elif stop.wait(interval_s):
+            return
+
+
+def milestones(callback, step=25):
+    '''只转发越过整step进度、开始停滞及完成的事件，用于向界面或大模型汇报进度
+
+    Args:
+        callback(callable): 接收ProgressEvent的函数
+        step(float): 汇报的进度间隔，默认为25，即0、25、50、75、100
+
+    Returns:
+        接收ProgressEvent的函数，可作为deploy/destroy的on_progress参数
+    '''
+    reported = [-1]
+
+    def on_progress(event):
+        level = event.value // step
+        if event.done or event.stalled or level > reported[0]:
+            reported[0] = max(reported[0], level)
+            callback(event)
+    return on_progress
+
+
+class OperationHandle(object):
+    '''在后台线程中进行的部署/删除等操作
+
+    后端没有中止部署/删除的接口，cancel()只会停止在本地等待（及轮询），已提交的操作
+    仍会在后端继续进行。
+
+    Attributes:
+        project(str): 项目名
+        usage(str): 操作类型，如"deploy"、"delete"、"reconcile"
+        last_event(ProgressEvent): 最近一次的进度事件，尚未查询到进度时为None
+    '''
+    def __init__(self, project, usage, target, on_progress=None):
+        '''
+        Args:
+            project(str): 项目名
+            usage(str): 操作类型
+            target(callable): 在后台线程中执行的函数，参数为(接收ProgressEvent的函数,
+                threading.Event)，后者被设置时应尽快返回
+            on_progress(callable): 每个ProgressEvent都会传给此函数，默认为None
+        '''
+        self.project = project
+        self.usage = usage
+        self.last_event = None
+        self._target = target
+        self._on_progress = on_progress
+        self._stop = threading.Event()
+        self._finished = threading.Event()
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run,
+            name=f"{usage}-{project}", daemon=True)
+        self._thread.start()
+
+    def _report(self, event):
+        self.last_event = event
+        if self._on_progress is not None:
+            self._on_progress(event)
+
+    def _run(self):
+        try:
+            self._result = self._target(self._report, self._stop)
+            if self._stop.is_set() and not (self.last_event is not None
+                    and self.last_event.done):
+                self._error = CancelledError(f"stopped waiting for "
+                    f"{self.usage} {self.project}")
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._finished.set()
+
+    def progress(self):
+        '''最近一次查询到的进度值（0~100），尚未查询到时为0'''
+        return 0.0 if self.last_event is None else self.last_event.value
+
+    def done(self):
+        '''操作是否已结束（成功、失败或已取消）'''
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        '''等待操作结束
+
+        Args:
+            timeout(float): 最长等待时间（秒），默认为None，即一直等待
+
+        Returns:
+            操作的结果：部署/删除为最后的ProgressEvent，增量部署为ReconcilePlan
+
+        Raises:
+            TimeoutError: 当timeout内操作未结束时，触发此异常，操作仍在继续
+            CancelledError: 当已调用cancel()时，触发此异常
+            以及操作本身的异常，如ProgressTimeoutError、ReconcileError
+        '''
+        if not self._finished.wait(timeout):
+            raise TimeoutError(f"{self.usage} {self.project} is still running "
+                f"after {timeout}s, progress is {self.progress()}%")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def cancel(self):
+        '''停止等待操作结束，之后wait()会触发CancelledError
+
+        Returns:
+            操作尚未结束时返回True，否则返回False
+        '''
+        if self._finished.is_set():
+            return False
+        self._stop.set()
+        return True
+
+    def __repr__(self):
+        state = "done" if self.done() else f"{self.progress()}%"
+        return f"OperationHandle({self.usage!r}, {self.project!r}, {state})"
@@ -1,5 +1,16 @@
+import copy
 import time
-from .common import Manager, Topo
+from . import config
+from .common import Manager, Topo, TopoValidationError, codec
+from .common.cache import project_snapshots
+from .common.transport import prepare_json_body
+from .layout import auto_layout
+from .node import NodeManager
+from .link import LinkManager
+from .reconcile import diff_topo, plan_reconcile, apply_plan
+from .staged import plan_staged
+from .progress import watch_progress, OperationHandle, ProgressEvent
+from .common.history import deploy_history, topo_shape, DeployTimer
 
 class ProjectManager(Manager):
     '''项目管理类
@@ -15,40 +26,39 @@ class ProjectManager(Manager):
         super().__init__(backend_ip, backend_port)
         self.user = user_name
 
-    def deploy(self, project_name, topo, quiet=False, timeout_min=30,
-        pool_interval_s=1):
+    def deploy(self, project_name, topo, quiet=False, timeout_min=None,
+        pool_interval_s=None, on_progress=None):
         '''创建项目，即向后台创建拓扑。
 
         拓扑的创建意味着一个项目的建立。创建项目的过程为：向后台发送异步拓扑创建请求，
-        此时后端会立即返回请求结果；之后，本方法会持续请求进度条API并默认打印进度，
-        直至进度为100%，则认为拓扑创建成功。本拓扑创建方法为推荐方法。
+        此时后端会立即返回请求结果；之后，本方法会持续请求进度条API（见watch_progress，
+        轮询间隔随进度是否变化自适应调整）并默认打印进度，直至进度为100%，则认为拓扑
+        创建成功。本拓扑创建方法为推荐方法。
 
         Args:
             project_name(str): 项目名
             topo(Topo): Topo对象。请注意在传入Topo对象前使用Topo对象的add_node和add_link
-                方法设计拓扑
-            quiet(bool): 默认为False。若为False，则将打印进度；否则将关闭打印
-            timeout_min(int): 超时时间（分钟）。默认为30分钟
-            pool_interval_s(int): 轮询进度条API的间隔（秒）
-
-        
-        '''
-        start_time = time.time()
-        duration_s = 0
-
-        self.async_deploy(project_name, topo)
-        
-        while duration_s <= timeout_min * 60:
-            progress_value = self._get_progress(project_name, usage="deploy")
-            if not quiet:
-                print(f"Deployment progress: {progress_value} %")
-            if progress_value == 100:
-                break
-            duration_s = time.time() - start_time
-            time.sleep(pool_interval_s)
-
-    def destroy(self, project_name, quiet=False, timeout_min=30,
-            pool_interval_s=1):
+                方法设计拓扑。若有节点坐标重叠（如均未指定坐标），将自动计算布局并写入
+                topo，可通过config.auto_layout关闭
+            quiet(bool): 默认为False。若为False，则在进度变化时打印进度；否则将关闭打印
+            timeout_min(float): 超时时间（分钟），默认为None，即按历史耗时预测（见
+                predict_duration），没有历史记录时为config.deploy_default_timeout_min
+            pool_interval_s(float): 轮询进度条API的最小间隔（秒），默认为
+                config.progress_poll_min_s
+            on_progress(callable): 每个ProgressEvent都会传给此函数，默认为None
+
+        Raises:
+            TopoValidationError: 当拓扑校验（Topo.validate）有错误时，触发此异常，
+                此时不会向后端发送任何请求
+            ProgressTimeoutError: 当超过timeout_min仍未部署完成时，触发此异常
+        '''
+        timer = self._start_timer(project_name, "deploy", topo)
+        self._submit_timed(timer, self.async_deploy, project_name, topo)
+        self._wait_progress(project_name, "deploy", quiet, timeout_min,
+            pool_interval_s, on_progress, timer=timer)
+
+    def destroy(self, project_name, quiet=False, timeout_min=None,
+            pool_interval_s=None, on_progress=None):
         '''删除项目
 
         包含拓扑、网络实验监控服务、流量服务等该项目相关的所有内容。
@@ -58,26 +68,340 @@ class ProjectManager(Manager):
 
         Args:
             project_name(str): 项目名
-            quiet(bool): 默认为False。若为False，则将打印进度；否则将关闭打印。
-            timeout_min(int): 超时时间（分钟）。默认为30分钟。
-            pool_interval_s(int): 轮询进度条API的间隔（秒）
+            quiet(bool): 默认为False。若为False，则在进度变化时打印进度；否则将关闭打印。
+            timeout_min(float): 超时时间（分钟），默认为None，即按历史耗时预测（见
+                predict_duration），没有历史记录时为config.deploy_default_timeout_min
+            pool_interval_s(float): 轮询进度条API的最小间隔（秒），默认为
+                config.progress_poll_min_s
+            on_progress(callable): 每个ProgressEvent都会传给此函数，默认为None
 
         Returns:
             None
+
+        Raises:
+            ProgressTimeoutError: 当超过timeout_min仍未删除完成时，触发此异常
+        '''
+        timer = self._start_timer(project_name, "delete")
+        self._submit_timed(timer, self.async_destroy, project_name)
+        self._wait_progress(project_name, "delete", quiet, timeout_min,
+            pool_interval_s, on_progress, timer=timer)
+
+    def deploy_async(self, project_name, topo, timeout_min=None,
+            pool_interval_s=None, on_progress=None):
+        '''创建项目，但不等待部署完成。
+
+        拓扑校验与创建请求在本方法中同步完成（失败时直接触发异常），之后在后台线程中
+        轮询进度，调用者可在部署期间做其它准备工作，再通过返回的OperationHandle查询
+        进度或等待完成。
+
+        Args:
+            project_name(str): 项目名
+            topo(Topo): Topo对象，同deploy
+            timeout_min(float): 超时时间（分钟），默认同deploy。超时后handle.wait()
+                触发ProgressTimeoutError
+            pool_interval_s(float): 轮询进度条API的最小间隔（秒），默认为
+                config.progress_poll_min_s
+            on_progress(callable): 每个ProgressEvent都会传给此函数（在后台线程中调用），
+                默认为None
+
+        Returns:
+            OperationHandle对象，wait()返回最后的ProgressEvent
+
+        Raises:
+            TopoValidationError: 当拓扑校验有错误时，触发此异常，此时不会向后端发送
+                任何请求
+        '''
+        timer = self._start_timer(project_name, "deploy", topo)
+        self._submit_timed(timer, self.async_deploy, project_name, topo)
+        return OperationHandle(project_name, "deploy",
+            lambda report, stop: self._wait_progress(project_name, "deploy",
+                True, timeout_min, pool_interval_s, report, stop, timer),
+            on_progress)
+
+    def destroy_async(self, project_name, timeout_min=None,
+            pool_interval_s=None, on_progress=None):
+        '''删除项目，但不等待删除完成。
+
+        删除请求在本方法中同步发送，之后在后台线程中轮询进度，见deploy_async。
+
+        Args:
+            project_name(str): 项目名
+            timeout_min(float): 超时时间（分钟），默认同destroy
+            pool_interval_s(float): 轮询进度条API的最小间隔（秒），默认为
+                config.progress_poll_min_s
+            on_progress(callable): 每个ProgressEvent都会传给此函数（在后台线程中调用），
+                默认为None
+
+        Returns:
+            OperationHandle对象，wait()返回最后的ProgressEvent
+        '''
+        timer = self._start_timer(project_name, "delete")
+        self._submit_timed(timer, self.async_destroy, project_name)
+        return OperationHandle(project_name, "delete",
+            lambda report, stop: self._wait_progress(project_name, "delete",
+                True, timeout_min, pool_interval_s, report, stop, timer),
+            on_progress)
+
+    def reconcile_async(self, project_name, topo, max_concurrency=None,
+            on_progress=None):
+        '''在后台线程中进行增量部署（见reconcile）。
+
+        cancel()后当前一轮仍会执行完毕，之后的轮次不再执行。
+
+        Args:
+            project_name(str): 项目名，项目需已创建
+            topo(Topo): 期望的Topo对象
+            max_concurrency(int): 同时执行的步骤数上限，默认为config.pool_maxsize
+            on_progress(callable): 每轮结束后传入一个usage为"reconcile"的
+                ProgressEvent（在后台线程中调用），默认为None
+
+        Returns:
+            OperationHandle对象，wait()返回ReconcilePlan，失败时触发ReconcileError等
+        '''
+        return OperationHandle(project_name, "reconcile",
+            lambda report, stop: self.reconcile(project_name, topo, quiet=True,
+                max_concurrency=max_concurrency, on_progress=report,
+                stop=stop),
+            on_progress)
+
+    def watch_progress(self, project_name, usage="deploy", timeout_min=30,
+            pool_interval_s=None, stop=None):
+        '''以迭代器的形式查看部署/删除进度
+
+        只在第一次查询、进度变化、开始停滞及完成时返回事件，轮询间隔在进度未变化时
+        逐渐增大（见config.progress_poll_min_s/progress_poll_max_s）。
+
+        Args:
+            project_name(str): 项目名
+            usage(str): 进度条类型，"deploy"或"delete"
+            timeout_min(float): 超时时间（分钟），为None时不限
+            pool_interval_s(float): 轮询进度条API的最小间隔（秒），默认为
+                config.progress_poll_min_s
+            stop(threading.Event): 被设置后立即停止轮询，默认为None
+
+        Returns:
+            ProgressEvent对象的迭代器
+
+        Raises:
+            ProgressTimeoutError: 当超过timeout_min仍未完成时，在迭代中触发此异常
+        '''
+        return watch_progress(
+            lambda: self._get_progress(project_name, usage=usage),
+            project_name, usage,
+            timeout_s=None if timeout_min is None else timeout_min * 60,
+            min_interval_s=pool_interval_s, stop=stop)
+
+    def _wait_progress(self, project_name, usage, quiet, timeout_min,
+            pool_interval_s, on_progress, stop=None, timer=None):
+        label = "Deployment" if usage == "deploy" else "Destruction"
+        if timer is not None:
+            timer.submitted()
+            if timeout_min is None:
+                timeout_min = timer.timeout_min()
+        if timeout_min is None:
+            timeout_min = getattr(config, "deploy_default_timeout_min", 30)
+        event, error = None, None
+        try:
+            for event in self.watch_progress(project_name, usage, timeout_min,
+                    pool_interval_s, stop):
+                if timer is not None:
+                    timer.observe(event)
+                if not quiet:
+                    print(f"{label} progress: {event.value} %" + (
+                        f" (no progress for {event.unchanged_s:.0f}s)"
+                        if event.stalled else ""))
+                if on_progress is not None:
+                    on_progress(event)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # 部署/删除过程中项目文档持续变化，结束后重新以后端为准
+            self._invalidate_project_snapshot(self.user, project_name)
+            if timer is not None:
+                timer.finish(error)
+        return event
+
+    def _start_timer(self, project_name, usage, topo=None):
+        '''在提交请求前开始计时
+
+        删除时不为计时另外查询项目：以缓存的项目快照作为规模，没有缓存时沿用该项目
+        最近一次部署记录的规模
+        '''
+        if topo is None:
+            topo = project_snapshots.get((self.url, self.user, project_name))
+        if topo is None:
+            shape = deploy_history.last_shape(self.url, self.user,
+                project_name)
+        else:
+            shape = topo_shape(topo)
+        return DeployTimer(deploy_history, self.url, self.user, project_name,
+            usage, shape)
+
+    def _submit_timed(self, timer, submit, *args):
+        '''发送创建/删除请求，失败（含校验失败）时结束计时，失败也记入历史'''
+        try:
+            submit(*args)
+        except BaseException as e:
+            timer.finish(e)
+            raise
+
+    def predict_duration(self, topo, usage="deploy"):
+        '''按本机记录的该后端历史耗时，预测部署/删除topo所需的时间
+
+        每次deploy/destroy都会记录耗时（见history模块及config.record_deploy_history），
+        预测值同时用作默认超时时间（config.deploy_timeout_factor倍）及进度事件的剩余
+        时间（ProgressEvent.eta_s）。
+
+        Args:
+            topo(Topo or dict): Topo对象或拓扑字典
+            usage(str): 操作类型，"deploy"或"delete"
+
+        Returns:
+            预测的耗时（秒），没有历史记录时为None
         '''
-        start_time = time.time()
-        duration_s = 0
+        return deploy_history.predict(topo, self.url, usage)
+
+    def reconcile(self, project_name, topo, dry_run=False, quiet=False,
+            max_concurrency=None, on_progress=None, stop=None):
+        '''增量部署：只将topo与已创建项目的差异应用到项目中。
 
-        self.async_destroy(project_name)
-        
-        while duration_s <= timeout_min * 60:
-            progress_value = self._get_progress(project_name, usage="delete")
-            if not quiet:
-                print(f"Destruction progress: {progress_value} %")
-            if progress_value == 100:
-                break
-            duration_s = time.time() - start_time
-            time.sleep(pool_interval_s)
+        比较topo与项目当前的拓扑（节点、链路、接口地址、资源限制及链路配置），生成由
+        动态增删节点/链路及链路配置组成的执行计划，按“删除链路、删除节点、添加节点、
+        添加链路、配置链路”的顺序分轮执行，同一轮中的步骤并发执行。只有一条链路不同
+        时，只会删除并重新添加这一条链路，而不必删除整个项目后重新创建。
+
+        Args:
+            project_name(str): 项目名，项目需已创建
+            topo(Topo): 期望的Topo对象。若有节点坐标重叠，将自动计算布局并写入topo，
+                可通过config.auto_layout关闭
+            dry_run(bool): 默认为False。若为True，则只打印执行计划，不做任何修改
+            quiet(bool): 默认为False。若为False，则每轮结束后打印进度
+            max_concurrency(int): 同时执行的步骤数上限，默认为config.pool_maxsize
+            on_progress(callable): 每轮结束后传入一个usage为"reconcile"的
+                ProgressEvent，默认为None
+            stop(threading.Event): 被设置后不再开始新的轮次，默认为None
+
+        Returns:
+            ReconcilePlan对象，即执行（或将要执行）的计划
+
+        Raises:
+            VemuExecError: 当项目不存在时，触发此异常
+            TopoValidationError: 当拓扑校验有错误时，触发此异常，此时项目不会被修改
+            ReconcileError: 当某一轮中有步骤失败时，在该轮结束后触发此异常，之后的轮次
+                不再执行
+        '''
+        self._prepare_topo(topo)
+        # 以后端的最新状态为准
+        self._invalidate_project_snapshot(self.user, project_name)
+        remote = self._get_project_snapshot(self.user, project_name)
+        plan = plan_reconcile(diff_topo(topo, remote))
+        if dry_run:
+            print(plan)
+            return plan
+
+        node_manager = NodeManager(self.user, project_name, self.backend_ip,
+            self.backend_port)
+        link_manager = LinkManager(self.user, project_name, self.backend_ip,
+            self.backend_port)
+        try:
+            apply_plan(plan, node_manager, link_manager,
+                max_concurrency=max_concurrency, quiet=quiet,
+                on_progress=on_progress, stop=stop)
+        finally:
+            self._invalidate_project_snapshot(self.user, project_name)
+        return plan
+
+    def deploy_staged(self, project_name, topo, batch_size=None, core=None,
+            dry_run=False, quiet=False, timeout_min=None, pool_interval_s=None,
+            max_concurrency=None, retries=None, on_progress=None):
+        '''分批创建项目，用于上万个节点的大规模拓扑。
+
+        先以一次创建请求部署核心（见staged模块及plan_staged），之后各批次依次以动态
+        添加节点/链路的方式加入项目，同一批次的节点及链路分轮并发添加，失败的元素逐个
+        重试。与deploy相比，每个批次完成后都有进度反馈，单个元素失败也不必整体重来。
+
+        Args:
+            project_name(str): 项目名
+            topo(Topo): 完整的Topo对象。若有节点坐标重叠，将自动计算布局并写入topo
+            batch_size(int): 每批的节点数上限，默认为config.staged_batch_nodes
+            core(list): 核心节点名，默认为不与主机直接相连的交换机/路由器等
+            dry_run(bool): 默认为False。若为True，则只打印分批计划，不做任何修改
+            quiet(bool): 默认为False。若为False，则每个批次完成后打印进度
+            timeout_min(float): 核心部署的超时时间（分钟），默认同deploy
+            pool_interval_s(float): 轮询进度条API的最小间隔（秒），默认为
+                config.progress_poll_min_s
+            max_concurrency(int): 同时添加的节点/链路数上限，默认为config.pool_maxsize
+            retries(int): 失败的节点/链路逐个重试的次数，默认为config.staged_retries
+            on_progress(callable): 接收ProgressEvent的函数，进度为已部署的元素（节点、
+                链路及链路配置）占全部元素的比例，默认为None
+
+        Returns:
+            StagedPlan对象
+
+        Raises:
+            TopoValidationError: 当拓扑校验有错误时，触发此异常，此时不会向后端发送
+                任何请求
+            ProgressTimeoutError: 当核心部署超时时，触发此异常
+            ReconcileError: 当某一批次中有元素重试后仍失败时，触发此异常。已添加的
+                部分保留在项目中，可调用reconcile补齐
+        '''
+        self._prepare_topo(topo)
+        staged = plan_staged(topo, batch_size, core)
+        if dry_run:
+            print(staged)
+            return staged
+        if retries is None:
+            retries = getattr(config, "staged_retries", 2)
+
+        core_topo = staged.core_topo()
+        plans = staged.stage_plans()
+        # 核心的节点数与链路数之和
+        core_size = sum(len(elements)
+            for elements in core_topo.dictform().values())
+        total = core_size + sum(len(plan) for plan in plans) or 1
+        started_at = time.monotonic()
+
+        def report(done, elapsed_s):
+            if on_progress is not None:
+                on_progress(ProgressEvent(project_name, "deploy",
+                    round(100 * done / total, 1), elapsed_s))
+
+        self.deploy(project_name, core_topo, quiet=True,
+            timeout_min=timeout_min, pool_interval_s=pool_interval_s,
+            on_progress=lambda event: report(
+                core_size * event.value / 100, event.elapsed_s))
+        if not quiet:
+            print(f"Staged deployment: core ({len(staged.core)} nodes) done, "
+                f"{len(plans)} batch(es) to add")
+
+        node_manager = NodeManager(self.user, project_name, self.backend_ip,
+            self.backend_port)
+        link_manager = LinkManager(self.user, project_name, self.backend_ip,
+            self.backend_port)
+        done = core_size
+        try:
+            for index, (batch, plan) in enumerate(zip(staged.batches, plans), 1):
+                done += apply_plan(plan, node_manager, link_manager,
+                    max_concurrency=max_concurrency, quiet=True,
+                    retries=retries)
+                report(done, time.monotonic() - started_at)
+                if not quiet:
+                    print(f"Staged deployment: batch {index}/{len(plans)} "
+                        f"({len(batch)} nodes) done, {100 * done / total:.1f} %")
+        finally:
+            self._invalidate_project_snapshot(self.user, project_name)
+        return staged
+
+    def _prepare_topo(self, topo):
+        '''提交前校验拓扑并自动布局，校验有错误时不发送任何请求'''
+        if getattr(config, "validate_before_deploy", True):
+            report = topo.validate()
+            if not report.ok:
+                raise TopoValidationError(report)
+        # 节点坐标重叠（如均未指定坐标）时，提交前自动布局
+        if getattr(config, "auto_layout", True):
+            auto_layout(topo)
 
     def async_deploy(self, project_name, topo):
         '''向后台发送异步拓扑创建请求，令后台开始创建拓扑。
@@ -85,15 +409,34 @@ class ProjectManager(Manager):
         Args:
             project_name(str): 项目名
             topo(Topo): Topo对象。请注意在传入Topo对象前使用Topo对象的add_node和add_link
-                方法设计拓扑
+                方法设计拓扑。若有节点坐标重叠（如均未指定坐标），将自动计算布局并写入
+                topo，可通过config.auto_layout关闭
 
         Returns:
             None
+
+        Raises:
+            TopoValidationError: 当拓扑校验有错误时，触发此异常
         '''
-        payload = {"user": self.user, "topo": project_name,
-            "networks": topo.dictform()}
-        resp = self._post("/master/topo/", json=payload)
-        self._check_resp_code(self._parse_resp(resp))
+        self._prepare_topo(topo)
+        self._submit_deploy(project_name, codec.dumps(topo.dictform()))
+
+    def _submit_deploy(self, project_name, networks):
+        '''发送拓扑创建请求，不校验、不布局
+
+        Args:
+            project_name(str): 项目名
+            networks(bytes): 以codec.dumps编码的拓扑字典。多个项目共用一个拓扑时只需
+                编码一次（见deploy_projects）
+        '''
+        body = b"".join((b'{"user":', codec.dumps(self.user), b',"topo":',
+            codec.dumps(project_name), b',"networks":', networks, b"}"))
+        data, headers = prepare_json_body(body)
+        try:
+            resp = self._post("/master/topo/", data=data, headers=headers)
+            self._check_resp_code(self._parse_resp(resp))
+        finally:
+            self._invalidate_project_snapshot(self.user, project_name)
 
     def async_destroy(self, project_name):
         '''向后台发送异步拓扑删除请求，令后台开始删除拓扑。
@@ -105,8 +448,11 @@ class ProjectManager(Manager):
             None
         '''
         payload = {"user": self.user, "topo": project_name}
-        resp = self._delete("/master/topo/", json=payload)
-        self._check_resp_code(self._parse_resp(resp))
+        try:
+            resp = self._delete("/master/topo/", json=payload)
+            self._check_resp_code(self._parse_resp(resp))
+        finally:
+            self._invalidate_project_snapshot(self.user, project_name)
 
     def _get_progress(self, project_name, usage="deploy"):
         '''请求后端进度条API。
@@ -119,7 +465,9 @@ class ProjectManager(Manager):
             一个float类型的变量，其值代表了进度值。100代表进度为100%
         '''
         payload = {"user": self.user, "topo": project_name, "usage": usage}
-        resp = self._post("/master/process_bar/", json=payload)
+        # 查询进度不会改变后端状态，可安全重试
+        resp = self._post("/master/process_bar/", json=payload,
+            idempotent=True)
         resp_json = self._parse_resp(resp)
         self._check_resp_code(resp_json)
 
@@ -135,11 +483,12 @@ class ProjectManager(Manager):
             Topo对象
         '''
         resp = self._get(f"/re/project/{project_name}/",
-            params={"user": self.user})
+            params={"user": self.user}, project=(self.user, project_name))
         resp_json = self._parse_resp(resp)
         self._check_resp_code(resp_json)
 
-        return Topo(**resp_json["project"]["topo"])
+        # 合并的GET请求会共享解析后的json，拷贝后再交给用户修改
+        return Topo(**copy.deepcopy(resp_json["project"]["topo"]))
 
     def deploy_with_topo_description_dict(self, project_name,
                                         topo_description_dict):
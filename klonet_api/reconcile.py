@@ -0,0 +1,523 @@
+import copy
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from . import config
+from .common import Image, Node, LinkConfiguration, ReconcileError
+from .common.transport import ensure_pool_size
+from .progress import ProgressEvent
+
+
+'''增量部署
+
+比较本地的Topo对象（期望状态）与已创建项目的拓扑（当前状态），只把差异转换为动态
+增删节点/链路及链路配置的调用，而不必删除整个项目后重新创建。
+
+比较的内容：
+- 节点：新增、删除；镜像（type、subtype、image_name）、资源限制或指定的宿主机不同
+  时，删除后重新添加该节点（及与其相连的链路）。坐标不参与比较。
+- 链路：新增、删除；两端节点或两端地址（即节点的接口）不同时，删除后重新添加。
+- 接口：不属于上述新增、删除或重新添加的链路的接口（如删除链路后残留在项目中的
+  接口）不同时，整体写入本地节点的接口列表。
+- 链路配置：链路两端的config（带宽、时延等）不同时，重新配置或清除配置。项目中
+  链路的config不会随config_link更新，因此本地配置不为空的链路每次都会重新配置
+  （重复配置的结果相同）。
+
+执行计划分为若干轮，轮与轮之间按以下顺序进行，同一轮中的步骤互不依赖，并发执行：
+删除链路 -> 删除节点 -> 添加节点 -> 添加链路 -> 修改节点接口 -> 配置链路。删除/添加链路时
+会整体写入端点的接口列表，因此同一节点上配置了地址的链路会被分到不同的轮次中。
+'''
+
+#: tuple: 计划中的动作，按执行顺序排列
+PLAN_ACTIONS = ("delete_link", "delete_node", "add_node", "add_link",
+    "update_node", "config_link", "clear_link")
+
+# 节点比较的属性，任一不同都需要重新创建节点
+_NODE_IMAGE_FIELDS = ("type", "subtype", "image_name")
+
+# Topo中链路config的键 -> LinkConfiguration的键
+_LINK_CONFIG_KEYS = {"bw_kbit": "bw_kbps", "queue_size_byte": "queue_size_bytes",
+    "delay_us": "delay_us", "loss_rate": "loss", "jitter_us": "jitter_us",
+    "correlation": "correlation", "delay_distribution": "delay_distribution"}
+
+
+def _topo_dict(topo):
+    '''Topo对象或拓扑字典 -> 拓扑字典'''
+    return topo.dictform() if hasattr(topo, "dictform") else topo
+
+def _node_dicts(topo_dict):
+    '''节点名 -> 节点字典'''
+    nodes = {}
+    for category, elements in topo_dict.items():
+        if category == "links" or not isinstance(elements, dict):
+            continue
+        nodes.update(elements)
+    return nodes
+
+def _resource_limit(node_dict):
+    '''去掉未指定的项，数值统一为字符串'''
+    return {key: str(value)
+        for key, value in (node_dict.get("resource_limit") or {}).items()
+        if value not in (None, "")}
+
+def _worker(node_dict):
+    return (node_dict.get("config") or {}).get("worker_specified") or ""
+
+def _node_changes(local, remote):
+    '''返回需要重新创建节点的原因列表，本地未指定的资源限制及宿主机不参与比较'''
+    changes = [field for field in _NODE_IMAGE_FIELDS
+        if local.get(field) != remote.get(field)]
+    resource_limit = _resource_limit(local)
+    if resource_limit and resource_limit != _resource_limit(remote):
+        changes.append("resource_limit")
+    if _worker(local) and _worker(local) != _worker(remote):
+        changes.append("worker_specified")
+    return changes
+
+def _link_addresses(link_dict):
+    '''节点名 -> 该端的地址'''
+    return {link_dict["source"]: link_dict.get("sourceIP") or "",
+        link_dict["target"]: link_dict.get("targetIP") or ""}
+
+def _link_nics(link_names, links):
+    '''链路在两端节点上的接口名'''
+    nics = set()
+    for name in link_names:
+        link_dict = links[name]
+        nics.add(f"{link_dict['source']}{link_dict['target']}")
+        nics.add(f"{link_dict['target']}{link_dict['source']}")
+    return nics
+
+def _interfaces(node_dict, skip=()):
+    '''节点的接口，去掉skip中的接口名，用于比较'''
+    return sorted((nic.get("name") or "", nic.get("ip") or "",
+            nic.get("netmask") or "")
+        for nic in node_dict.get("interfaces") or []
+        if nic.get("name") not in skip)
+
+def _link_end_config(end_config):
+    '''去掉未配置的项；除时延分布外均未配置时，视为未配置'''
+    end_config = {key: str(value) for key, value in (end_config or {}).items()
+        if value not in (None, "")}
+    if not set(end_config) - {"delay_distribution"}:
+        return {}
+    return end_config
+
+def _link_config(link_dict):
+    '''节点名 -> 该端的链路配置，两端均未配置时返回{}'''
+    config_dict = link_dict.get("config") or {}
+    ends = {link_dict["source"]: _link_end_config(config_dict.get("source")),
+        link_dict["target"]: _link_end_config(config_dict.get("target"))}
+    return ends if any(ends.values()) else {}
+
+
+class TopoDiff(object):
+    '''本地拓扑与项目拓扑的差异
+
+    Attributes:
+        local(dict): 本地拓扑字典（期望状态）
+        remote(dict): 项目的拓扑字典（当前状态）
+        added_nodes(list): 只在本地存在的节点名
+        removed_nodes(list): 只在项目中存在的节点名
+        changed_nodes(dict): 需要重新创建的节点名 -> 不同的属性列表
+        added_links(list): 只在本地存在的链路名
+        removed_links(list): 只在项目中存在的链路名
+        changed_links(dict): 需要重新创建的链路名 -> 原因列表，可能的原因为
+            "endpoints"（两端节点不同）、"addresses"（两端地址不同）、
+            "node_recreated"（端点节点被重新创建）
+        config_links(list): 链路配置需要更新（含清除）的链路名，包括新增及重新创建的
+            链路中配置不为空的链路
+        changed_interfaces(list): 接口需要整体写入的节点名，不含属于新增、删除及重新
+            创建的链路的接口
+    '''
+    def __init__(self, local, remote):
+        self.local = local
+        self.remote = remote
+        local_nodes, remote_nodes = _node_dicts(local), _node_dicts(remote)
+        local_links, remote_links = local["links"], remote["links"]
+
+        self.added_nodes = [name for name in local_nodes
+            if name not in remote_nodes]
+        self.removed_nodes = [name for name in remote_nodes
+            if name not in local_nodes]
+        self.changed_nodes = {}
+        for name, node_dict in local_nodes.items():
+            if name in remote_nodes:
+                changes = _node_changes(node_dict, remote_nodes[name])
+                if changes:
+                    self.changed_nodes[name] = changes
+
+        self.added_links = [name for name in local_links
+            if name not in remote_links]
+        self.removed_links = [name for name in remote_links
+            if name not in local_links]
+        self.changed_links = {}
+        self.config_links = []
+        for name, link_dict in local_links.items():
+            if name not in remote_links:
+                if _link_config(link_dict):
+                    self.config_links.append(name)
+                continue
+            remote_link = remote_links[name]
+            changes = []
+            endpoints = {link_dict["source"], link_dict["target"]}
+            if endpoints != {remote_link["source"], remote_link["target"]}:
+                changes.append("endpoints")
+            elif _link_addresses(link_dict) != _link_addresses(remote_link):
+                changes.append("addresses")
+            if endpoints & set(self.changed_nodes):
+                changes.append("node_recreated")
+            if changes:
+                self.changed_links[name] = changes
+                if _link_config(link_dict):
+                    self.config_links.append(name)
+            elif _link_config(link_dict) != _link_config(remote_link):
+                self.config_links.append(name)
+
+        # 新增、删除及重新创建的链路的接口由删除/添加链路维护，其余接口应一致
+        skip = _link_nics(self.added_links + list(self.changed_links),
+            local_links) | _link_nics(self.removed_links
+            + list(self.changed_links), remote_links)
+        self.changed_interfaces = [name for name, node_dict
+            in local_nodes.items() if name in remote_nodes
+            and name not in self.changed_nodes
+            and _interfaces(node_dict, skip)
+                != _interfaces(remote_nodes[name], skip)]
+
+    def __bool__(self):
+        return bool(self.added_nodes or self.removed_nodes or self.changed_nodes
+            or self.added_links or self.removed_links or self.changed_links
+            or self.config_links or self.changed_interfaces)
+
+    def __repr__(self):
+        return (f"TopoDiff(nodes: +{len(self.added_nodes)} "
+            f"-{len(self.removed_nodes)} ~{len(self.changed_nodes)}, "
+            f"links: +{len(self.added_links)} -{len(self.removed_links)} "
+            f"~{len(self.changed_links)}, configs: {len(self.config_links)}, "
+            f"interfaces: {len(self.changed_interfaces)})")
+
+
+class PlanStep(object):
+    '''执行计划中的一个步骤
+
+    Attributes:
+        action(str): 动作，PLAN_ACTIONS之一
+        name(str): 节点名或链路名
+        detail(str): 便于阅读的说明
+    '''
+    __slots__ = ("action", "name", "detail")
+
+    def __init__(self, action, name, detail=""):
+        self.action = action
+        self.name = name
+        self.detail = detail
+
+    def __str__(self):
+        return f"{self.action} {self.name}" + (
+            f" ({self.detail})" if self.detail else "")
+
+    def __repr__(self):
+        return f"PlanStep({self.action!r}, {self.name!r})"
+
+
+class ReconcilePlan(object):
+    '''增量部署的执行计划
+
+    Attributes:
+        diff(TopoDiff): 计划所依据的差异
+        waves(list): 各轮的步骤列表，同一轮中的步骤互不依赖
+    '''
+    def __init__(self, diff, waves):
+        self.diff = diff
+        self.waves = waves
+
+    def __iter__(self):
+        for wave in self.waves:
+            yield from wave
+
+    def __len__(self):
+        return sum(len(wave) for wave in self.waves)
+
+    def counts(self):
+        '''各动作的步骤数，如{"add_node": 2, "add_link": 2}'''
+        counts = {}
+        for step in self:
+            counts[step.action] = counts.get(step.action, 0) + 1
+        return counts
+
+    def __str__(self):
+        if not self.waves:
+            return "Nothing to change."
+        counts = ", ".join(f"{action} x{count}"
+            for action, count in self.counts().items())
+        lines = [f"{len(self)} step(s) in {len(self.waves)} wave(s): {counts}"]
+        for index, wave in enumerate(self.waves, 1):
+            lines.append(f"wave {index}:")
+            lines.extend(f"  {step}" for step in wave)
+        return "\n".join(lines)
+
+
+def diff_topo(local, remote):
+    '''比较本地拓扑与项目拓扑
+
+    Args:
+        local(Topo or dict): 本地的Topo对象或拓扑字典（期望状态）
+        remote(Topo or dict): 项目的Topo对象或拓扑字典（当前状态），如
+            ProjectManager.get_topo的返回值
+
+    Returns:
+        TopoDiff对象
+    '''
+    return TopoDiff(_topo_dict(local), _topo_dict(remote))
+
+
+def _addressed_endpoints(link_dict):
+    return [node_name for node_name, cidr in _link_addresses(link_dict).items()
+        if cidr]
+
+def _link_waves(link_names, links):
+    '''将待添加的链路分为若干轮，同一轮中没有两条链路共用需配置地址的端点'''
+    waves, busy = [], []
+    for name in link_names:
+        endpoints = _addressed_endpoints(links[name])
+        for wave, used in zip(waves, busy):
+            if used.isdisjoint(endpoints):
+                break
+        else:
+            wave, used = [], set()
+            waves.append(wave)
+            busy.append(used)
+        wave.append(name)
+        used.update(endpoints)
+    return waves
+
+def _describe_link(link_dict):
+    ends = []
+    for end in ("source", "target"):
+        cidr = link_dict.get(f"{end}IP") or ""
+        ends.append(link_dict[end] + (f" {cidr}" if cidr else ""))
+    return " -- ".join(ends)
+
+def plan_reconcile(diff):
+    '''将差异转换为执行计划
+
+    Args:
+        diff(TopoDiff): diff_topo的返回值
+
+    Returns:
+        ReconcilePlan对象
+    '''
+    local_links, remote_links = diff.local["links"], diff.remote["links"]
+    local_nodes = _node_dicts(diff.local)
+    waves = []
+
+    # 删除的节点及重新创建的节点上的链路也需显式删除，不依赖后端的级联删除
+    gone_nodes = set(diff.removed_nodes) | set(diff.changed_nodes)
+    delete_links = [name for name, link_dict in remote_links.items()
+        if name in diff.removed_links or name in diff.changed_links
+        or {link_dict["source"], link_dict["target"]} & gone_nodes]
+    delete_nodes = [PlanStep("delete_node", name,
+            ", ".join(diff.changed_nodes.get(name, ["removed"])))
+        for name in diff.removed_nodes + list(diff.changed_nodes)]
+    add_nodes = [PlanStep("add_node", name, local_nodes[name].get(
+            "image_name", ""))
+        for name in diff.added_nodes + list(diff.changed_nodes)]
+    # 删除链路时会修改端点的接口列表，同一节点上配置了地址的链路分到不同的轮次中
+    for names in _link_waves(delete_links, remote_links):
+        waves.append([PlanStep("delete_link", name,
+            _describe_link(remote_links[name])) for name in names])
+    for wave in (delete_nodes, add_nodes):
+        if wave:
+            waves.append(wave)
+
+    deleted = set(delete_links)
+    add_links = [name for name in local_links
+        if name not in remote_links or name in deleted]
+    rewritten = set()
+    for names in _link_waves(add_links, local_links):
+        waves.append([PlanStep("add_link", name,
+            _describe_link(local_links[name])) for name in names])
+        for name in names:
+            rewritten.update(_addressed_endpoints(local_links[name]))
+
+    # 添加链路时已整体写入接口的端点不必再写入
+    update_nodes = [PlanStep("update_node", name, "interfaces")
+        for name in diff.changed_interfaces if name not in rewritten]
+    if update_nodes:
+        waves.append(update_nodes)
+
+    config_steps = []
+    for name in diff.config_links:
+        if _link_config(local_links[name]):
+            config_steps.append(PlanStep("config_link", name, "; ".join(
+                f"{node_name}: " + ", ".join(f"{key}={value}"
+                    for key, value in end.items())
+                for node_name, end in _link_config(local_links[name]).items()
+                if end)))
+        else:
+            config_steps.append(PlanStep("clear_link", name))
+    if config_steps:
+        waves.append(config_steps)
+    return ReconcilePlan(diff, waves)
+
+
+class _PlanRunner(object):
+    '''执行单个步骤'''
+    def __init__(self, plan, node_manager, link_manager):
+        self.local = plan.diff.local
+        self.local_nodes = _node_dicts(self.local)
+        self.node_manager = node_manager
+        self.link_manager = link_manager
+        self._lock = threading.Lock()
+        self._remote_nodes = None
+
+    def run(self, step):
+        getattr(self, f"_{step.action}")(step.name)
+
+    def retry(self, step):
+        '''重新执行失败的步骤
+
+        添加节点/链路由多个请求组成（如添加链路后还需写入端点的接口），失败时可能已
+        部分创建，因此先删除后再重新添加。
+        '''
+        discard = {"add_node": self.node_manager.dynamic_delete_node,
+            "add_link": self.link_manager.dynamic_delete_link}.get(step.action)
+        if discard is not None:
+            try:
+                discard(step.name)
+            except Exception:
+                pass # 未创建时删除失败，之后的添加会报告真正的错误
+        self.run(step)
+
+    def _delete_link(self, name):
+        self.link_manager.dynamic_delete_link(name)
+
+    def _delete_node(self, name):
+        self.node_manager.dynamic_delete_node(name)
+
+    def _add_node(self, name):
+        node_dict = copy.deepcopy(self.local_nodes[name])
+        # 接口由之后添加的链路写入
+        node_dict["interfaces"] = []
+        self.node_manager.dynamic_add_node(name, Image(**node_dict),
+            resource_limit=node_dict.get("resource_limit") or None,
+            location={"x": node_dict.get("x", 0), "y": node_dict.get("y", 0)})
+
+    def _remote_node(self, node_name):
+        '''项目中的节点字典（拷贝），保留后端填充的属性'''
+        with self._lock:
+            if self._remote_nodes is None:
+                # 添加链路之前的各轮已完成，项目中的节点即为最终的节点
+                self._remote_nodes = {name: node.dictform() for name, node
+                    in self.node_manager.get_nodes().items()}
+        return copy.deepcopy(self._remote_nodes.get(node_name,
+            self.local_nodes[node_name]))
+
+    def _endpoint(self, node_name, peer_name):
+        '''添加链路所用的端点Node对象
+
+        以项目中的节点为基础，接口列表为本地的接口列表去掉本链路的接口（由
+        dynamic_add_link追加），因此写入后节点的接口即为期望状态。
+        '''
+        node_dict = self._remote_node(node_name)
+        node_dict["interfaces"] = [copy.deepcopy(nic)
+            for nic in self.local_nodes[node_name].get("interfaces", [])
+            if nic.get("name") != f"{node_name}{peer_name}"]
+        return Node(**node_dict)
+
+    def _add_link(self, name):
+        link_dict = self.local["links"][name]
+        src_name, dst_name = link_dict["source"], link_dict["target"]
+        self.link_manager.dynamic_add_link(name,
+            self._endpoint(src_name, dst_name),
+            self._endpoint(dst_name, src_name),
+            link_dict.get("sourceIP") or "", link_dict.get("targetIP") or "")
+
+    def _update_node(self, name):
+        node_dict = self._remote_node(name)
+        node_dict["interfaces"] = copy.deepcopy(
+            self.local_nodes[name].get("interfaces") or [])
+        self.node_manager.dynamic_update_node(Node(**node_dict))
+
+    def _config_link(self, name):
+        link_dict = self.local["links"][name]
+        ends = _link_config(link_dict)
+        src_config, dst_config = [LinkConfiguration(link=name, ne=node_name,
+                **{_LINK_CONFIG_KEYS.get(key, key): value
+                    for key, value in ends[node_name].items()})
+            for node_name in (link_dict["source"], link_dict["target"])]
+        self.link_manager.config_link(src_config, dst_config)
+
+    def _clear_link(self, name):
+        self.link_manager.clear_link_configuration(name)
+
+
+def apply_plan(plan, node_manager, link_manager, max_concurrency=None,
+        quiet=False, on_progress=None, stop=None, retries=0):
+    '''按轮次执行计划，同一轮中的步骤并发执行
+
+    Args:
+        plan(ReconcilePlan): 执行计划
+        node_manager(NodeManager): 目标项目的节点管理类
+        link_manager(LinkManager): 目标项目的链路管理类
+        max_concurrency(int): 同时执行的步骤数上限，默认为config.pool_maxsize
+        quiet(bool): 默认为False。若为False，则每轮结束后打印进度
+        on_progress(callable): 每轮结束后传入一个usage为"reconcile"的ProgressEvent，
+            默认为None
+        stop(threading.Event): 被设置后不再开始新的轮次，默认为None
+        retries(int): 每轮结束后，失败的步骤逐个重新执行的最大次数（每次之前按
+            config.retry_backoff_s指数退避，已部分创建的节点/链路先删除），默认为0，
+            即不重试
+
+    Returns:
+        已执行的步骤数
+
+    Raises:
+        ReconcileError: 当某一轮中有步骤失败（且重试后仍失败）时，在该轮结束后触发
+            此异常，之后的轮次不再执行
+    '''
+    max_concurrency = max_concurrency or config.pool_maxsize
+    if max_concurrency <= 0:
+        raise ValueError(f"max_concurrency must be positive, "
+            f"got {max_concurrency}")
+    if not plan.waves:
+        return 0
+    # 保证并发请求都能复用连接池中的连接
+    ensure_pool_size(node_manager.url, max_concurrency)
+    runner = _PlanRunner(plan, node_manager, link_manager)
+    completed = 0
+    started_at = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_concurrency,
+            thread_name_prefix="reconcile") as executor:
+        for index, wave in enumerate(plan.waves, 1):
+            if stop is not None and stop.is_set():
+                break
+            pending = wave
+            for attempt in range(retries + 1):
+                if attempt:
+                    # 只重新执行失败的步骤，而不是整轮
+                    time.sleep(min(config.retry_backoff_s * 2 ** (attempt - 1),
+                        config.retry_backoff_max_s))
+                futures = [(step, executor.submit(
+                        runner.retry if attempt else runner.run, step))
+                    for step in pending]
+                errors = []
+                for step, future in futures:
+                    try:
+                        future.result()
+                        completed += 1
+                    except Exception as e:
+                        errors.append((step, e))
+                if not errors:
+                    break
+                pending = [step for step, _ in errors]
+            if errors:
+                raise ReconcileError(errors, completed)
+            if not quiet:
+                print(f"Reconciliation progress: wave {index}/"
+                    f"{len(plan.waves)}, {completed}/{len(plan)} steps")
+            if on_progress is not None:
+                on_progress(ProgressEvent(node_manager.project, "reconcile",
+                    round(100 * completed / len(plan), 1),
+                    time.monotonic() - started_at))
+    return completed
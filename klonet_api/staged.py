@@ -0,0 +1,178 @@
+from . import config
+from .common import Topo
+from .reconcile import _node_dicts, diff_topo, plan_reconcile
+
+
+'''分批部署
+
+上万个容器的拓扑在一次/master/topo/请求中创建时，直到结束前都没有反馈，任何一个
+元素失败都需要整体重来。分批部署将拓扑分为核心与若干个连通的批次：
+
+- 核心：默认为不与主机直接相连的交换机/路由器（如胖树的核心层与汇聚层、叶脊拓扑的
+  脊交换机），以一次/master/topo/请求创建。没有这样的节点时，第一个批次作为核心。
+- 批次：其余节点的连通分量（如胖树中一个接入交换机及其主机），按所连的第一个核心
+  节点排序后合并，使同一pod的分量落在同一批次中，每批不超过batch_size个节点；超过
+  batch_size的分量按广度优先的顺序切分。
+
+核心创建完成后，各批次依次以增量部署的方式添加：批次的节点并发地dynamic_add_node，
+之后批次内及连向已有节点的链路分轮并发地dynamic_add_link，失败的元素逐个重试（见
+apply_plan的retries）。某一批次重试后仍失败时停止，已创建的部分保留在项目中，修复后
+调用ProjectManager.reconcile即可补齐其余部分。
+'''
+
+
+class StagedPlan(object):
+    '''分批部署的计划
+
+    Attributes:
+        topo(dict): 完整的拓扑字典
+        core(list): 核心节点名
+        batches(list): 各批次的节点名列表
+    '''
+    def __init__(self, topo, core, batches):
+        self.topo = topo
+        self.core = core
+        self.batches = batches
+
+    def core_topo(self):
+        '''只含核心节点及其之间链路的Topo对象'''
+        return Topo(**_subtopo(self.topo, set(self.core)))
+
+    def stage_plans(self):
+        '''各批次的增量部署计划
+
+        Returns:
+            ReconcilePlan对象的列表，第i个计划在核心及前i-1个批次的基础上添加第i个
+            批次的节点、链路及链路配置
+        '''
+        names = set(self.core)
+        plans = []
+        for batch in self.batches:
+            names.update(batch)
+            focus = set(batch)
+            # 只比较本批次及与其相连的已部署节点，计划的大小与批次成正比
+            desired = _subtopo(self.topo, names, focus)
+            deployed = {category: {} if category == "links" else {
+                    name: node_dict for name, node_dict in elements.items()
+                    if name not in focus}
+                for category, elements in desired.items()}
+            plans.append(plan_reconcile(diff_topo(desired, deployed)))
+        return plans
+
+    def __str__(self):
+        links = self.topo["links"]
+        core = set(self.core)
+        core_links = sum(1 for link_dict in links.values()
+            if link_dict["source"] in core and link_dict["target"] in core)
+        sizes = [len(batch) for batch in self.batches]
+        text = f"core: {len(self.core)} nodes, {core_links} links; " \
+            f"{len(self.batches)} batch(es)"
+        if sizes:
+            text += f" of {min(sizes)}-{max(sizes)} nodes"
+        return text
+
+    def __repr__(self):
+        return (f"StagedPlan(core={len(self.core)}, "
+            f"batches={len(self.batches)})")
+
+
+def _subtopo(topo_dict, names, focus=None):
+    '''只含names中的节点及两端都在names中的链路的拓扑字典
+
+    节点的接口只保留连向names中节点的接口，因此每一阶段的拓扑都是自洽的。指定focus
+    时，只保留至少一端在focus中的链路及这些链路的端点。
+    '''
+    links = {name: link_dict for name, link_dict in topo_dict["links"].items()
+        if link_dict["source"] in names and link_dict["target"] in names
+        and (focus is None or link_dict["source"] in focus
+            or link_dict["target"] in focus)}
+    keep = names if focus is None else set(focus).union(
+        *((link_dict["source"], link_dict["target"])
+            for link_dict in links.values()))
+    result = {"links": links}
+    for category, elements in topo_dict.items():
+        if category == "links" or not isinstance(elements, dict):
+            continue
+        result[category] = {}
+        for name, node_dict in elements.items():
+            if name in keep:
+                node_dict = dict(node_dict)
+                # 接口名为节点名+对端节点名
+                node_dict["interfaces"] = [nic
+                    for nic in node_dict.get("interfaces") or []
+                    if nic.get("name", "")[len(name):] in names]
+                result[category][name] = node_dict
+    return result
+
+
+def plan_staged(topo, batch_size=None, core=None):
+    '''将拓扑分为核心与若干个连通的批次
+
+    Args:
+        topo(Topo or dict): Topo对象或拓扑字典
+        batch_size(int): 每批的节点数上限，默认为config.staged_batch_nodes
+        core(list): 核心节点名，默认为None，即不与主机直接相连的交换机/路由器等
+
+    Returns:
+        StagedPlan对象
+    '''
+    batch_size = batch_size or getattr(config, "staged_batch_nodes", 500)
+    if batch_size <= 0:
+        raise ValueError(f"batch_size must be positive, got {batch_size}")
+    topo_dict = topo.dictform() if hasattr(topo, "dictform") else topo
+    nodes = _node_dicts(topo_dict)
+    order = {name: index for index, name in enumerate(nodes)}
+    hosts = set(topo_dict.get("hosts") or ())
+    neighbours = {name: [] for name in nodes}
+    for link_dict in topo_dict["links"].values():
+        source, target = link_dict["source"], link_dict["target"]
+        if source in neighbours and target in neighbours:
+            neighbours[source].append(target)
+            neighbours[target].append(source)
+
+    if core is None:
+        core = [name for name in nodes if name not in hosts
+            and not any(peer in hosts for peer in neighbours[name])]
+    core_set = set(core)
+    unknown = core_set - set(nodes)
+    if unknown:
+        raise ValueError(f"core nodes not in topo: {sorted(unknown)[:10]}")
+
+    # 非核心节点的连通分量，分量内为广度优先的顺序
+    components, seen = [], set(core_set)
+    for name in nodes:
+        if name in seen:
+            continue
+        seen.add(name)
+        component, anchor = [name], len(order)
+        for member in component:
+            for peer in neighbours[member]:
+                if peer in core_set:
+                    anchor = min(anchor, order[peer])
+                elif peer not in seen:
+                    seen.add(peer)
+                    component.append(peer)
+        components.append((anchor, order[name], component))
+    # 连向同一核心节点（如同一pod的汇聚交换机）的分量相邻，便于合并为一个批次
+    components.sort(key=lambda item: item[:2])
+
+    batches, current = [], []
+    for _, _, component in components:
+        if len(component) > batch_size:
+            if current:
+                batches.append(current)
+                current = []
+            batches.extend(component[start:start + batch_size]
+                for start in range(0, len(component), batch_size))
+            continue
+        if current and len(current) + len(component) > batch_size:
+            batches.append(current)
+            current = []
+        current.extend(component)
+    if current:
+        batches.append(current)
+
+    core = [name for name in nodes if name in core_set]
+    if not core and batches:
+        core = batches.pop(0)
+    return StagedPlan(topo_dict, core, batches)
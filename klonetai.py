@@ -1,6 +1,10 @@
+import copy
 import requests
 import klonet_api
 from klonet_api import *
+from klonet_api.common import (Manager, endpoint_timeout, read_json,
+    inflight_gets, AddressPool)
+from klonet_api.generators import generate_topo
 
 
 def error_handler(func):
@@ -18,7 +22,7 @@ def http_response_handler(response, func=lambda r: r["msg"]):
         err_msg = f"Request failed with status code {response.status_code}"
         return err_msg
     else:
-        data = response.json()
+        data = read_json(response)
         code = data.get("code", 1)
         msg = data.get("msg", "Unknown")
         if code == 0:
@@ -40,10 +44,18 @@ class KlonetAI:
         self._node_manager = None
         self._link_manager = None
         self._cmd_manager = None
+        self._client = None
         self._logged_in = False
         self._topo = Topo()
         self._link_config = {}
         self.additional_info = {}
+        # Parent subnet (e.g. "10.0.0.0/16") for links added without an IP
+        # address; None leaves such links unaddressed
+        self.address_subnet = None
+        # Called with each reported ProgressEvent of deploy/destroy
+        self.on_progress = None
+        # Handle of the last deploy/destroy started with wait=False
+        self._operation = None
 
     @property
     def project_name(self):
@@ -53,6 +65,10 @@ class KlonetAI:
     def user(self):
         return self._user
 
+    @property
+    def operation(self):
+        return self._operation
+
     @property
     def backend_host(self):
         return self._backend_host
@@ -84,12 +100,9 @@ class KlonetAI:
 
     @property
     def remote_topo(self):
-        ip = self._backend_host
-        port = self._port
-        project = self._project
-        user = self._user
-        url = f"http://{ip}:{port}/re/project/{project}/?user={user}"
-        response = requests.get(url)
+        response = self._client._get(
+            f"/re/project/{self._project}/", params={"user": self._user},
+            project=(self._user, self._project))
 
         def get_topo(data_json):
             project_info = data_json.get("project", {})
@@ -103,12 +116,9 @@ class KlonetAI:
 
     @property
     def remote_nodes(self):
-        ip = self._backend_host
-        port = self._port
-        project = self._project
-        user = self._user
-        url = f"http://{ip}:{port}/re/project/{project}/node/?user={user}"
-        response = requests.get(url)
+        response = self._client._get(
+            f"/re/project/{self._project}/node/", params={"user": self._user},
+            project=(self._user, self._project))
 
         def get_node_info(data_json):
             node_info = data_json.get("node_info", {})
@@ -121,12 +131,9 @@ class KlonetAI:
 
     @property
     def remote_links(self):
-        ip = self._backend_host
-        port = self._port
-        project = self._project
-        user = self._user
-        url = f"http://{ip}:{port}/re/project/{project}/link/?user={user}"
-        response = requests.get(url)
+        response = self._client._get(
+            f"/re/project/{self._project}/link/", params={"user": self._user},
+            project=(self._user, self._project))
 
         def get_link_info(data_json):
             link_info = data_json.get("link_info", {})
@@ -143,14 +150,19 @@ class KlonetAI:
         self._node_manager = NodeManager(self._user, self._project, self._backend_host, self._port)
         self._link_manager = LinkManager(self._user, self._project, self._backend_host, self._port)
         self._cmd_manager = CmdManager(self._user, self._project, self._backend_host, self._port)
+        self._client = Manager(self._backend_host, self._port)
         self._logged_in = True
 
     def test_klonet_connection(self):
         try:
-            _ = self.images
+            # Probe the backend even if its circuit breaker is open.
+            with self._client._breaker.probe():
+                _ = self.images
             return True
         except (klonet_api.common.errors.HttpStatusError,
-                requests.exceptions.ConnectionError, AttributeError):
+                klonet_api.common.errors.DeadlineExceededError,
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout, AttributeError):
             return False
 
     def create_agent(self, agent=None, agent_name="", key="", tools=[],
@@ -242,10 +254,15 @@ class KlonetAI:
     def set_mode(self, mode):
         self._agent.set_mode(mode)
 
-    def reset_project(self):
+    def reset_project(self, wait=True):
         self._topo = Topo()
         self._link_config.clear()
-        self._project_manager.destroy(self._project)
+        if not wait:
+            self._operation = self._project_manager.destroy_async(
+                self._project, on_progress=self._progress_reporter())
+            return self._operation
+        self._project_manager.destroy(self._project, quiet=True,
+                                      on_progress=self._progress_reporter())
 
     def add_node(self, name, image, cpu_limit=None, mem_limit=None, x=0, y=0):
         node = self._topo.add_node(
@@ -260,10 +277,15 @@ class KlonetAI:
             resource_limit={"cpu": cpu_limit, "mem": mem_limit},
             location={"x": x, "y": y}
         )
+        # Keep the local topo in step, otherwise deploy() would undo the change
+        if name not in self.nodes:
+            self.add_node(name, image, cpu_limit, mem_limit, x, y)
         return node
 
     def delete_node_runtime(self, name):
         self._node_manager.dynamic_delete_node(name)
+        if name in self.nodes:
+            self._topo.remove_node(name)
 
     def add_link(self, src_node, dst_node, link_name=None, src_ip="", dst_ip=""):
         link = self._topo.add_link(
@@ -271,11 +293,31 @@ class KlonetAI:
         return link
 
     def add_link_runtime(self, src_node, dst_node, link_name=None, src_ip="", dst_ip=""):
+        if not link_name:
+            # Name the link up front so it can be looked up once created
+            taken = set(self._link_manager.get_links()) | set(self.links)
+            index = len(taken) + 1
+            while f"l{index}" in taken:
+                index += 1
+            link_name = f"l{index}"
+        # Interfaces are appended to the nodes passed in, so use the project's
+        # copies rather than views into the local topo
         self._link_manager.dynamic_add_link(
-            link_name, src_node, dst_node, src_ip, dst_ip)
+            link_name, self._node_manager.get_node(src_node.name),
+            self._node_manager.get_node(dst_node.name), src_ip, dst_ip,
+            address_pool=AddressPool(self.address_subnet)
+            if self.address_subnet else None)
+        link = self._link_manager.get_link(link_name)
+        if (link_name not in self.links and src_node.name in self.nodes
+                and dst_node.name in self.nodes):
+            self.add_link(src_node, dst_node, link_name,
+                          link.sourceIP, link.targetIP)
+        return link
 
     def delete_link_runtime(self, link_name):
         self._link_manager.dynamic_delete_link(link_name)
+        if link_name in self.links:
+            self._topo.remove_link(link_name)
 
     def configure_link(self, config):
         link_name = config["link"]
@@ -306,9 +348,6 @@ class KlonetAI:
         if clean_cache: self._link_config.clear()
 
     def query_link(self, link_name, node_name):
-        ip = self._backend_host
-        port = self._port
-        url = f"http://{ip}:{port}/master/linkquery/"
         data = {
             "user": self._user,
             "topo": self._project,
@@ -317,22 +356,81 @@ class KlonetAI:
                 "ne": node_name
             }]
         }
-        response = requests.post(url, json=data)
+        response = self._client._post("/master/linkquery/", json=data)
 
         def get_link_info(data_json):
             return data_json["static"]
         return http_response_handler(response, get_link_info)
 
-    def deploy(self):
-        self._project_manager.deploy(self._project, self._topo)
+    def save_topo(self, path):
+        return self._topo.save(path)
+
+    def load_topo(self, path):
+        self._topo = Topo.load(path)
+        self._link_config.clear()
+        return self._topo
+
+    def validate_topo(self):
+        return self._topo.validate()
+
+    def topo_graph(self):
+        # Analyse the local topo, or the deployed one if nothing is built locally
+        if self.nodes:
+            return TopoGraph(self._topo)
+        return TopoGraph(self._project_manager.get_topo(self._project))
+
+    def assign_addresses(self, subnet=None):
+        subnet = subnet or self.address_subnet
+        if not subnet:
+            return {}
+        return self._topo.assign_addresses(subnet)
+
+    def deploy(self, dry_run=False, wait=True):
+        if self._project in self._project_manager.get_projects():
+            # Already deployed: only apply what differs from the local topo.
+            # A dry run plans on a copy so it never changes the local topo
+            topo = copy.deepcopy(self._topo) if dry_run else self._topo
+            if self.address_subnet:
+                # Only links the project doesn't have yet get an address;
+                # deployed links keep what they were deployed with
+                deployed = self._project_manager.get_topo(self._project).get_links()
+                added = [name for name in self.links if name not in deployed]
+                if added:
+                    topo.assign_addresses(self.address_subnet, link_names=added)
+            if not wait and not dry_run:
+                self._operation = self._project_manager.reconcile_async(
+                    self._project, topo,
+                    on_progress=self._progress_reporter())
+                return self._operation
+            return self._project_manager.reconcile(
+                self._project, topo, dry_run=dry_run)
+        if dry_run:
+            print(f"Project {self._project} is not deployed yet, deploy() will "
+                  f"create it with {len(self.nodes)} nodes and "
+                  f"{len(self.links)} links.")
+            return None
+        # Links added without an IP address get one from address_subnet, if set
+        self.assign_addresses()
+        if not wait:
+            # Returns once the request is accepted; poll or wait on the handle
+            self._operation = self._project_manager.deploy_async(
+                self._project, self._topo,
+                on_progress=self._progress_reporter())
+            return self._operation
+        self._project_manager.deploy(self._project, self._topo, quiet=True,
+                                     on_progress=self._progress_reporter())
+
+    def _progress_reporter(self):
+        # Report every 25 % and stalls instead of every poll
+        def report(event):
+            print(event)
+            if self.on_progress is not None:
+                self.on_progress(event)
+        return milestones(report)
 
     def check_deployed(self):
-        ip = self._backend_host
-        port = self._port
-        user = self._user
-        project = self._project
-        url = f"http://{ip}:{port}/master/topo/?user={user}&topo={project}"
-        response = requests.get(url)
+        response = self._client._get(
+            "/master/topo/", params={"user": self._user, "topo": self._project})
 
         def get_deploy_status(data_json):
             return data_json["stat"]
@@ -345,7 +443,6 @@ class KlonetAI:
         return response
 
     def batch_exec(self, ctns, command, block="false", timeout=60):
-        url = f"http://{self._backend_host}:{self._port}/master/batch_exec_cmd/"
         data = {
             "user": self._user,
             "topo": self._project,
@@ -354,7 +451,10 @@ class KlonetAI:
             "block": block,
             "cmd_timeout_s": timeout
         }
-        response = requests.post(url, json=data)
+        connect_s, read_s = endpoint_timeout("/master/batch_exec_cmd/")
+        response = self._client._post(
+            "/master/batch_exec_cmd/", json=data,
+            timeout=(connect_s, max(read_s, timeout + 30)))
 
         def get_exec_result(data_json):
             return data_json["exec_results"]
@@ -375,48 +475,52 @@ class KlonetAI:
 
     def deploy_from_config(self, config):
         self._topo = Topo(**config)
-        url = f"http://{self._backend_host}:{self._port}/master/topo/"
         data = {
             "user": self._user,
             "topo": self._project,
             "networks": config
         }
-        response = requests.post(url, json=data)
+        response = self._client._post("/master/topo/", json=data)
+        self._client._invalidate_project_snapshot(self._user, self._project)
         return http_response_handler(response)
 
     def create_template_topo(self, config):
-        url = f"http://{self._backend_host}:{self._port}/generate"
-        response = requests.post(url, json=config)
+        response = self._client._post("/generate", json=config)
 
         def get_topo_config(data_json):
             return data_json["net"]
         return http_response_handler(response, get_topo_config)
 
+    def generate_template_topo(self, topology_type, subnet, host_image="ubuntu",
+                               switch_image="ovs", **params):
+        # Built locally with coordinates, no /generate round trip
+        images = self.images
+        self._topo = generate_topo(
+            topology_type, images[host_image], images[switch_image],
+            subnet=subnet, **params)
+        self._link_config.clear()
+        return self._topo
+
     def config_public_network(self, node_name, turn_on=True):
-        url = f"http://{self._backend_host}:{self._port}/master/node/network/"
         data = {
             "user": self._user,
             "topo": self._project,
             "ne": node_name
         }
-        req_func = requests.post if turn_on else requests.delete
-        response = req_func(url, json=data)
+        req_func = self._client._post if turn_on else self._client._delete
+        response = req_func("/master/node/network/", json=data)
         return http_response_handler(response)
 
     def check_public_network(self, node_name):
-        ip = self._backend_host
-        port = self._port
-        user = self._user
-        project = self._project
-        url = f"http://{ip}:{port}/master/node/network/?user={user}&topo={project}&ne={node_name}"
-        response = requests.get(url)
+        response = self._client._get(
+            "/master/node/network/",
+            params={"user": self._user, "topo": self._project, "ne": node_name})
 
         def get_status(data_json):
             return data_json["status"]
         return http_response_handler(response, get_status)
 
     def upload_file(self, node_name, src_file, tgt_filepath="/home"):
-        url = f"http://{self._backend_host}:{self._port}/file/uload/"
         data = {
             "user": self._user,
             "topo": self._project,
@@ -424,26 +528,40 @@ class KlonetAI:
             "file_path": tgt_filepath,
         }
         files = {"file": open(src_file, "rb") if type(src_file) is str else src_file}
-        response = requests.post(url, data=data, files=files)
+        response = self._client._post("/file/uload/", data=data, files=files)
         return http_response_handler(response)
 
     def manage_worker(self, worker_ip, delete_worker=False):
-        url = f"http://{self._backend_host}:{self._port}/master/worker/{worker_ip}/"
         data = {"worker_ip": worker_ip}
-        req_func = requests.delete if delete_worker else requests.post
-        response = req_func(url, json=data)
+        req_func = self._client._delete if delete_worker else self._client._post
+        response = req_func(f"/master/worker/{worker_ip}/", json=data)
         return http_response_handler(response)
 
     def check_health(self):
-        ip = self._backend_host
-        port = self._port
-        user = self._user
-        project = self._project
-        url = f"http://{ip}:{port}/master/heartbeat_health/?user={user}&project={project}"
-        response = requests.get(url)
+        response = self._client._get(
+            "/master/heartbeat_health/",
+            params={"user": self._user, "project": self._project})
 
         def get_broken_nodes(data_json):
             is_broken = data_json["is_broken"]
             broken_nodes = data_json["broken_nes"]
             return is_broken, broken_nodes
         return http_response_handler(response, get_broken_nodes)
+
+    def connection_stats(self):
+        return connection_stats(self._client.url if self._client else None)
+
+    def stats(self):
+        return {
+            "requests": request_metrics.snapshot(),
+            "connections": self.connection_stats(),
+            "breaker": self._client._breaker.stats() if self._client else None,
+            "snapshot_cache": project_snapshots.stats(),
+            "coalesced_gets": inflight_gets.stats(),
+        }
+
+    def export_stats(self, path, fmt="json"):
+        # fmt: "json" for a JSON snapshot, "prometheus" for the text format
+        if fmt == "prometheus":
+            return request_metrics.to_prometheus(path)
+        return request_metrics.to_json(path)
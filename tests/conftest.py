@@ -0,0 +1,45 @@
+import pytest
+
+from klonet_api import config
+from klonet_api.common import Image, Topo, project_snapshots
+from klonet_api.fake_master import FakeKlonetMaster
+
+HOST_IMAGE = Image(type="host", subtype="ubuntu", image_name="ubuntu:20.04",
+                   resource_limit={"cpu": "100", "mem": "1024"},
+                   config={"worker_specified": ""}, interfaces=[])
+SWITCH_IMAGE = Image(type="switch", subtype="ovs", image_name="ovs:latest",
+                     resource_limit={"cpu": "100", "mem": "512"},
+                     config={"worker_specified": ""}, interfaces=[])
+
+
+@pytest.fixture(autouse=True)
+def quick_config(monkeypatch):
+    """Fast polling and no history file, restored after each test."""
+    monkeypatch.setattr(config, "progress_poll_min_s", 0.02)
+    monkeypatch.setattr(config, "progress_poll_max_s", 0.1)
+    monkeypatch.setattr(config, "retry_backoff_s", 0.01)
+    monkeypatch.setattr(config, "deploy_history_path", None)
+    monkeypatch.setattr(config, "record_deploy_history", False)
+    project_snapshots.invalidate()
+    yield
+    project_snapshots.invalidate()
+
+
+@pytest.fixture
+def master(monkeypatch):
+    """A fake master with near-instant deploys, used as the default backend."""
+    with FakeKlonetMaster(deploy_time_s=0.05, seed=0) as fake:
+        monkeypatch.setattr(config, "backend_ip", fake.backend_ip)
+        monkeypatch.setattr(config, "backend_port", fake.backend_port)
+        yield fake
+
+
+def star_topo(num_hosts=2):
+    """s1 with hosts h1..hN on 10.0.0.0/24; host hI is 10.0.0.I."""
+    topo = Topo()
+    switch = topo.add_node(SWITCH_IMAGE, "s1", location={"x": 100, "y": 0})
+    for i in range(1, num_hosts + 1):
+        host = topo.add_node(HOST_IMAGE, f"h{i}",
+                             location={"x": 50 * i, "y": 100})
+        topo.add_link(host, switch, f"l{i}", src_IP=f"10.0.0.{i}/24")
+    return topo
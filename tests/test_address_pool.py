@@ -0,0 +1,62 @@
+import copy
+
+import pytest
+
+from klonet_api.common import (AddressConflictError, AddressPool,
+    AddressPoolExhaustedError, plan_link_addresses)
+
+from conftest import star_topo
+
+
+def test_exhaustion_allocates_nothing():
+    pool = AddressPool("10.0.0.0/24")
+    assert pool.allocate(25) == ["10.0.0.0/25"]
+    with pytest.raises(AddressPoolExhaustedError):
+        pool.allocate(25, count=2)
+    assert pool.free_addresses == 128
+    assert pool.allocate(25) == ["10.0.0.128/25"]
+    with pytest.raises(AddressPoolExhaustedError):
+        pool.allocate_p2p(1)
+
+
+def test_released_subnets_are_reused():
+    pool = AddressPool("10.0.0.0/29")
+    first, second = pool.allocate_p2p(2)
+    assert first == ("10.0.0.1/30", "10.0.0.2/30")
+    pool.release("10.0.0.0/30")
+    assert pool.allocate_p2p(1) == [first]
+    assert second == ("10.0.0.5/30", "10.0.0.6/30")
+
+
+def test_hosts_share_an_existing_subnet():
+    pool = AddressPool("10.0.0.0/16")
+    pool.reserve("10.0.0.2/24")
+    subnet, addresses = pool.allocate_hosts(2, subnet="10.0.0.0/24")
+    assert subnet == "10.0.0.0/24"
+    assert addresses == ["10.0.0.3/24", "10.0.0.4/24"]
+    with pytest.raises(AddressPoolExhaustedError):
+        pool.allocate_hosts(300, subnet="10.0.0.0/24")
+
+
+def test_conflicts_are_reported():
+    pool = AddressPool("10.0.0.0/24")
+    pool.reserve("10.0.0.5/24")
+    with pytest.raises(AddressConflictError):
+        pool.reserve("10.0.0.5/24")
+    with pytest.raises(AddressConflictError):
+        pool.allocate_hosts(1, subnet="192.168.0.0/24")
+
+    topo_dict = copy.deepcopy(star_topo(2).dictform())
+    for node in topo_dict["hosts"].values():
+        node["interfaces"][0]["ip"] = "10.0.0.1"
+    with pytest.raises(AddressConflictError, match=r"h1\(h1s1\), h2\(h2s1\)"):
+        AddressPool("10.0.0.0/16").reserve_topo(topo_dict)
+
+
+def test_planning_skips_addressed_links():
+    topo = star_topo(2)
+    topo.add_link(topo.get_nodes()["h1"], topo.get_nodes()["h2"], "l3")
+    pool = AddressPool("10.0.0.0/16")
+    pool.reserve_topo(topo.dictform())
+    plan = plan_link_addresses(topo.dictform(), pool)
+    assert set(plan) == {"l3"}
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from klonet_api import NodeManager, ProjectManager, config
+from klonet_api.common import DeadlineExceededError, inflight_gets
+from klonet_api.common.cache import ProjectSnapshotCache
+from klonet_api.common.singleflight import SingleFlight
+
+from conftest import HOST_IMAGE, star_topo
+
+KEY = ("http://backend", "u", "p")
+
+
+@pytest.fixture
+def cached(monkeypatch):
+    """Keep snapshots for the whole test so only invalidation can drop them."""
+    monkeypatch.setattr(config, "snapshot_ttl_s", 60)
+
+
+def test_put_after_invalidate_is_dropped():
+    cache = ProjectSnapshotCache(ttl_s=60)
+    generation = cache.generation(KEY)
+    cache.invalidate(KEY) # a write lands while the read is in flight
+    cache.put(KEY, {"stale": {}}, generation)
+    assert cache.get(KEY) is None
+
+    cache.put(KEY, {"fresh": {}}, cache.generation(KEY))
+    assert cache.get(KEY) == {"fresh": {}}
+
+
+def test_invalidating_everything_drops_pending_puts():
+    cache = ProjectSnapshotCache(ttl_s=60)
+    generation = cache.generation(KEY)
+    cache.invalidate()
+    cache.put(KEY, {"stale": {}}, generation)
+    assert cache.get(KEY) is None
+
+
+def test_read_after_write_sees_the_new_node(master, cached):
+    ProjectManager("u").deploy("p", star_topo(2), quiet=True)
+    nodes = NodeManager("u", "p")
+    assert "h9" not in nodes.get_nodes()
+
+    nodes.dynamic_add_node("h9", HOST_IMAGE)
+    assert nodes.get_node("h9").name == "h9"
+    assert "h9" in nodes.get_nodes()
+
+
+def test_post_write_get_does_not_join_a_pre_write_flight(master, cached):
+    ProjectManager("u").deploy("p", star_topo(2), quiet=True)
+    master.endpoint_latency_s["/re/project/p/"] = 0.5
+    before = NodeManager("u", "p")
+    reader = threading.Thread(target=before.get_nodes)
+    reader.start()
+    time.sleep(0.2) # the slow read is now in flight
+
+    nodes = NodeManager("u", "p")
+    nodes.dynamic_add_node("h9", HOST_IMAGE)
+    shared = inflight_gets.shared
+    assert nodes.get_node("h9").name == "h9"
+    reader.join()
+    assert inflight_gets.shared == shared
+
+
+def test_concurrent_reads_share_one_request(master, cached):
+    ProjectManager("u").deploy("p", star_topo(2), quiet=True)
+    master.endpoint_latency_s["/re/project/p/"] = 0.3
+    master.request_counts.clear()
+    readers = [threading.Thread(target=NodeManager("u", "p").get_nodes)
+               for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    assert master.request_counts["GET /re/project/(?P<project>[^/]+)/"] == 1
+
+
+def test_follower_honours_its_deadline():
+    flights = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flights.do, args=("k", release.wait))
+    leader.start()
+    while flights.executed == 0:
+        time.sleep(0.01)
+
+    started_at = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        flights.do("k", lambda: "unused", timeout=0.1)
+    assert time.monotonic() - started_at < 1
+    release.set()
+    leader.join()
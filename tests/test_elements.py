@@ -0,0 +1,41 @@
+import copy
+import pickle
+
+from klonet_api.common import Link, Node, Topo
+
+from conftest import HOST_IMAGE, SWITCH_IMAGE
+
+
+def test_dictform_is_the_live_attribute_dict():
+    node = Node(name="h1", type="host", backend_field=1)
+    properties = node.dictform()
+    assert properties is node.dictform() is node.__dict__
+    node.name = "h2"
+    properties["type"] = "router"
+    assert properties["name"] == "h2" and node.type == "router"
+    del node.backend_field
+    assert "backend_field" not in properties
+
+
+def test_link_returned_by_add_link_is_backed_by_the_topo():
+    topo = Topo()
+    switch = topo.add_node(SWITCH_IMAGE, "s1")
+    host = topo.add_node(HOST_IMAGE, "h1")
+    link = topo.add_link(host, switch, "l1")
+    link.sourceIP = "10.0.0.1/24"
+    link.dictform()["targetIP"] = "10.0.0.2/24"
+    stored = topo.dictform()["links"]["l1"]
+    assert (stored["sourceIP"], stored["targetIP"]) == (
+        "10.0.0.1/24", "10.0.0.2/24")
+
+
+def test_copies_are_independent():
+    link = Link(name="l1", source="h1", config={"source": {}}, extra=[1])
+    for clone in (copy.copy(link), copy.deepcopy(link),
+                  pickle.loads(pickle.dumps(link))):
+        clone.name = "l2"
+        assert link.name == "l1"
+        assert clone.dictform() == dict(link.dictform(), name="l2")
+    deep = copy.deepcopy(link)
+    deep.config["source"]["delay_us"] = "1"
+    assert link.config == {"source": {}}
@@ -0,0 +1,48 @@
+import pytest
+
+from klonet_api import ProjectManager, TopoValidationError, config, deploy_history
+from klonet_api.common import VemuExecError
+
+from conftest import star_topo
+
+
+@pytest.fixture
+def history(monkeypatch):
+    monkeypatch.setattr(config, "record_deploy_history", True)
+    deploy_history.clear()
+    yield deploy_history
+    deploy_history.clear()
+
+
+def test_failed_submits_are_recorded(master, history):
+    manager = ProjectManager("u")
+    manager.deploy("p", star_topo(2), quiet=True)
+    with pytest.raises(VemuExecError):
+        manager.deploy("p", star_topo(2), quiet=True) # already exists
+    with pytest.raises(VemuExecError):
+        manager.destroy_async("missing")
+
+    failed = history.records(manager.url, ok=False)
+    assert [(record.usage, record.project) for record in failed] == [
+        ("deploy", "p"), ("delete", "missing")]
+    assert all(record.error and record.submit_s is None for record in failed)
+    assert len(history.records(manager.url, usage="deploy", ok=True)) == 1
+
+
+def test_invalid_topo_is_recorded(master, history):
+    topo = star_topo(2)
+    topo.add_link(topo.get_nodes()["h1"], topo.get_nodes()["h2"], "l9",
+                  src_IP="10.0.0.1/24", dst_IP="10.0.0.2/24")
+    with pytest.raises(TopoValidationError):
+        ProjectManager("u").deploy("p", topo, quiet=True)
+    assert [record.ok for record in history.records()] == [False]
+
+
+def test_destroy_reuses_the_deploy_shape(master, history):
+    manager = ProjectManager("u")
+    manager.deploy("p", star_topo(3), quiet=True)
+    master.request_counts.clear()
+    manager.destroy("p", quiet=True)
+    assert not any(key.startswith("GET") for key in master.request_counts)
+    record = history.records(manager.url, usage="delete")[-1]
+    assert record.ok and record.shape["links"] == 3
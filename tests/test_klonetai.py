@@ -0,0 +1,33 @@
+from klonetai import KlonetAI
+
+
+def logged_in(master):
+    kai = KlonetAI()
+    kai.klonet_login("p", "u", master.backend_ip, master.backend_port)
+    return kai
+
+
+def test_add_link_runtime_without_a_name(master):
+    kai = logged_in(master)
+    kai.generate_template_topo("star", "10.0.0.0/24", num_hosts=3)
+    kai.deploy()
+    kai.add_node_runtime("h9", kai.images["ubuntu"])
+
+    link = kai.add_link_runtime(kai.nodes["h9"], kai.nodes["s1"],
+                                src_ip="10.0.0.9/24")
+    assert link.name not in ("l1", "l2", "l3")
+    assert link.name in kai.links
+    assert kai.links[link.name].sourceIP == "10.0.0.9/24"
+
+
+def test_links_stay_unaddressed_without_a_subnet(master):
+    kai = logged_in(master)
+    s1 = kai.add_node("s1", kai.images["ovs"], x=100, y=0)
+    h1 = kai.add_node("h1", kai.images["ubuntu"], x=50, y=100)
+    kai.add_link(h1, s1, "l1")
+    kai.deploy()
+    assert kai.links["l1"].sourceIP == ""
+    # Opting in later addresses only links the project doesn't have yet
+    kai.address_subnet = "10.0.0.0/16"
+    assert len(kai.deploy(dry_run=True)) == 0
+    assert kai.links["l1"].sourceIP == ""
@@ -0,0 +1,14 @@
+from klonet_api import LinkManager, ProjectManager
+from klonet_api.common import LinkConfiguration
+
+from conftest import star_topo
+
+
+def test_config_link_returns_the_response_quietly(master, capsys):
+    ProjectManager("u").deploy("p", star_topo(2), quiet=True)
+    capsys.readouterr()
+    resp_json = LinkManager("u", "p").config_link(
+        LinkConfiguration(link="l1", ne="h1", delay_us="1000"),
+        LinkConfiguration(link="l1", ne="s1", delay_us="1000"))
+    assert resp_json["code"] == 1
+    assert capsys.readouterr().out == ""
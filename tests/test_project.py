@@ -0,0 +1,32 @@
+import pytest
+
+from klonet_api import ProgressTimeoutError, ProjectManager, diff_topo
+
+from conftest import star_topo
+
+
+def test_staged_deploy_builds_the_whole_topo(master):
+    topo = star_topo(6)
+    manager = ProjectManager("u")
+    events = []
+    staged = manager.deploy_staged("p", topo, batch_size=2, quiet=True,
+                                   on_progress=events.append)
+    assert len(staged.batches) > 1
+    assert events[-1].value == 100
+    assert not diff_topo(topo, manager.get_topo("p"))
+
+
+def test_staged_dry_run_sends_nothing(master):
+    ProjectManager("u").deploy_staged("p", star_topo(6), batch_size=2,
+                                      dry_run=True)
+    assert not any(key.startswith(("POST", "DELETE"))
+                   for key in master.request_counts)
+
+
+def test_slow_deploy_times_out(master):
+    master.deploy_time_s = 30
+    with pytest.raises(ProgressTimeoutError) as info:
+        ProjectManager("u").deploy("p", star_topo(2), quiet=True,
+                                   timeout_min=0.005)
+    assert info.value.project == "p" and info.value.usage == "deploy"
+    assert info.value.value < 100
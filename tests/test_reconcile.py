@@ -0,0 +1,65 @@
+import copy
+
+from klonet_api import NodeManager, ProjectManager, diff_topo
+
+from conftest import HOST_IMAGE, star_topo
+
+
+def deployed(master, topo):
+    manager = ProjectManager("u")
+    manager.deploy("p", topo, quiet=True)
+    return manager
+
+
+def remote_interfaces(manager, node_name):
+    return [nic["name"] for nic in
+            NodeManager("u", "p").get_node(node_name).interfaces]
+
+
+def test_removed_link_leaves_no_interface(master):
+    topo = star_topo(2)
+    manager = deployed(master, topo)
+    assert remote_interfaces(manager, "h1") == ["h1s1"]
+
+    topo.remove_link("l1")
+    plan = manager.reconcile("p", topo, quiet=True)
+    assert plan.counts() == {"delete_link": 1}
+    assert remote_interfaces(manager, "h1") == []
+    assert not diff_topo(topo, manager.get_topo("p"))
+
+
+def test_stale_interface_is_reported_and_rewritten(master):
+    topo = star_topo(2)
+    manager = deployed(master, topo)
+    # A stale interface left behind by an older client
+    stale = copy.deepcopy(NodeManager("u", "p").get_node("h2"))
+    stale.interfaces.append({"ip": "10.0.9.9", "netmask": "255.255.255.0",
+                             "name": "h2gone"})
+    NodeManager("u", "p").dynamic_update_node(stale)
+
+    diff = diff_topo(topo, manager.get_topo("p"))
+    assert diff.changed_interfaces == ["h2"]
+    plan = manager.reconcile("p", topo, quiet=True)
+    assert plan.counts() == {"update_node": 1}
+    assert remote_interfaces(manager, "h2") == ["h2s1"]
+    assert not diff_topo(topo, manager.get_topo("p"))
+
+
+def test_readded_link_keeps_one_interface(master):
+    topo = star_topo(2)
+    manager = deployed(master, topo)
+    topo.remove_link("l1")
+    topo.add_link(topo.get_nodes()["h1"], topo.get_nodes()["s1"], "l1",
+                  src_IP="10.0.0.11/24")
+    plan = manager.reconcile("p", topo, quiet=True)
+    assert plan.counts() == {"delete_link": 1, "add_link": 1}
+    nics = NodeManager("u", "p").get_node("h1").interfaces
+    assert [(nic["name"], nic["ip"]) for nic in nics] == [("h1s1", "10.0.0.11")]
+
+
+def test_unchanged_topo_plans_nothing(master):
+    topo = star_topo(3)
+    topo.add_node(HOST_IMAGE, "h9", location={"x": 400, "y": 100})
+    manager = deployed(master, topo)
+    assert not diff_topo(topo, manager.get_topo("p"))
+    assert len(manager.reconcile("p", topo, dry_run=True)) == 0
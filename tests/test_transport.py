@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from klonet_api import ImageManager, config
+from klonet_api.common import CircuitBreaker, CircuitOpenError, HttpStatusError
+
+
+def tripped(threshold=2, reset_timeout_s=0.05):
+    breaker = CircuitBreaker("test", failure_threshold=threshold,
+                             reset_timeout_s=reset_timeout_s)
+    for _ in range(threshold):
+        breaker.before_request()
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout_s=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success() # a success resets the count
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_half_open_trial_closes_on_success():
+    breaker = tripped()
+    time.sleep(0.06)
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError): # only one trial at a time
+        breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_request()
+
+
+def test_half_open_trial_reopens_on_failure():
+    breaker = tripped()
+    time.sleep(0.06)
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_released_trial_can_be_retried():
+    breaker = tripped()
+    time.sleep(0.06)
+    breaker.before_request()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.OPEN
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_probe_bypasses_an_open_breaker():
+    breaker = tripped(reset_timeout_s=60)
+    with breaker.probe():
+        breaker.before_request()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_gets_are_retried_on_5xx(master):
+    master.fail_next(2, status=503)
+    assert ImageManager("u").get_images(quiet=True)
+    assert master.request_counts["GET /my/image/"] == 3
+
+
+def test_backend_failures_trip_the_breaker(master, monkeypatch):
+    monkeypatch.setattr(config, "max_retries", 0)
+    manager = ImageManager("u")
+    threshold = manager._breaker.failure_threshold
+    master.fail_next(threshold, status=503)
+    for _ in range(threshold):
+        with pytest.raises(HttpStatusError):
+            manager.get_images(quiet=True)
+    with pytest.raises(CircuitOpenError):
+        manager.get_images(quiet=True)
+    assert master.request_counts["GET /my/image/"] == threshold
@@ -8,6 +8,10 @@ from .klonet import (
     KlonetCommandExecTool,
     KlonetRuntimeDeleteNodeTool,
     KlonetDeployTool,
+    KlonetDeployProgressTool,
+    KlonetWaitDeployTool,
+    KlonetPreviewDeployTool,
+    KlonetValidateTopoTool,
     KlonetCheckDeployedTool,
     KlonetGetAllImagesTool,
     KlonetViewTopoTool,
@@ -22,11 +26,17 @@ from .klonet import (
     KlonetLinkConfigurationTool,
     KlonetResetLinkConfigurationTool,
     KlonetLinkQueryTool,
+    KlonetShortestPathTool,
+    KlonetTopoMetricsTool,
+    KlonetMinCutTool,
     KlonetGetWorkerIPTool,
     KlonetTreeTopoTemplate,
     KlonetStarTopoTemplate,
     KlonetFatTreeTopoTemplate,
     KlonetLinearTopoTemplate,
+    KlonetMeshTopoTemplate,
+    KlonetTorusTopoTemplate,
+    KlonetRandomTopoTemplate,
     KlonetConfigurePublicNetworkTool,
     KlonetCheckPublicNetworkTool,
     KlonetFileDownloadTool,
@@ -47,6 +57,10 @@ klonet = (
     KlonetCommandExecTool,
     KlonetRuntimeDeleteNodeTool,
     KlonetDeployTool,
+    KlonetDeployProgressTool,
+    KlonetWaitDeployTool,
+    KlonetPreviewDeployTool,
+    KlonetValidateTopoTool,
     KlonetCheckDeployedTool,
     KlonetGetAllImagesTool,
     KlonetViewTopoTool,
@@ -61,6 +75,9 @@ klonet = (
     KlonetLinkConfigurationTool,
     KlonetResetLinkConfigurationTool,
     KlonetLinkQueryTool,
+    KlonetShortestPathTool,
+    KlonetTopoMetricsTool,
+    KlonetMinCutTool,
     KlonetGetWorkerIPTool,
     KlonetConfigurePublicNetworkTool,
     KlonetCheckPublicNetworkTool,
@@ -75,6 +92,9 @@ topo = (
     KlonetStarTopoTemplate,
     KlonetFatTreeTopoTemplate,
     KlonetLinearTopoTemplate,
+    KlonetMeshTopoTemplate,
+    KlonetTorusTopoTemplate,
+    KlonetRandomTopoTemplate,
 )
 
 gpt = (
@@ -44,18 +44,19 @@ class KlonetViewTopoTool(Tool):
 class KlonetAddNodeTool(Tool):
     name = "klonet_add_node"
     description = ('''
-    Add a node to the Klonet network. The node with position (x, y) cannot overlap with
-    other nodes.
+    Add a node to the Klonet network. The coordinates are optional: nodes without
+    coordinates are laid out automatically before deployment, so there is no need
+    to choose x and y unless a specific position is wanted.
     
     Args:
         name (str): The name of the node being added. The name of this new node cannot be 
             the same as existing nodes.
         image (str): The name of Docker image used by the node. Use the klonet_get_all_images
             tool to see the available images.
-        x (int): The x-coordinate of the node on the canvas. It should be set as an integer 
-            value between 0 and 700. The agent should set this for pretty visual layout.
-        y (int): The y-coordinate of the node on the canvas. It should be set as an integer 
-            value between 0 and 700. The agent should set this for pretty visual layout.
+        x (int, optional): The x-coordinate of the node on the canvas, default to None,
+            which will lay out the node automatically.
+        y (int, optional): The y-coordinate of the node on the canvas, default to None,
+            which will lay out the node automatically.
         cpu_limit (int, optional): CPU utilization limit for the node, unit: %, 
             default to None, which will use the default cpu limits from the Docker image.
         mem_limit (int, optional): Memory utilization limit for the node, unit: Mbytes, 
@@ -69,18 +70,18 @@ class KlonetAddNodeTool(Tool):
 
     Example:
         # Add a ubuntu host named h1.
-        >>> klonet_add_node("h1", "ubuntu", x=500, y=500)
+        >>> klonet_add_node("h1", "ubuntu")
         # Add an OVS switch named s1.
-        >>> klonet_add_node("s1", "ovs", x=500, y=500)
+        >>> klonet_add_node("s1", "ovs")
     ''')
 
     inputs = ["str", "str", "int", "int", "int", "int"]
 
     @error_handler
-    def __call__(self, name: str, image: str, x: int, y: int,
+    def __call__(self, name: str, image: str, x: int = None, y: int = None,
                  cpu_limit: int = None, mem_limit: int = None):
         node = kai.add_node(
-            name, kai.images[image], cpu_limit, mem_limit, x, y)
+            name, kai.images[image], cpu_limit, mem_limit, x or 0, y or 0)
         print(f"A new node (name: {node.name}, image: {node.image_name}, "
               f"resource limit: {node.resource_limit}) have been added to the network.")
 
@@ -165,9 +166,12 @@ class KlonetAddLinkTool(Tool):
         dst_node (str): The name of the destination node.
         link_name (str): The name of the link. The name of this new link cannot be 
             the same as existing links.
-        src_ip (str): The source IP address. Avoid using the first two and last IP 
+        src_ip (str, optional): The source IP address. Avoid using the first two and last IP 
             addresses in the subnet. For example, avoid using 10.0.0.0, 10.0.0.1, 
-            and 10.0.0.255 in the subnet 10.0.0.0/24.
+            and 10.0.0.255 in the subnet 10.0.0.0/24. Default to None, which leaves
+            the link without an address unless automatic addressing is enabled:
+            then hosts behind the same switches share a subnet, and host-to-host
+            or router-to-router links get a /30 subnet.
 
     Returns:
         None
@@ -181,12 +185,14 @@ class KlonetAddLinkTool(Tool):
     inputs = ["str", "str", "str", "str"]
 
     @error_handler
-    def __call__(self, src_node: str, dst_node: str, link_name: str, src_ip: str):
+    def __call__(self, src_node: str, dst_node: str, link_name: str, src_ip: str = None):
         src_node = kai.nodes[src_node]
         dst_node = kai.nodes[dst_node]
-        link = kai.add_link(src_node, dst_node, link_name, src_ip)
+        link = kai.add_link(src_node, dst_node, link_name, src_ip or "")
+        address = link.sourceIP or (
+            "assigned at deployment" if kai.address_subnet else "none")
         print(f"A link with name ({link.name}) was added between nodes "
-              f"{link.source} (IP: {link.sourceIP}) and {link.target}")
+              f"{link.source} (IP: {address}) and {link.target}")
 
 
 class KlonetRuntimeAddLinkTool(Tool):
@@ -201,9 +207,12 @@ class KlonetRuntimeAddLinkTool(Tool):
         dst_node (str): The name of the destination node.
         link_name (str): The name of the link. The name of this new link cannot be 
             the same as existing links.
-        src_ip (str): The source IP address. Avoid using the first two and last IP 
+        src_ip (str, optional): The source IP address. Avoid using the first two and last IP 
             addresses in the subnet. For example, avoid using 10.0.0.0, 10.0.0.1, 
-            and 10.0.0.255 in the subnet 10.0.0.0/24.
+            and 10.0.0.255 in the subnet 10.0.0.0/24. Default to None, which leaves
+            the link without an address unless automatic addressing is enabled:
+            then hosts behind the same switches share a subnet, and host-to-host
+            or router-to-router links get a /30 subnet.
     
     Returns:
         None
@@ -217,12 +226,12 @@ class KlonetRuntimeAddLinkTool(Tool):
     inputs = ["str", "str", "str", "str"]
 
     @error_handler
-    def __call__(self, src_node: str, dst_node: str, link_name: str, src_ip: str):
+    def __call__(self, src_node: str, dst_node: str, link_name: str, src_ip: str = None):
         src_node = kai.nodes[src_node]
         dst_node = kai.nodes[dst_node]
-        kai.add_link_runtime(src_node, dst_node, link_name, src_ip)
+        link = kai.add_link_runtime(src_node, dst_node, link_name, src_ip or "")
         print(f"A link with name ({link_name}) was added between nodes "
-              f"{src_node.name} (IP: {src_ip}) and {dst_node.name}")
+              f"{src_node.name} (IP: {link.sourceIP}) and {dst_node.name}")
 
 
 class KlonetRuntimeDeleteLinkTool(Tool):
@@ -253,7 +262,99 @@ class KlonetRuntimeDeleteLinkTool(Tool):
 class KlonetDeployTool(Tool):
     name = "klonet_deploy_network"
     description = ('''
-    Deploy the designed network to Klonet.
+    Deploy the designed network to Klonet. If the project is already 
+    deployed, only the nodes, links and link configurations that differ 
+    are changed.
+    
+    Args:
+        wait (bool, optional): Wait until the deployment finishes. Defaults 
+            to True. Use False for large networks, then check with 
+            klonet_deploy_progress and finish with klonet_wait_deploy.
+
+    Returns:
+        None
+        
+    Example:
+        >>> klonet_deploy_network()
+        >>> klonet_deploy_network(wait=False)
+    ''')
+
+    inputs = ["bool"]
+
+    @error_handler
+    def __call__(self, wait: bool = True):
+        kai.deploy(wait=wait)
+        if wait:
+            print(f"Deploy project {kai.project_name} success.")
+        else:
+            print(f"Deploying project {kai.project_name} in the background.")
+
+
+class KlonetDeployProgressTool(Tool):
+    name = "klonet_deploy_progress"
+    description = ('''
+    Show the progress of the deployment or destruction started with 
+    wait=False, without waiting for it.
+    
+    Args:
+        None
+
+    Returns:
+        float: The progress in percent, 100 when finished.
+        
+    Example:
+        >>> progress = klonet_deploy_progress()
+    ''')
+
+    outputs = ["float"]
+
+    @error_handler
+    def __call__(self):
+        handle = kai.operation
+        if handle is None:
+            print("No deployment is running in the background.")
+            return None
+        print(handle)
+        return handle.progress()
+
+
+class KlonetWaitDeployTool(Tool):
+    name = "klonet_wait_deploy"
+    description = ('''
+    Wait for the deployment or destruction started with wait=False to 
+    finish.
+    
+    Args:
+        timeout (int, optional): The maximum seconds to wait. Defaults to 
+            None, which waits until it finishes. If it is still running 
+            after timeout seconds, an error with the progress is printed 
+            and the operation keeps running.
+
+    Returns:
+        None
+        
+    Example:
+        >>> klonet_wait_deploy()
+        >>> klonet_wait_deploy(timeout=60)
+    ''')
+
+    inputs = ["int"]
+
+    @error_handler
+    def __call__(self, timeout: int = None):
+        handle = kai.operation
+        if handle is None:
+            print("No deployment is running in the background.")
+            return
+        handle.wait(timeout)
+        print(f"{handle.usage} {handle.project} finished.")
+
+
+class KlonetPreviewDeployTool(Tool):
+    name = "klonet_preview_deploy"
+    description = ('''
+    Show which nodes and links klonet_deploy_network would add, delete or 
+    reconfigure, without changing anything on Klonet.
     
     Inputs:
         None
@@ -262,13 +363,35 @@ class KlonetDeployTool(Tool):
         None
         
     Example:
-        >>> klonet_deploy_network()
+        >>> klonet_preview_deploy()
     ''')
 
     @error_handler
     def __call__(self):
-        kai.deploy()
-        print(f"Deploy project {kai.project_name} success.")
+        kai.deploy(dry_run=True)
+
+
+class KlonetValidateTopoTool(Tool):
+    name = "klonet_validate_topo"
+    description = ('''
+    Check the network for problems that would make the deployment fail,
+    such as links to missing nodes, duplicate IP addresses, IP addresses
+    of a link in different subnets, unsupported node types, colliding
+    interface names or invalid coordinates. Nothing is sent to Klonet.
+
+    Args:
+        None
+
+    Returns:
+        None
+
+    Example:
+        >>> klonet_validate_topo()
+    ''')
+
+    @error_handler
+    def __call__(self):
+        print(kai.validate_topo())
 
 
 class KlonetCheckDeployedTool(Tool):
@@ -300,8 +423,10 @@ class KlonetDestroyProjectTool(Tool):
     description = ('''
     Destroy the current project in Klonet.
     
-    Inputs:
-        None
+    Args:
+        wait (bool, optional): Wait until the project is deleted. Defaults 
+            to True. If False, check with klonet_deploy_progress and finish 
+            with klonet_wait_deploy.
     
     Returns:
         None
@@ -310,10 +435,15 @@ class KlonetDestroyProjectTool(Tool):
         >>> klonet_destroy_project()
     ''')
 
+    inputs = ["bool"]
+
     @error_handler
-    def __call__(self):
-        kai.reset_project()
-        print("This project has been deleted.")
+    def __call__(self, wait: bool = True):
+        kai.reset_project(wait=wait)
+        if wait:
+            print("This project has been deleted.")
+        else:
+            print("Deleting this project in the background.")
 
 
 class KlonetCommandExecTool(Tool):
@@ -628,6 +758,90 @@ class KlonetLinkQueryTool(Tool):
         return kai.query_link(link_name, node_name)
 
 
+class KlonetShortestPathTool(Tool):
+    name = "klonet_shortest_path"
+    description = ('''
+    Find a path with the fewest hops between two nodes of the network.
+
+    Args:
+        src_node (str): The name of the source node.
+        dst_node (str): The name of the destination node.
+
+    Returns:
+        list: The names of the nodes on the path, including both ends, or
+            None if the two nodes are not connected.
+
+    Example:
+        >>> path = klonet_shortest_path("h1", "h8")
+    ''')
+
+    inputs = ["str", "str"]
+    outputs = ["list"]
+
+    def __call__(self, src_node: str, dst_node: str):
+        return kai.topo_graph().shortest_path(src_node, dst_node)
+
+
+class KlonetTopoMetricsTool(Tool):
+    name = "klonet_topo_metrics"
+    description = ('''
+    Analyse the structure of the network: the number of nodes and links,
+    the connected components, the diameter (the largest hop count between
+    two connected nodes), the articulation points (nodes whose failure
+    disconnects the network) and the bridges (links whose failure
+    disconnects the network).
+
+    Args:
+        None
+
+    Returns:
+        dict: A dictionary of the metrics.
+
+    Example:
+        >>> metrics = klonet_topo_metrics()
+    ''')
+
+    outputs = ["dict"]
+
+    def __call__(self):
+        graph = kai.topo_graph()
+        diameter, src_node, dst_node = graph.diameter()
+        return {
+            "nodes": len(graph),
+            "links": len(graph.link_names),
+            "components": graph.components(),
+            "diameter": diameter,
+            "diameter_endpoints": [src_node, dst_node],
+            "articulation_points": graph.articulation_points(),
+            "bridges": graph.bridges(),
+        }
+
+
+class KlonetMinCutTool(Tool):
+    name = "klonet_min_cut"
+    description = ('''
+    Find the fewest links whose failure disconnects two nodes, which shows
+    how many link failures the connection between them can survive.
+
+    Args:
+        src_node (str): The name of the source node.
+        dst_node (str): The name of the destination node.
+
+    Returns:
+        list: The names of the links in the minimum cut.
+
+    Example:
+        >>> cut_links = klonet_min_cut("h1", "h8")
+    ''')
+
+    inputs = ["str", "str"]
+    outputs = ["list"]
+
+    def __call__(self, src_node: str, dst_node: str):
+        _, cut_links = kai.topo_graph().min_cut(src_node, dst_node)
+        return cut_links
+
+
 class KlonetGetWorkerIPTool(Tool):
     name = "klonet_get_worker_ip"
     description = ('''
@@ -680,21 +894,11 @@ class KlonetTreeTopoTemplate(Tool):
     @error_handler
     def __call__(self, subnet: str, ndepth: int = 2, nbranch: int = 2, density: int = 1):
         print("[Warning] This operation will overwrite the existing topology.")
-        kai.reset_project()
-        print("[Warning] Creating topology in this way will not layout the view.")
-        params_config = {
-            "topology_type": "tree",
-            "tree_depths": ndepth,
-            "tree_branches": nbranch,
-            "tree_host_density": density,
-            "host_counter": 1,
-            "switch_counter": 1,
-            "link_counter": 1,
-            "ip_prefix": subnet
-        }
-        net_config = kai.create_template_topo(params_config)
-        result = kai.deploy_from_config(net_config)
-        print(result)
+        topo = kai.generate_template_topo(
+            "tree", subnet, depth=ndepth, branches=nbranch, host_density=density)
+        kai.deploy()
+        print(f"Deploy {len(topo.get_nodes())} nodes and {len(topo.get_links())} "
+              f"links in project {kai.project_name} success.")
 
 
 class KlonetStarTopoTemplate(Tool):
@@ -719,19 +923,10 @@ class KlonetStarTopoTemplate(Tool):
     @error_handler
     def __call__(self, subnet: str, nstar: int = 3):
         print("[Warning] This operation will overwrite the existing topology.")
-        kai.reset_project()
-        print("[Warning] Creating topology in this way will not layout the view.")
-        params_config = {
-            "topology_type": "star",
-            "star_n": nstar,
-            "host_counter": 1,
-            "switch_counter": 1,
-            "link_counter": 1,
-            "ip_prefix": subnet
-        }
-        net_config = kai.create_template_topo(params_config)
-        result = kai.deploy_from_config(net_config)
-        print(result)
+        topo = kai.generate_template_topo("star", subnet, num_hosts=nstar)
+        kai.deploy()
+        print(f"Deploy {len(topo.get_nodes())} nodes and {len(topo.get_links())} "
+              f"links in project {kai.project_name} success.")
 
 
 class KlonetFatTreeTopoTemplate(Tool):
@@ -756,19 +951,10 @@ class KlonetFatTreeTopoTemplate(Tool):
     @error_handler
     def __call__(self, subnet: str, npod: int = 4):
         print("[Warning] This operation will overwrite the existing topology.")
-        kai.reset_project()
-        print("[Warning] Creating topology in this way will not layout the view.")
-        params_config = {
-            "topology_type": "fattree",
-            "fattree_k": npod,
-            "host_counter": 1,
-            "switch_counter": 1,
-            "link_counter": 1,
-            "ip_prefix": subnet
-        }
-        net_config = kai.create_template_topo(params_config)
-        result = kai.deploy_from_config(net_config)
-        print(result)
+        topo = kai.generate_template_topo("fattree", subnet, k=npod)
+        kai.deploy()
+        print(f"Deploy {len(topo.get_nodes())} nodes and {len(topo.get_links())} "
+              f"links in project {kai.project_name} success.")
 
 
 class KlonetLinearTopoTemplate(Tool):
@@ -790,25 +976,120 @@ class KlonetLinearTopoTemplate(Tool):
         >>> klonet_linear_topo_template("192.168.1.0/24", nswitch=3, nnodes=2)
     ''')
 
-    inputs = ["str"]
+    inputs = ["str", "int", "int"]
 
     @error_handler
-    def __call__(self, subset: str, nswitch: int = 3, nnodes: int = 2):
+    def __call__(self, subnet: str, nswitch: int = 3, nnodes: int = 2):
         print("[Warning] This operation will overwrite the existing topology.")
-        kai.reset_project()
-        print("[Warning] Creating topology in this way will not layout the view.")
-        params_config = {
-            "topology_type": "linear",
-            "linear_m": nswitch,
-            "linear_n": nnodes,
-            "host_counter": 1,
-            "switch_counter": 1,
-            "link_counter": 1,
-            "ip_prefix": subset
-        }
-        net_config = kai.create_template_topo(params_config)
-        result = kai.deploy_from_config(net_config)
-        print(result)
+        topo = kai.generate_template_topo(
+            "linear", subnet, num_switches=nswitch, hosts_per_switch=nnodes)
+        kai.deploy()
+        print(f"Deploy {len(topo.get_nodes())} nodes and {len(topo.get_links())} "
+              f"links in project {kai.project_name} success.")
+
+
+class KlonetMeshTopoTemplate(Tool):
+    name = "klonet_mesh_topo_template"
+    description = ('''
+    Deploy a full-mesh network topology template on Klonet, where every pair of
+    switches is directly connected. Do not call the klonet_deploy_network tool
+    if you use this template.
+    
+    Args:
+        subnet (str): The subnet to deploy the topology.
+        nswitch (int, optional): The number of switches (default is 4).
+        nnodes (int, optional): The number of host nodes connected to each
+            switch (default is 1).
+    
+    Returns:
+        None
+    
+    Example:
+        >>> klonet_mesh_topo_template("192.168.1.0/24", nswitch=4, nnodes=1)
+    ''')
+
+    inputs = ["str", "int", "int"]
+
+    @error_handler
+    def __call__(self, subnet: str, nswitch: int = 4, nnodes: int = 1):
+        print("[Warning] This operation will overwrite the existing topology.")
+        topo = kai.generate_template_topo(
+            "mesh", subnet, num_switches=nswitch, hosts_per_switch=nnodes)
+        kai.deploy()
+        print(f"Deploy {len(topo.get_nodes())} nodes and {len(topo.get_links())} "
+              f"links in project {kai.project_name} success.")
+
+
+class KlonetTorusTopoTemplate(Tool):
+    name = "klonet_torus_topo_template"
+    description = ('''
+    Deploy a 2D torus network topology template on Klonet. The switches form a
+    grid, and each row and each column is connected end to end. Do not call the
+    klonet_deploy_network tool if you use this template.
+    
+    Args:
+        subnet (str): The subnet to deploy the topology.
+        nrow (int, optional): The number of rows of switches (default is 3).
+        ncol (int, optional): The number of columns of switches (default is 3).
+        nnodes (int, optional): The number of host nodes connected to each
+            switch (default is 1).
+    
+    Returns:
+        None
+    
+    Example:
+        >>> klonet_torus_topo_template("192.168.1.0/24", nrow=3, ncol=3, nnodes=1)
+    ''')
+
+    inputs = ["str", "int", "int", "int"]
+
+    @error_handler
+    def __call__(self, subnet: str, nrow: int = 3, ncol: int = 3, nnodes: int = 1):
+        print("[Warning] This operation will overwrite the existing topology.")
+        topo = kai.generate_template_topo(
+            "torus", subnet, rows=nrow, cols=ncol, hosts_per_switch=nnodes)
+        kai.deploy()
+        print(f"Deploy {len(topo.get_nodes())} nodes and {len(topo.get_links())} "
+              f"links in project {kai.project_name} success.")
+
+
+class KlonetRandomTopoTemplate(Tool):
+    name = "klonet_random_topo_template"
+    description = ('''
+    Deploy a random connected network topology template on Klonet. The switches
+    are first connected by a random spanning tree, then every other pair of
+    switches is connected with probability prob. Do not call the
+    klonet_deploy_network tool if you use this template.
+    
+    Args:
+        subnet (str): The subnet to deploy the topology.
+        nswitch (int, optional): The number of switches (default is 10).
+        nnodes (int, optional): The number of host nodes connected to each
+            switch (default is 1).
+        prob (float, optional): The probability of each extra switch-to-switch
+            link (default is 0.1).
+        seed (int, optional): The random seed. The same seed always generates
+            the same topology (default is None).
+    
+    Returns:
+        None
+    
+    Example:
+        >>> klonet_random_topo_template("192.168.1.0/24", nswitch=10, nnodes=1, prob=0.2)
+    ''')
+
+    inputs = ["str", "int", "int", "float", "int"]
+
+    @error_handler
+    def __call__(self, subnet: str, nswitch: int = 10, nnodes: int = 1,
+                 prob: float = 0.1, seed: int = None):
+        print("[Warning] This operation will overwrite the existing topology.")
+        topo = kai.generate_template_topo(
+            "random", subnet, num_switches=nswitch, hosts_per_switch=nnodes,
+            edge_prob=prob, seed=seed)
+        kai.deploy()
+        print(f"Deploy {len(topo.get_nodes())} nodes and {len(topo.get_links())} "
+              f"links in project {kai.project_name} success.")
 
 
 class KlonetConfigurePublicNetworkTool(Tool):